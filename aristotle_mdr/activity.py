@@ -0,0 +1,91 @@
+"""
+Activity feeds
+--------------
+
+Every revision that saves an item adds an :class:`~aristotle_mdr.models.Activity`
+for it, recording who saved it, in which workgroup, whether it was created or
+changed and when. The recent activity of a user or a workgroup can then be shown
+from one indexed query, where reading it from the revisions means loading the
+versions of every revision and the item of every version.
+
+Activities are only added as revisions are saved, so the revisions saved before
+the activity table was added are read into it with the ``build_activity_feed``
+management command.
+"""
+from __future__ import unicode_literals
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from reversion.models import Version
+
+from aristotle_mdr.models import ACTIVITY_VERBS, Activity, _concept
+
+BATCH_SIZE = 500
+
+
+def _feed(queryset):
+    return queryset.select_related('concept__uuid', 'revision', 'user')
+
+
+def user_activity(user):
+    """Returns the items a user has saved, most recent first."""
+    return _feed(Activity.objects.filter(user=user))
+
+
+def workgroup_activity(workgroup):
+    """
+    Returns the items saved in a workgroup, most recent first. Items that have
+    since moved to another workgroup are left out, as members may no longer be able to see them.
+    """
+    return _feed(Activity.objects.filter(workgroup=workgroup, concept__workgroup=workgroup))
+
+
+def _concept_content_type_ids():
+    return [
+        content_type.pk for content_type in ContentType.objects.all()
+        if content_type.model_class() is not None and issubclass(content_type.model_class(), _concept)
+    ]
+
+
+@transaction.atomic
+def build_activity_feed():
+    """
+    Rebuilds the activity table from the saved revisions, and returns the number of activities added.
+    """
+    Activity.objects.all().delete()
+    workgroups = dict(_concept.objects.values_list('pk', 'workgroup_id').iterator())
+
+    versions = Version.objects.filter(
+        content_type_id__in=_concept_content_type_ids()
+    ).order_by('revision__date_created', 'revision_id').values_list(
+        'object_id', 'revision_id', 'revision__user_id', 'revision__date_created'
+    )
+
+    seen = set()
+    current_revision, recorded = None, set()
+    activities = []
+    added = 0
+    for object_id, revision_id, user_id, date_created in versions.iterator():
+        concept_id = int(object_id)
+        if revision_id != current_revision:
+            # Versions are read a revision at a time, so only items in the current one need remembering
+            current_revision, recorded = revision_id, set()
+        if concept_id not in workgroups or concept_id in recorded:
+            continue
+        recorded.add(concept_id)
+        activities.append(Activity(
+            user_id=user_id,
+            concept_id=concept_id,
+            workgroup_id=workgroups[concept_id],
+            revision_id=revision_id,
+            verb=ACTIVITY_VERBS.changed if concept_id in seen else ACTIVITY_VERBS.created,
+            timestamp=date_created,
+        ))
+        seen.add(concept_id)
+        if len(activities) >= BATCH_SIZE:
+            Activity.objects.bulk_create(activities)
+            added += len(activities)
+            activities = []
+    Activity.objects.bulk_create(activities)
+    return added + len(activities)
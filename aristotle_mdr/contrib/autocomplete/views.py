@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.template.loader import get_template
@@ -10,8 +11,16 @@ from django.template import Context
 from django.utils import six
 
 from aristotle_mdr import models, perms
+from aristotle_mdr.forms.search import get_permission_sqs
+from aristotle_mdr.name_index import name_contains_q
+from aristotle_mdr.utils import fetch_aristotle_settings
 from dal import autocomplete
 
+import hashlib
+import uuid
+
+AUTOCOMPLETE_CACHE_SECONDS = 60
+
 
 class GenericAutocomplete(autocomplete.Select2QuerySetView):
     model = None
@@ -67,8 +76,13 @@ class GenericConceptAutocomplete(GenericAutocomplete):
         else:
             qs = self.model.objects.visible(self.request.user)
 
+        aristotle_settings = fetch_aristotle_settings()
+        backend = aristotle_settings.get('CONCEPT_AUTOCOMPLETE_BACKEND', 'database')
+        if self.q and backend == 'search' and self.model is not models._concept:
+            return self.get_search_queryset(qs, aristotle_settings)
+
         if self.q:
-            q = Q(name__icontains=self.q)
+            q = name_contains_q(self.q, using=qs.db)
             q |= Q(uuid__uuid__iexact=self.q)
             if 'aristotle_mdr.contrib.identifiers' in settings.INSTALLED_APPS:
                 q |= Q(identifiers__identifier__iexact=self.q)
@@ -80,6 +94,56 @@ class GenericConceptAutocomplete(GenericAutocomplete):
             qs = qs.filter(q)
         return qs
 
+    def get_search_queryset(self, qs, aristotle_settings):
+        """
+        Find matching items using the search index rather than the database.
+        Name prefixes are matched against the n-gram index of item names, with
+        the users permissions applied in the search engine. Exact matches on
+        ids, UUIDs and identifiers are still looked up in the database as they
+        can use database indexes.
+        Results for short queries are the most expensive and the most often
+        repeated, so they are cached per user for a short time.
+        """
+        user = self.request.user
+        query = self.q.strip().lower()
+        cache_key = None
+        if len(query) <= aristotle_settings.get('CONCEPT_AUTOCOMPLETE_CACHED_PREFIX_LENGTH', 3):
+            if user.is_anonymous():
+                user_key = 'anonymous'
+            else:
+                user_key = '%s_%s' % (user.pk, perms.membership_version(user))
+            cache_key = 'aristotle_autocomplete_%s_%s_%s_%s' % (
+                self.model._meta.app_label, self.model._meta.model_name,
+                user_key, hashlib.md5(query.encode('utf-8')).hexdigest()
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return qs.filter(pk__in=cached)
+
+        sqs = get_permission_sqs().models(self.model).autocomplete(name_autocomplete=query)
+        sqs = sqs.apply_permission_checks(user=user)
+        ids = [int(result.pk) for result in sqs[:self.paginate_by or 10]]
+
+        q = Q(pk__in=ids)
+        try:
+            q |= Q(uuid__uuid=uuid.UUID(self.q.strip()))
+        except ValueError:
+            pass
+        if 'aristotle_mdr.contrib.identifiers' in settings.INSTALLED_APPS:
+            q |= Q(identifiers__identifier=self.q.strip())
+        try:
+            q |= Q(pk=int(self.q))
+        except ValueError:
+            pass
+        ids = list(qs.filter(q).values_list('pk', flat=True).distinct())
+
+        if cache_key is not None:
+            cache.set(
+                cache_key, ids,
+                aristotle_settings.get('CONCEPT_AUTOCOMPLETE_CACHE_SECONDS', AUTOCOMPLETE_CACHE_SECONDS)
+            )
+        return qs.filter(pk__in=ids)
+
     def get_results(self, context):
         """Return data for the 'results' key of the response."""
         return [
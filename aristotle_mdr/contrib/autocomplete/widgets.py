@@ -1,6 +1,8 @@
 from dal.autocomplete import ModelSelect2Multiple, ModelSelect2
 from django.core.urlresolvers import reverse_lazy
 
+from aristotle_mdr.utils import fetch_aristotle_settings
+
 
 class ConceptAutocompleteBase(object):
 
@@ -36,6 +38,14 @@ class ConceptAutocompleteBase(object):
         )
         super(ConceptAutocompleteBase, self).__init__(*args, **kwargs)
 
+    def build_attrs(self, *args, **kwargs):
+        attrs = super(ConceptAutocompleteBase, self).build_attrs(*args, **kwargs)
+        # The browser waits this long after the last keystroke before sending a query
+        delay = fetch_aristotle_settings().get('CONCEPT_AUTOCOMPLETE_DEBOUNCE', None)
+        if delay is not None:
+            attrs['data-autocomplete-light-delay'] = delay
+        return attrs
+
 
 class ConceptAutocompleteSelectMultiple(ConceptAutocompleteBase, ModelSelect2Multiple):
     pass
@@ -187,6 +187,61 @@ class LoggedInViewConceptBrowsePages(utils.LoggedInViewPages):
         self.assertNotContains(response, self.item3.name)
         self.assertNotContains(response, self.item4.name)
 
+    def test_browse_slot_value_counts(self):
+        from aristotle_mdr.contrib.slots.models import Slot
+        Slot.objects.create(concept=self.item1.concept, name="colour", value="red")
+        Slot.objects.create(concept=self.item3.concept, name="colour", value="red")
+        Slot.objects.create(concept=self.item4.concept, name="colour", value="blue")
+        # Item 2 isn't visible to the editor, so isn't counted
+        Slot.objects.create(concept=self.item2.concept, name="colour", value="blue")
+
+        def counts(response):
+            return [
+                (name, [(option['value'], option['count'], option['selected']) for option in options])
+                for name, options in response.context['slot_facets']
+            ]
+
+        self.login_editor()
+        url = reverse("browse_concepts",args=[self.itemType._meta.app_label,self.itemType._meta.model_name])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(counts(response), [('colour', [('blue', 1, False), ('red', 2, False)])])
+
+        response = self.client.get(url, {'sf': 'colour:red'})
+        self.assertEqual(counts(response), [('colour', [('red', 2, True)])])
+
+        # Counts are updated when slots change
+        Slot.objects.create(concept=self.item3.concept, name="size", value="large")
+        response = self.client.get(url)
+        self.assertEqual(
+            counts(response),
+            [('colour', [('blue', 1, False), ('red', 2, False)]), ('size', [('large', 1, False)])]
+        )
+
+        # Edits that don't change who can see an item keep the cached counts
+        from aristotle_mdr.contrib.slots.models import slot_counts_version
+        version = slot_counts_version(self.itemType)
+        self.item1.definition = "a new definition"
+        self.item1.save()
+        self.assertEqual(slot_counts_version(self.itemType), version)
+
+        # Moving an item changes who can see it
+        self.item1.workgroup = self.wg2
+        self.item1.save()
+        self.assertNotEqual(slot_counts_version(self.itemType), version)
+        response = self.client.get(url)
+        self.assertEqual(
+            counts(response),
+            [('colour', [('blue', 1, False), ('red', 1, False)]), ('size', [('large', 1, False)])]
+        )
+
+        # Bulk moves update the items without saving them
+        moved = models._concept.objects.filter(pk=self.item3.pk)
+        moved.update(workgroup=self.wg2)
+        models.concepts_bulk_updated.send(sender=models._concept, concepts=moved, changed_fields=['workgroup'])
+        response = self.client.get(url)
+        self.assertEqual(counts(response), [('colour', [('blue', 1, False)])])
+
     def test_itemtypes_with_no_items_dont_show_up(self):
         self.login_editor()
 
@@ -1,15 +1,20 @@
 from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import FieldError
+from django.core.exceptions import FieldError, ValidationError
 from django.db.models import Q
 from django.http import HttpResponse, Http404, HttpResponseRedirect
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import ListView, TemplateView
 from aristotle_mdr.utils import get_concepts_for_apps, fetch_aristotle_settings, fetch_metadata_apps
+from aristotle_mdr.views.utils import ConceptListMixin, paginate_sort_opts
 from collections import OrderedDict
 
 
+def slots_installed():
+    return apps.is_installed('aristotle_mdr.contrib.slots')
+
+
 class BrowseApps(TemplateView):
     template_name = "aristotle_mdr_browse/apps_list.html"
     ordering = 'app_label'
@@ -60,7 +65,7 @@ class BrowseModels(AppBrowser):
         return get_concepts_for_apps([app])
 
 
-class BrowseConcepts(AppBrowser):
+class BrowseConcepts(ConceptListMixin, AppBrowser):
     _model = None
     paginate_by = 25
 
@@ -78,59 +83,88 @@ class BrowseConcepts(AppBrowser):
                 self._model = ct.first().model_class()
         return self._model
 
-    def get_queryset(self, *args, **kwargs):
-        queryset = super(BrowseConcepts, self).get_queryset(*args, **kwargs)
-
-        # Regular queryset filter
-        for f in self.request.GET.getlist('f'):
-            try:
-                k, v = f.split(':', 1)
-                queryset = queryset.filter(**{k: v})
-            except:
-                pass
-
-        # Regular queryset filters
-        filters = {}
+    def get_filters(self):
+        filters = OrderedDict()
         for f in self.request.GET.getlist('f'):
             if ':' in f:
                 k, v = f.split(':', 1)
-                filter_vals = filters.get(k, [])
-                filter_vals.append(v)
-                filters[k] = filter_vals
-
-        for query, values in filters.items():
-            try:
-                k = "%s__in" % k
-                queryset = queryset.filter(**{k: values})
-            except FieldError:
-                pass
+                filters.setdefault(k, []).append(v)
+        return filters
 
-        # slot filters
-        slots = {}
+    def get_slot_filters(self):
+        slots = OrderedDict()
         for sf in self.request.GET.getlist('sf'):
             if ':' in sf:
                 k, v = sf.split(':', 1)
-                slot_vals = slots.get(k, [])
-                slot_vals.append(v)
-                slots[k] = slot_vals
+                slots.setdefault(k, []).append(v)
+        return slots
+
+    def get_queryset(self, *args, **kwargs):
+        queryset = super(BrowseConcepts, self).get_queryset(*args, **kwargs)
 
-        for slot_name, values in slots.items():
+        # Regular queryset filters, any of the values for each field
+        for k, values in self.get_filters().items():
             try:
-                queryset = queryset.filter(
-                    slots__name=slot_name,
-                    slots__value__in=values,
-                )
-            except FieldError:
+                if len(values) == 1:
+                    queryset = queryset.filter(**{k: values[0]})
+                else:
+                    queryset = queryset.filter(**{"%s__in" % k: values})
+            except (FieldError, ValidationError, ValueError, TypeError):
                 pass
 
+        # slot filters
+        slots = self.get_slot_filters()
+        if slots and slots_installed():
+            from aristotle_mdr.contrib.slots.models import filter_by_slots
+            queryset = filter_by_slots(queryset, slots)
+
         return queryset.visible(self.request.user)
 
+    def get_slot_counts(self):
+        if not slots_installed():
+            return []
+        from aristotle_mdr.contrib.slots.models import cached_slot_value_counts
+        filters = dict(self.get_filters())
+        filters.update(('slot:%s' % k, v) for k, v in self.get_slot_filters().items())
+        return cached_slot_value_counts(self.object_list, self.request.user, filters)
+
+    def get_slot_facets(self):
+        """
+        Returns the slot names and values of the items being browsed, with the number
+        of items with each value and the query string to add or remove it as a filter.
+        """
+        selected = self.get_slot_filters()
+        facets = []
+        for name, values in self.get_slot_counts():
+            options = []
+            for value, count in values:
+                sf = '%s:%s' % (name, value)
+                params = self.request.GET.copy()
+                params.pop('page', None)
+                params.pop('cursor', None)
+                current = params.getlist('sf')
+                is_selected = value in selected.get(name, [])
+                if is_selected:
+                    current.remove(sf)
+                else:
+                    current.append(sf)
+                params.setlist('sf', current)
+                options.append({
+                    'value': value,
+                    'count': count,
+                    'selected': is_selected,
+                    'query': params.urlencode(),
+                })
+            facets.append((name, options))
+        return facets
+
     def get_context_data(self, *args, **kwargs):
         # Call the base implementation first to get a context
         context = super(BrowseConcepts, self).get_context_data(*args, **kwargs)
         context['model'] = self.model
         context['model_name'] = self.model._meta.model_name
         context['sort'] = self.order
+        context['slot_facets'] = self.get_slot_facets()
         return context
 
     def get_template_names(self):
@@ -140,7 +174,11 @@ class BrowseConcepts(AppBrowser):
         names.insert(0, 'aristotle_mdr_browse/%s/%s_list.html' % (app_label, self.model._meta.model_name))
         return names
 
+    def get_keyset_sort(self):
+        if self.order not in paginate_sort_opts.keys():
+            return 'name_asc'
+        return self.order
+
     def get_ordering(self):
-        from aristotle_mdr.views.utils import paginate_sort_opts
         self.order = self.request.GET.get('sort', 'name_asc')
         return paginate_sort_opts.get(self.order)
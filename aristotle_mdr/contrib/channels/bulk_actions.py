@@ -0,0 +1,28 @@
+from aristotle_mdr import models as MDR
+from aristotle_mdr.contrib.channels.utils import safe_object
+
+
+def run_bulk_action_job(message, **kwargs):
+    import json
+    from django.utils.datastructures import MultiValueDict
+    from django.utils.module_loading import import_string
+
+    job = safe_object(message)
+    if not job or job.state != MDR.BULK_ACTION_JOB_STATES.pending:
+        return
+
+    action_form = import_string(job.action)
+    form = action_form(
+        MultiValueDict(json.loads(job.form_data)),
+        user=job.user, request=None
+    )
+    if not form.is_valid():
+        job.set_state(MDR.BULK_ACTION_JOB_STATES.failed, str(form.errors))
+        return
+
+    try:
+        form.check_permissions()
+        form.run(job)
+    except Exception as e:
+        job.set_state(MDR.BULK_ACTION_JOB_STATES.failed, str(e))
+        raise
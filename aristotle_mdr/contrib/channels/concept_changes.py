@@ -1,4 +1,5 @@
 from channels import Group
+from django.db.models import Count
 from aristotle_mdr import models as MDR
 from aristotle_mdr import messages
 from aristotle_mdr.contrib.channels.utils import safe_object
@@ -44,6 +45,33 @@ def concept_saved(message):
         pass
 
 
+def concepts_moved_workgroup(message, **kwargs):
+    """
+    Sends one notification per watcher when a batch of concepts is moved into
+    a workgroup, rather than one per watcher per item.
+    """
+    from django.contrib.auth import get_user_model
+    workgroup = safe_object(message)
+    if not workgroup:
+        return
+
+    User = get_user_model()
+    actor = User.objects.filter(pk=message['user_id']).first()
+    concept_ids = message['concept_ids']
+
+    viewers = workgroup.viewers.all()
+    if actor:
+        viewers = viewers.exclude(pk=actor.pk)
+    for user in viewers:
+        messages.workgroup_items_moved(recipient=user, actor=actor or workgroup, workgroup=workgroup, count=len(concept_ids))
+
+    profiles = MDR.PossumProfile.objects.filter(
+        favourites__in=concept_ids
+    ).annotate(num_moved=Count('favourites')).select_related('user')
+    for profile in profiles:
+        messages.favourites_moved(recipient=profile.user, actor=actor or workgroup, workgroup=workgroup, count=profile.num_moved)
+
+
 def new_comment_created(message, **kwargs):
     comment = safe_object(message)
     if comment:
@@ -54,9 +82,8 @@ def new_post_created(message, **kwargs):
     post = safe_object(message)
 
     if post:
-        for user in post.workgroup.members.all():
-            if user != post.author:
-                messages.new_post_created(post, user)
+        for user in post.workgroup.members.exclude(pk=post.author_id).iterator():
+            messages.new_post_created(post, user)
 
 
 def status_changed(message, **kwargs):
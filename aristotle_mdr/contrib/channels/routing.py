@@ -1,3 +1,6 @@
+import copy
+from functools import wraps
+
 from channels.routing import route, route_class, include
 from haystack_channels.routing import channel_routing as haystack_routing
 
@@ -6,9 +9,32 @@ def module_route(mod_route):
     return route(mod_route, mod_route)
 
 
+def index_route(haystack_route):
+    """
+    Returns a copy of a route that updates the search index, whose consumer
+    also discards anything cached from search results once the index is written.
+    """
+    if not hasattr(haystack_route, 'consumer'):
+        return haystack_route
+    consumer = haystack_route.consumer
+
+    @wraps(consumer)
+    def update_index(message, **kwargs):
+        from aristotle_mdr.forms.search import search_index_updated
+        result = consumer(message, **kwargs)
+        search_index_updated()
+        return result
+
+    haystack_route = copy.copy(haystack_route)
+    haystack_route.consumer = update_index
+    return haystack_route
+
+
 channel_routing = [
     module_route("aristotle_mdr.contrib.channels.concept_changes.concept_saved"),
     module_route("aristotle_mdr.contrib.channels.concept_changes.new_comment_created"),
     module_route("aristotle_mdr.contrib.channels.concept_changes.new_post_created"),
-    include(haystack_routing)
+    module_route("aristotle_mdr.contrib.channels.concept_changes.concepts_moved_workgroup"),
+    module_route("aristotle_mdr.contrib.channels.bulk_actions.run_bulk_action_job"),
+    include([index_route(haystack_route) for haystack_route in haystack_routing])
 ]
@@ -14,11 +14,12 @@ class AristotleChannelsSignalProcessor(ChannelsRealTimeAsyncSignalProcessor):
     def setup(self):
         super(AristotleChannelsSignalProcessor, self).setup()
 
-        from aristotle_mdr.models import ReviewRequest, concept_visibility_updated
+        from aristotle_mdr.models import ReviewRequest, concept_visibility_updated, concepts_bulk_updated
 
         post_save.connect(self.update_visibility_review_request, sender=ReviewRequest)
         m2m_changed.connect(self.update_visibility_review_request, sender=ReviewRequest.concepts.through)
         concept_visibility_updated.connect(self.handle_concept_recache)
+        concepts_bulk_updated.connect(self.handle_concepts_bulk_update)
 
     def teardown(self):  # pragma: no cover
         from aristotle_mdr.models import _concept
@@ -32,6 +33,10 @@ class AristotleChannelsSignalProcessor(ChannelsRealTimeAsyncSignalProcessor):
         instance = concept.item
         self.handle_save(instance.__class__, instance)
 
+    def handle_concepts_bulk_update(self, concepts, **kwargs):
+        for obj in concepts.select_subclasses():
+            self.handle_save(obj.__class__, obj)
+
     def update_visibility_review_request(self, sender, instance, **kwargs):
         from aristotle_mdr.models import ReviewRequest
         assert(sender in [ReviewRequest, ReviewRequest.concepts.through])
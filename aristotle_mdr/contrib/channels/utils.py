@@ -1,4 +1,5 @@
 from channels import Channel
+from django.apps import apps
 from django.conf import settings
 
 
@@ -7,10 +8,10 @@ def fire(channel, obj=None, **kwargs):
     message = kwargs
     if hasattr(settings, 'CHANNEL_LAYERS'):
         message.update({
-            '__object___': {
-                'pk': instance.pk,
-                'app_label': instance._meta.app_label,
-                'model_name': instance._meta.model_name,
+            '__object__': {
+                'pk': str(obj.pk),
+                'app_label': obj._meta.app_label,
+                'model_name': obj._meta.model_name,
             }
         })
         c = Channel("aristotle_mdr.contrib.channels.%s" % channel).send(message)
@@ -3,14 +3,20 @@
 # It also provides facetting
 # 2016-11-27 - Module inherited to add Python 3 functionality
 
-from collections import defaultdict
+from collections import Counter, defaultdict
+from multiprocessing import Pool
 from haystack.backends import whoosh_backend as original_backend
 from haystack.backends import BaseEngine
+from haystack.exceptions import SkipDocument
+from haystack.utils import get_identifier
 from whoosh import analysis, fields, highlight, query, scoring
+from whoosh.index import LockError
 from whoosh.reading import TermNotFound
 from whoosh.support.levenshtein import distance
 from whoosh.writing import AsyncWriter
 
+from aristotle_mdr.contrib.search_backends.spelling import SpellingDictionary
+
 
 def CUSTOM_MERGE_SMALL(writer, segments):
     """This policy merges small segments, where "small" is defined using a
@@ -35,60 +41,226 @@ def CUSTOM_MERGE_SMALL(writer, segments):
     return unchanged_segments
 
 
+def count_words(field, texts):
+    """
+    Counts the words that would be indexed for each of the texts in the given schema field.
+    """
+    words = Counter()
+    for text in texts:
+        for w, freq, weight, valuestring in field.index(text):
+            words[w] += freq
+    return words
+
+
+def _count_words(args):
+    # Pool.map only passes a single argument to the worker function
+    return count_words(*args)
+
+
+def count_words_in_parallel(field, texts, procs):
+    """
+    Splits the texts into one chunk for each process and counts the words in
+    each chunk in a separate process.
+    """
+    chunk_size = len(texts) // procs + 1
+    chunks = [(field, texts[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    pool = Pool(procs)
+    try:
+        words = Counter()
+        for chunk_words in pool.map(_count_words, chunks):
+            words.update(chunk_words)
+        return words
+    finally:
+        pool.close()
+        pool.join()
+
+
 class WriterWithFasterSpellingUpdate(AsyncWriter):
-    def __init__(self, spelling_storage, spelling_checker, spelling_fields,
-                 index, delay=0.25, writerargs=None):
+    """
+    An ``AsyncWriter`` that counts the words added to the spelling fields as
+    documents are updated, and passes them to ``spelling_callback`` in a single
+    batch when the writer is committed.
+
+    If the index is locked when the writer is committed, the documents are
+    written by a background thread once the lock is free, and
+    ``committed_callback`` is called after they have been.
+    """
+    def __init__(self, spelling_fields, spelling_callback,
+                 index, delay=0.25, writerargs=None, committed_callback=None):
         super(WriterWithFasterSpellingUpdate, self).__init__(
             index, delay, writerargs
         )
-        self.spelling_storage = spelling_storage
-        self.spelling_checker = spelling_checker
         self.spelling_fields = spelling_fields
+        self.spelling_callback = spelling_callback
+        self.committed_callback = committed_callback
+        self.spelling_words = Counter()
 
     def update_document(self, **doc):
-        # remove every word previously found in the document from the
-        # spelling index
-        from haystack.constants import ID
         super(WriterWithFasterSpellingUpdate, self).update_document(**doc)
         document_schema = self.index.schema
         for fieldname in self.spelling_fields:
-            field = document_schema[fieldname]
-            """
-            def generate_words():
-                for w, freq, weight, valuestring in field.index(doc[fieldname]):
-                    yield w
-            """
             if fieldname in doc:
-                words = [w for w, freq, weight, valuestring
-                         in field.index(doc[fieldname])]
-                self.spelling_checker.add_words(words)
+                self.spelling_words.update(
+                    count_words(document_schema[fieldname], [doc[fieldname]])
+                )
+
+    def commit(self, *args, **kwargs):
+        super(WriterWithFasterSpellingUpdate, self).commit(*args, **kwargs)
+        if self.spelling_words:
+            self.spelling_callback(self.spelling_words)
+            self.spelling_words = Counter()
+
+    def run(self):
+        # Only runs in the background thread started when the index was locked at commit
+        super(WriterWithFasterSpellingUpdate, self).run()
+        if self.committed_callback is not None:
+            self.committed_callback()
 
 
 class CustomWhooshBackend(original_backend.WhooshSearchBackend):
+    """
+    A Whoosh backend with faster spelling updates, and a multi-process writer
+    for bulk updates.
+
+    As well as the usual Whoosh connection options, this reads:
+
+    * ``WRITER_PROCS`` - the number of processes to use for bulk updates, like
+      a rebuild of the index. Each process writes its own segment, and these
+      are merged when the update is committed. Defaults to 1, which always
+      writes from a single process.
+    * ``WRITER_LIMITMB`` - the memory (in megabytes) each writer process can use
+      before flushing to disk. Defaults to 128.
+    * ``BULK_UPDATE_SIZE`` - the smallest number of documents in an update that
+      uses the multi-process writer. Defaults to 500.
+    """
     silently_fail = False
 
+    def __init__(self, connection_alias, **connection_options):
+        super(CustomWhooshBackend, self).__init__(connection_alias, **connection_options)
+        self.writer_procs = int(connection_options.get('WRITER_PROCS', 1))
+        self.writer_limitmb = int(connection_options.get('WRITER_LIMITMB', 128))
+        self.bulk_update_size = int(connection_options.get('BULK_UPDATE_SIZE', 500))
+
     def setup(self):
         super(CustomWhooshBackend, self).setup()
         self.spelling_fields = (self.content_field_name, 'job_title')
+        if getattr(self, 'spelling', None) is None:
+            self.spelling = SpellingDictionary(
+                self.path if self.use_file_storage else None,
+                lock=self.storage.lock('SPELLING_WRITELOCK')
+            )
 
     def get_writer(self, index):
         return WriterWithFasterSpellingUpdate(
-            self.storage, self.get_spell_checker(), self.spelling_fields, index
+            self.spelling_fields, self.update_spelling, index,
+            committed_callback=self.index_updated
         )
-    """
+
+    def get_bulk_writer(self, index):
+        """
+        Returns a writer that indexes documents in ``WRITER_PROCS`` separate
+        processes, each writing a separate segment, which are merged into the
+        index in a final step when the writer is committed.
+        Returns None if another writer holds the index lock.
+        """
+        try:
+            return index.writer(
+                procs=self.writer_procs, limitmb=self.writer_limitmb, multisegment=False
+            )
+        except LockError:
+            return None
+
     def update(self, index, iterable, commit=True):
-        import pdb; pdb.set_trace();
-        super(CustomWhooshBackend, self).update(index, iterable, commit)
-    """
+        if not self.setup_complete:
+            self.setup()
+
+        self.index = self.index.refresh()
+        writer = None
+        bulk = self.writer_procs > 1 and len(iterable) >= self.bulk_update_size
+        if bulk:
+            writer = self.get_bulk_writer(self.index)
+        if writer is None:
+            # Either a small update, or a bulk update that has to wait for the index lock
+            bulk = False
+            writer = self.get_writer(self.index)
+        spelling_texts = defaultdict(list)
+
+        for obj in iterable:
+            try:
+                doc = index.full_prepare(obj)
+            except SkipDocument:
+                self.log.debug(u"Indexing for object `%s` skipped", obj)
+            else:
+                # Really make sure it's unicode, because Whoosh won't have it any
+                # other way.
+                for key in doc:
+                    doc[key] = self._from_python(doc[key])
+
+                # Document boosts aren't supported in Whoosh 2.5.0+.
+                if 'boost' in doc:
+                    del doc['boost']
+
+                try:
+                    writer.update_document(**doc)
+                except Exception as e:
+                    if not self.silently_fail:
+                        raise
+
+                    # We'll log the object identifier but won't include the actual object
+                    # to avoid the possibility of that generating encoding errors while
+                    # processing the log message:
+                    self.log.error(
+                        u"%s while preparing object for update" % e.__class__.__name__,
+                        exc_info=True,
+                        extra={"data": {"index": index, "object": get_identifier(obj)}}
+                    )
+                    continue
+
+                if bulk:
+                    for fieldname in self.spelling_fields:
+                        if fieldname in doc:
+                            spelling_texts[fieldname].append(doc[fieldname])
+
+        if len(iterable) > 0:
+            # For now, commit no matter what, as we run into locking issues otherwise.
+            writer.commit()
+
+            if bulk:
+                # Count the spelling words across the same number of processes,
+                # and update the spelling dictionary once for the whole update.
+                words = Counter()
+                for fieldname, texts in spelling_texts.items():
+                    words.update(count_words_in_parallel(self.index.schema[fieldname], texts, self.writer_procs))
+                if words:
+                    self.update_spelling(words)
+            # If the writer is waiting for the index lock, this is called again once it has written
+            self.index_updated()
+
+    def remove(self, obj_or_string, commit=True):
+        super(CustomWhooshBackend, self).remove(obj_or_string, commit=commit)
+        self.index_updated()
 
-    def update_spelling(self):
-        pass
+    def index_updated(self):
         """
-        import pdb; pdb.set_trace()
-        sp = self.get_spell_checker()
-        sp.add_field(self.index, self.content_field_name)
-        sp.add_field(self.index, 'job_title')
+        Called whenever documents are written to or removed from the index, however
+        the change was made, so anything cached from search results, like facet counts, is discarded.
         """
+        from aristotle_mdr.forms.search import search_index_updated
+        search_index_updated()
+
+    def update_spelling(self, words):
+        """
+        Called with a ``Counter`` of the words added to the spelling fields
+        each time the index is updated, and adds them to the spelling dictionary.
+        """
+        self.spelling.add(words)
+
+    def clear(self, models=None, commit=True):
+        super(CustomWhooshBackend, self).clear(models=models, commit=commit)
+        if not models:
+            # The whole index has been removed, so start a new spelling dictionary
+            self.spelling.clear()
+        self.index_updated()
 
     def search(self, query_string, sort_by=None, start_offset=0, end_offset=None,
                fields='', highlight=False, facets=None, date_facets=None, query_facets=None,
@@ -118,10 +290,42 @@ class CustomWhooshBackend(original_backend.WhooshSearchBackend):
         )
 
     def create_spelling_suggestion(self, query_string):
+        """
+        Suggests a spelling for each word in the query from the spelling dictionary.
+        Words that are already in the dictionary are left as they are.
+
+        Indexes built before the spelling dictionary was added have an empty
+        dictionary until they are rebuilt, so these use the (much slower) Whoosh
+        spelling corrector instead.
+        """
         if not self.setup_complete:
             self.setup()
-        # import pdb; pdb.set_trace()
-        return super(CustomWhooshBackend, self).create_spelling_suggestion(query_string)
+        self.spelling.refresh()
+        if not len(self.spelling):
+            return super(CustomWhooshBackend, self).create_spelling_suggestion(query_string)
+
+        try:
+            from django.utils.encoding import force_text
+        except ImportError:
+            from django.utils.encoding import force_unicode as force_text
+
+        if not query_string:
+            return None
+        cleaned_query = force_text(query_string)
+        for rev_word in self.RESERVED_WORDS:
+            cleaned_query = cleaned_query.replace(rev_word, '')
+        for rev_char in self.RESERVED_CHARACTERS:
+            cleaned_query = cleaned_query.replace(rev_char, '')
+
+        suggested_words = []
+        for word in cleaned_query.split():
+            if word.lower() in self.spelling:
+                suggested_words.append(word)
+                continue
+            suggestions = self.spelling.suggest(word.lower(), limit=1)
+            if suggestions:
+                suggested_words.append(suggestions[0])
+        return ' '.join(suggested_words)
 
     def _process_results(self, raw_page, highlight=False, query_string='',
                          spelling_query=None, result_class=None):
@@ -0,0 +1,438 @@
+"""
+A compact, persistent spelling dictionary for the Whoosh search backend.
+
+The dictionary is a file of word frequencies, sorted by word, that is memory
+mapped when it is loaded (or read, on Windows) so it costs very little to open and keep around::
+
+    header:      magic, version, number of words
+    frequencies: one unsigned 32-bit integer per word
+    offsets:     one unsigned 32-bit integer per word (plus one), the start of each word in the data
+    data:        the UTF-8 encoded words, one after another
+
+Words added at index time are kept in a small pending file, and merged into
+the dictionary file once enough of them build up.
+
+The frequencies only ever grow. Reindexing a document adds its words again, and
+removing a document doesn't take its words away, so between rebuilds the
+frequencies favour often edited items and words from removed items can still
+be suggested. Clearing the whole index, as ``rebuild_index`` does, starts a new
+dictionary that is built up again as the items are indexed.
+
+Suggestions are found by running a Levenshtein automaton for the misspelled
+word over the sorted words. The automaton state is shared between words with
+the same prefix, and once no word with a prefix can be within the maximum
+distance, all of those words are skipped. So only a small fraction of the
+dictionary is looked at for each suggestion.
+"""
+from __future__ import unicode_literals
+
+import io
+import json
+import mmap
+import os
+import struct
+from collections import Counter
+
+MAGIC = b'ASPD'
+VERSION = 1
+HEADER = struct.Struct(str('<4sII'))
+UINT = struct.Struct(str('<I'))
+MAX_FREQUENCY = 0xffffffff
+
+DICTIONARY_FILENAME = '_spelling.dict'
+PENDING_FILENAME = '_spelling.pending'
+
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:  # pragma: no cover
+        # Python 2
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def write_dictionary(f, words):
+    """
+    Writes the dictionary file for an iterable of ``(word, frequency)`` pairs, sorted by word.
+    """
+    encoded = []
+    freqs = []
+    offsets = [0]
+    for word, freq in words:
+        data = word.encode('utf-8')
+        encoded.append(data)
+        freqs.append(min(freq, MAX_FREQUENCY))
+        offsets.append(offsets[-1] + len(data))
+    count = len(encoded)
+    f.write(HEADER.pack(MAGIC, VERSION, count))
+    f.write(struct.pack(str('<%dI' % count), *freqs))
+    f.write(struct.pack(str('<%dI' % (count + 1)), *offsets))
+    f.write(b''.join(encoded))
+
+
+class LevenshteinAutomaton(object):
+    """
+    An automaton that accepts the words within ``maxdist`` edits of ``text``.
+
+    Each state is a tuple of the edit distances between the characters read
+    so far and each prefix of ``text``, capped at ``maxdist + 1``. So the last
+    value is the distance to the whole text, and the smallest value is the
+    least distance any word starting with the characters read so far can have.
+    Transitions are worked out the first time they are needed and then cached.
+    """
+    def __init__(self, text, maxdist):
+        self.text = text
+        self.maxdist = maxdist
+        self.start = tuple(min(i, maxdist + 1) for i in range(len(text) + 1))
+        self.transitions = {}
+
+    def step(self, state, char):
+        """
+        Returns the state after reading ``char``, or None if no word with
+        the characters read so far can be within ``maxdist`` edits.
+        """
+        key = (state, char)
+        try:
+            return self.transitions[key]
+        except KeyError:
+            pass
+        cap = self.maxdist + 1
+        new_state = [min(state[0] + 1, cap)]
+        for i, text_char in enumerate(self.text, 1):
+            new_state.append(min(
+                new_state[i - 1] + 1,
+                state[i] + 1,
+                state[i - 1] + (text_char != char),
+                cap
+            ))
+        new_state = tuple(new_state) if min(new_state) < cap else None
+        self.transitions[key] = new_state
+        return new_state
+
+    def distance(self, state):
+        """Returns the distance to the text for a state, or None if it is too far away."""
+        if state[-1] > self.maxdist:
+            return None
+        return state[-1]
+
+
+def bounded_distance(text, word, maxdist):
+    """
+    Returns the edit distance between ``text`` and ``word``, or None if it is more than ``maxdist``.
+    """
+    automaton = LevenshteinAutomaton(text, maxdist)
+    state = automaton.start
+    for char in word:
+        state = automaton.step(state, char)
+        if state is None:
+            return None
+    return automaton.distance(state)
+
+
+class SpellingDictionary(object):
+    """
+    Word frequencies for spelling suggestions, stored in ``path``.
+
+    If ``path`` is None, the dictionary is only kept in memory.
+    ``lock`` is used to stop separate processes updating the files at the same time.
+    """
+    merge_size = 1000
+
+    def __init__(self, path=None, lock=None):
+        self.path = path
+        self.lock = lock
+        self._files_changed = None
+        self.reset()
+        self.refresh()
+
+    def reset(self):
+        self._load(HEADER.pack(MAGIC, VERSION, 0) + UINT.pack(0))
+        self.pending = Counter()
+
+    def close(self):
+        """
+        Closes the memory mapped dictionary file. The file has to be closed before
+        it can be replaced or removed on Windows.
+        """
+        self.reset()
+        self._files_changed = None
+
+    def _close_buffer(self, buffer):
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    @property
+    def dictionary_path(self):
+        return os.path.join(self.path, DICTIONARY_FILENAME)
+
+    @property
+    def pending_path(self):
+        return os.path.join(self.path, PENDING_FILENAME)
+
+    def _files_state(self):
+        state = []
+        for filename in (self.dictionary_path, self.pending_path):
+            try:
+                stat = os.stat(filename)
+                state.append((stat.st_mtime, stat.st_size))
+            except OSError:
+                state.append(None)
+        return state
+
+    def refresh(self):
+        """Reloads the dictionary if another process has changed it."""
+        if self.path is None:
+            return
+        files_state = self._files_state()
+        if files_state == self._files_changed:
+            return
+        self.reset()
+        if files_state[0] is not None:
+            with open(self.dictionary_path, 'rb') as f:
+                if os.name == 'nt':
+                    # Windows can't replace a file another process has mapped, so it is read instead
+                    self._load(f.read())
+                else:
+                    self._load(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        if files_state[1] is not None:
+            with io.open(self.pending_path, 'r', encoding='utf-8') as f:
+                self.pending = Counter(json.load(f))
+        self._files_changed = files_state
+
+    def _load(self, buffer):
+        magic, version, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            # An unknown dictionary, so start again from scratch
+            self._close_buffer(buffer)
+            return
+        self._close_buffer(getattr(self, '_buffer', None))
+        self._buffer = buffer
+        self._count = count
+        # The word offsets are looked up constantly, so they are unpacked once,
+        # with the start of the word data added.
+        data_start = HEADER.size + UINT.size * (2 * count + 1)
+        offsets = struct.unpack_from(str('<%dI' % (count + 1)), buffer, HEADER.size + UINT.size * count)
+        self._offsets = [data_start + offset for offset in offsets]
+
+    def _frequency_at(self, i):
+        return UINT.unpack_from(self._buffer, HEADER.size + UINT.size * i)[0]
+
+    def _bytes_at(self, i):
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]]
+
+    def _word_at(self, i):
+        return self._bytes_at(i).decode('utf-8')
+
+    def _items(self):
+        for i in range(self._count):
+            yield self._word_at(i), self._frequency_at(i)
+
+    def _index_after(self, prefix, lo):
+        """
+        Returns the index of the first word after every word starting with ``prefix``,
+        given that the word at ``lo`` starts with it.
+        """
+        # UTF-8 sorts in the same order as the words, so compare the encoded prefix
+        prefix = prefix.encode('utf-8')
+        length = len(prefix)
+        buffer = self._buffer
+        offsets = self._offsets
+        count = self._count
+
+        def has_prefix(i):
+            return buffer[offsets[i]:min(offsets[i] + length, offsets[i + 1])] <= prefix
+
+        # Most prefixes only have a few words, so gallop forward before searching
+        step = 1
+        hi = lo + 1
+        while hi < count and has_prefix(hi):
+            lo = hi
+            step *= 2
+            hi = lo + step
+        hi = min(hi, count)
+        lo += 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if has_prefix(mid):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _index_of_first(self, word):
+        """Returns the index of the first word that doesn't sort before ``word``."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < word:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _index_of(self, word):
+        i = self._index_of_first(word)
+        if i < self._count and self._word_at(i) == word:
+            return i
+        return None
+
+    def __len__(self):
+        return self._count + len(self.pending)
+
+    def frequency(self, word):
+        i = self._index_of(word)
+        freq = self._frequency_at(i) if i is not None else 0
+        return freq + self.pending.get(word, 0)
+
+    def __contains__(self, word):
+        return self.frequency(word) > 0
+
+    def _acquire(self):
+        if self.lock is not None:
+            self.lock.acquire(True)
+
+    def _release(self):
+        if self.lock is not None:
+            self.lock.release()
+
+    def add(self, words):
+        """Adds a ``Counter`` of words to the dictionary."""
+        if not words:
+            return
+        self._acquire()
+        try:
+            self.refresh()
+            self.pending.update(words)
+            if len(self.pending) >= self.merge_size:
+                self.merge()
+            else:
+                self._save_pending()
+        finally:
+            self._release()
+
+    def _save_pending(self):
+        if self.path is None:
+            return
+        tmp_path = self.pending_path + '.tmp'
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(self.pending), ensure_ascii=False))
+        _replace(tmp_path, self.pending_path)
+        self._files_changed = self._files_state()
+
+    def _merged_items(self):
+        pending = sorted(self.pending.items())
+        p = 0
+        for word, freq in self._items():
+            while p < len(pending) and pending[p][0] < word:
+                yield pending[p]
+                p += 1
+            if p < len(pending) and pending[p][0] == word:
+                freq += pending[p][1]
+                p += 1
+            yield word, freq
+        for item in pending[p:]:
+            yield item
+
+    def merge(self):
+        """Merges the pending words into the dictionary file."""
+        if self.path is None:
+            f = io.BytesIO()
+            write_dictionary(f, self._merged_items())
+            self.pending = Counter()
+            self._load(f.getvalue())
+            return
+
+        tmp_path = self.dictionary_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            write_dictionary(f, self._merged_items())
+        # The pending words are now in the new file, and the old one can't be replaced while it is mapped
+        self.close()
+        _replace(tmp_path, self.dictionary_path)
+        if os.path.exists(self.pending_path):
+            os.remove(self.pending_path)
+        self.refresh()
+
+    def clear(self):
+        """Removes every word from the dictionary."""
+        self._acquire()
+        try:
+            self.close()
+            if self.path is not None:
+                for filename in (self.dictionary_path, self.pending_path):
+                    if os.path.exists(filename):
+                        os.remove(filename)
+        finally:
+            self._release()
+
+    def within(self, text, maxdist=2, prefix=0):
+        """
+        Yields ``(distance, word)`` for every word in the dictionary within ``maxdist`` edits of ``text``.
+        If ``prefix`` is given, only words that start with the same number of characters as the text are checked.
+        """
+        automaton = LevenshteinAutomaton(text, maxdist)
+        i = 0
+        end = self._count
+        if prefix:
+            i = self._index_of_first(text[:prefix])
+            if i < end and self._word_at(i).startswith(text[:prefix]):
+                end = self._index_after(text[:prefix], i)
+            else:
+                end = i
+        previous = ''
+        states = [automaton.start]
+        while i < end:
+            word = self._word_at(i)
+            # Reuse the automaton states for the prefix shared with the previous word
+            shared = 0
+            for a, b in zip(previous, word):
+                if a != b:
+                    break
+                shared += 1
+            del states[shared + 1:]
+
+            skipped = False
+            for depth in range(shared, len(word)):
+                state = automaton.step(states[-1], word[depth])
+                if state is None:
+                    # No word starting with this prefix can be close enough
+                    previous = word[:depth]
+                    i = self._index_after(word[:depth + 1], i)
+                    skipped = True
+                    break
+                states.append(state)
+            if skipped:
+                continue
+
+            distance = automaton.distance(states[-1])
+            if distance is not None:
+                yield distance, word
+            previous = word
+            i += 1
+
+        for word in self.pending:
+            if not word.startswith(text[:prefix]):
+                continue
+            distance = bounded_distance(text, word, maxdist)
+            if distance is not None and self._index_of(word) is None:
+                yield distance, word
+
+    def suggest(self, text, limit=1, maxdist=2):
+        """
+        Returns up to ``limit`` words within ``maxdist`` edits of ``text``,
+        the closest and then most frequent first.
+
+        Most misspellings get the first letter right, so words starting with
+        the same letter are checked first, which only needs to look at a small
+        part of the dictionary. Other words are only checked if none of these are close enough.
+        """
+        self.refresh()
+        for prefix in (1, 0):
+            candidates = [
+                (distance, -self.frequency(word), word)
+                for distance, word in self.within(text, maxdist, prefix=prefix)
+            ]
+            if candidates:
+                break
+        return [word for distance, freq, word in sorted(candidates)[:limit]]
@@ -5,3 +5,7 @@ class Config(AppConfig):
     name = 'aristotle_mdr.contrib.slots'
     label = 'aristotle_mdr_slots'
     verbose_name = 'Aristotle Concept Slots'
+
+    def ready(self):
+        from aristotle_mdr.contrib.slots.models import connect_concept_signals
+        connect_concept_signals()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+VALUE_KEY_LENGTH = 255
+
+
+def populate_value_keys(apps, schema_editor):
+    Slot = apps.get_model('aristotle_mdr_slots', 'Slot')
+    db_alias = schema_editor.connection.alias
+    for pk, value in Slot.objects.using(db_alias).values_list('pk', 'value').iterator():
+        Slot.objects.using(db_alias).filter(pk=pk).update(value_key=value[:VALUE_KEY_LENGTH])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aristotle_mdr_slots', '0004_switch_to_concept_relations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slot',
+            name='value_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_value_keys, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='slot',
+            index_together=set([('concept', 'name', 'value_key'), ('name', 'value_key', 'concept')]),
+        ),
+    ]
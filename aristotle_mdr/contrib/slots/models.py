@@ -5,20 +5,31 @@ Aristotle MDR 11179 Slots models
 These are based on the Slots definition in ISO/IEC 11179 Part 3 - 7.2.2.4
 """
 
+import hashlib
+import json
+import uuid
+
 from django.apps import apps
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
 from django.contrib.contenttypes.models import ContentType
 from django.conf.global_settings import LANGUAGES
 from django.core.exceptions import ValidationError
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
-from django.utils.encoding import python_2_unicode_compatible  # Python 2
+from django.utils.encoding import force_text, python_2_unicode_compatible  # Python 2
 
 from model_utils import Choices
 from model_utils.models import TimeStampedModel
 
 from aristotle_mdr import models as MDR
 from aristotle_mdr.fields import ConceptForeignKey
+from aristotle_mdr.perms import membership_version
+from aristotle_mdr.utils import fetch_aristotle_settings
+
+VALUE_KEY_LENGTH = 255
 
 
 @python_2_unicode_compatible  # Python 2
@@ -29,10 +40,49 @@ class Slot(TimeStampedModel):
     type = models.CharField(max_length=256, blank=True)  # Or some other sane length
     concept = ConceptForeignKey(MDR._concept, related_name='slots')
     value = models.TextField()
+    # The start of the value, which unlike the value can be indexed, to look up slots by value
+    value_key = models.CharField(max_length=VALUE_KEY_LENGTH, blank=True, editable=False)
+
+    class Meta:
+        index_together = [
+            ('concept', 'name', 'value_key'),
+            ('name', 'value_key', 'concept'),
+        ]
 
     def __str__(self):
         return u"{0} - {1}".format(self.name, self.value)
 
+    def save(self, *args, **kwargs):
+        self.value_key = make_value_key(self.value)
+        super(Slot, self).save(*args, **kwargs)
+
+
+def make_value_key(value):
+    return force_text(value)[:VALUE_KEY_LENGTH]
+
+
+def slot_value_q(name, values):
+    """
+    Returns the filters for slots with the name and any of the values, using the slot indexes.
+    """
+    values = [force_text(v) for v in values]
+    return models.Q(name=name, value_key__in=[make_value_key(v) for v in values], value__in=values)
+
+
+def filter_by_slots(queryset, slot_filters):
+    """
+    Filters a queryset of items to those with a slot with one of the values for
+    each slot name in ``slot_filters``, a dictionary of slot names and lists of values.
+
+    Each slot name is matched with a subquery on the slot indexes, rather than
+    joining the slots table to the items once for every slot.
+    """
+    for name, values in slot_filters.items():
+        queryset = queryset.filter(
+            pk__in=Slot.objects.filter(slot_value_q(name, values)).values('concept')
+        )
+    return queryset
+
 
 def concepts_with_similar_slots(user, name=None, _type=None, value=None, slot=None):
     assert(slot is not None or _type is not None or name is not None)
@@ -51,9 +101,139 @@ def concepts_with_similar_slots(user, name=None, _type=None, value=None, slot=No
         slots = slots.filter(slots__type=_type)
 
     if value is not None:
-        slots = slots.filter(slots__value=value)
+        slots = slots.filter(slots__value_key=make_value_key(value), slots__value=value)
 
     if slot is not None:
         slots = slots.exclude(id=slot.concept.id)
 
     return slots.distinct()
+
+
+def slot_value_counts(queryset):
+    """
+    Returns the number of items in a queryset with each slot name and value,
+    as a list of ``(name, [(value, count), ...])``, in one grouped query.
+    """
+    rows = Slot.objects.filter(
+        concept__in=queryset.order_by().values('pk')
+    ).values('name', 'value').annotate(
+        count=Count('concept', distinct=True)
+    ).order_by('name', 'value')
+    counts = []
+    for row in rows:
+        if not counts or counts[-1][0] != row['name']:
+            counts.append((row['name'], []))
+        counts[-1][1].append((row['value'], row['count']))
+    return counts
+
+
+def slot_counts_version_key(model):
+    return 'aristotle_slots_counts_version_%s_%s' % (model._meta.app_label, model._meta.model_name)
+
+
+def slot_counts_version(model):
+    """
+    Returns an opaque token that changes whenever the slots of a type of item
+    change, or its items move or change visibility.
+    """
+    key = slot_counts_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    return version
+
+
+def cached_slot_value_counts(queryset, user, filters=None):
+    """
+    Returns ``slot_value_counts`` for a queryset of items of one type that is
+    visible to ``user``, with the ``filters`` it was made with.
+
+    Counts are cached per type of item until its slots change or its items move
+    or change visibility, for the ``SLOT_COUNT_CACHE_SECONDS`` setting at the
+    most. Anonymous users and superusers share cached counts, other users'
+    counts are cached for them alone.
+    """
+    timeout = fetch_aristotle_settings().get('SLOT_COUNT_CACHE_SECONDS', 300)
+    if not timeout:
+        return slot_value_counts(queryset)
+
+    if user.is_anonymous():
+        signature = 'public'
+    elif user.is_superuser:
+        signature = 'superuser'
+    else:
+        signature = 'user_%s_%s' % (user.pk, membership_version(user))
+    normalised = json.dumps({
+        'filters': sorted(
+            (force_text(k), sorted(force_text(v) for v in values))
+            for k, values in (filters or {}).items()
+        ),
+        'user': signature,
+    }, sort_keys=True)
+    model = queryset.model
+    key = 'aristotle_slots_counts_%s_%s_%s' % (
+        model._meta.model_name,
+        hashlib.md5(normalised.encode('utf-8')).hexdigest(),
+        slot_counts_version(model),
+    )
+    counts = cache.get(key, None)
+    if counts is None:
+        counts = slot_value_counts(queryset)
+        cache.set(key, counts, timeout)
+    return counts
+
+
+def clear_slot_counts(model):
+    cache.delete(slot_counts_version_key(model))
+
+
+def slot_changed(sender, instance, **kwargs):
+    try:
+        concept = MDR._concept.objects.select_related('uuid').get(pk=instance.concept_id)
+    except MDR._concept.DoesNotExist:
+        return
+    if concept.uuid_id is not None:
+        try:
+            clear_slot_counts(apps.get_model(concept.uuid.app_label, concept.uuid.model_name))
+            return
+        except LookupError:
+            pass
+    clear_slot_counts(concept.item.__class__)
+
+
+# Fields of an item that change who can see it
+VISIBILITY_FIELDS = ['workgroup', '_is_public', '_is_locked']
+
+
+def concept_saved(sender, instance, created, **kwargs):
+    # New items have no slots yet, and other edits don't change the counts unless the item moved
+    if not created and not kwargs.get('raw') and instance.tracker.has_changed('workgroup_id'):
+        clear_slot_counts(instance._meta.concrete_model)
+
+
+def concept_visibility_changed(sender, concept, **kwargs):
+    clear_slot_counts(concept._meta.concrete_model)
+
+
+def concepts_bulk_changed(sender, concepts, changed_fields, **kwargs):
+    if not set(changed_fields) & set(VISIBILITY_FIELDS):
+        return
+    for model in set(concept.__class__ for concept in concepts.select_subclasses()):
+        clear_slot_counts(model)
+
+
+def connect_concept_signals():
+    """
+    Clears the slot counts of a type of item when one of its items moves or changes
+    visibility. Called once the apps are ready, so only item types are connected.
+    """
+    for model in apps.get_models():
+        if issubclass(model, MDR._concept):
+            post_save.connect(concept_saved, sender=model)
+    MDR.concept_visibility_updated.connect(concept_visibility_changed)
+    MDR.concepts_bulk_updated.connect(concepts_bulk_changed)
+
+
+post_save.connect(slot_changed, sender=Slot)
+post_delete.connect(slot_changed, sender=Slot)
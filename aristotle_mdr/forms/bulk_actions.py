@@ -3,6 +3,7 @@ from django.conf import settings
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
 from django.db import transaction
+from django.db.models import Q
 from django.forms import HiddenInput
 from django.utils import timezone
 from django.utils.html import mark_safe
@@ -13,14 +14,18 @@ from bootstrap3_datetime.widgets import DateTimePicker
 import aristotle_mdr.models as MDR
 from aristotle_mdr.forms import ChangeStatusForm
 from aristotle_mdr.perms import (
-    user_can_view,
     user_is_registrar,
     user_is_workgroup_manager,
     user_can_move_any_workgroup
 )
 from aristotle_mdr.forms.creation_wizards import UserAwareForm
 from aristotle_mdr.contrib.autocomplete import widgets
-from aristotle_mdr.utils import fetch_aristotle_settings, fetch_aristotle_downloaders
+from aristotle_mdr.contrib.channels.utils import fire
+from aristotle_mdr.utils import fetch_aristotle_settings, fetch_aristotle_downloaders, on_commit
+
+
+# The default number of items changed in each transaction by chunked bulk actions
+BULK_ACTION_CHUNK_SIZE = 100
 
 
 class ForbiddenAllowedModelMultipleChoiceField(forms.ModelMultipleChoiceField):
@@ -81,7 +86,7 @@ class BulkActionForm(UserAwareForm):
         required=False,
         widget=HiddenInput()
     )
-    qs = forms.CharField(
+    select_all_list = forms.CharField(
         label=_("All items"),
         required=False,
         widget=HiddenInput()
@@ -101,6 +106,7 @@ class BulkActionForm(UserAwareForm):
     def __init__(self, form, *args, **kwargs):
         initial_items = kwargs.pop('items', [])
         self.request = kwargs.pop('request')
+        self.selection = None
         if 'user' in kwargs.keys():
             self.user = kwargs.get('user', None)
             queryset = MDR._concept.objects.visible(self.user)
@@ -121,15 +127,17 @@ class BulkActionForm(UserAwareForm):
     @property
     def items_to_change(self):
         if bool(self.cleaned_data.get('all_in_queryset', False)):
-            filters = {}
-            from aristotle_mdr.utils.cached_querysets import get_queryset_from_uuid
-            items = get_queryset_from_uuid(self.cleaned_data.get('qs', ""), MDR._concept)
-
-            _slice = {"low": items.query.low_mark, "high": items.query.high_mark}
-            items.query.low_mark = 0
-            items.query.high_mark = None
-            items = items.filter(**filters).visible(self.user)
-            items.query.set_limits(**_slice)
+            if self.selection is None:
+                # The list is only stored once an action is applied to all of it,
+                # so later changes to the list don't change what is acted on
+                from aristotle_mdr.views.utils import select_all_queryset
+                queryset = select_all_queryset(self.cleaned_data.get('select_all_list', ''), self.request)
+                if queryset is None:
+                    return MDR._concept.objects.none()
+                self.selection = MDR.BulkActionSelection.objects.create_from_queryset(
+                    queryset.visible(self.user), self.user
+                )
+            items = self.selection.concepts
         else:
             items = self.cleaned_data.get('items')
         return items
@@ -155,6 +163,128 @@ class LoggedInBulkActionForm(BulkActionForm):
         return user.is_active
 
 
+class ChunkedBulkActionForm(BulkActionForm):
+    """
+    A bulk action that applies its changes in chunks of
+    ``BULK_ACTION_CHUNK_SIZE`` items, with one transaction and one revision
+    per chunk. Progress is recorded against a ``BulkActionJob`` so that it can
+    be polled and cancelled, and when more than
+    ``BULK_ACTION_BACKGROUND_THRESHOLD`` items are selected the job is handed
+    to a background worker.
+
+    Subclasses implement ``process_chunk`` and ``get_message`` instead of
+    ``make_changes``.
+    """
+
+    def check_permissions(self):
+        """
+        Raise ``PermissionDenied`` if the user can't perform this action at all.
+        Called before a job is created, and again if the job is run by a worker.
+        """
+        pass
+
+    def prepare(self):
+        """
+        Called once before the first chunk is processed.
+        """
+        pass
+
+    def process_chunk(self, items):
+        """
+        Applies the action to a queryset of items, and returns a tuple of
+        lists of the items that succeeded and failed.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def get_message(self, num_items, success, failed):
+        """
+        Returns the message shown to the user, and recorded against each
+        revision, after ``num_items`` items have been processed.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def get_revision_comment(self, message):
+        return message
+
+    @classmethod
+    def action_name(cls):
+        return "%s.%s" % (cls.__module__, cls.__name__)
+
+    def make_changes(self):
+        self.check_permissions()
+        job = self.create_job()
+
+        threshold = fetch_aristotle_settings().get('BULK_ACTION_BACKGROUND_THRESHOLD', None)
+        if threshold is not None and job.total > threshold:
+            fire("bulk_actions.run_bulk_action_job", obj=job)
+            job.refresh_from_db()
+            if not job.is_finished:
+                return mark_safe(_(
+                    "%(num_items)s items are being processed in the background - "
+                    "<a href='%(url)s'>check the progress here</a>."
+                ) % {
+                    'num_items': job.total,
+                    'url': reverse('aristotle:bulk_action_status', args=[job.pk]),
+                })
+            return job.message
+        return self.run(job)
+
+    def serialize_data(self):
+        import json
+        from django.core.serializers.json import DjangoJSONEncoder
+        if hasattr(self.data, 'lists'):
+            data = dict(self.data.lists())
+        else:
+            data = dict(
+                (k, v if isinstance(v, (list, tuple)) else [v])
+                for k, v in self.data.items()
+            )
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+    def create_job(self):
+        items = self.items_to_change
+        selection = self.selection
+        if selection is None:
+            selection = MDR.BulkActionSelection.objects.create_from_queryset(items, self.user)
+        return MDR.BulkActionJob.objects.create(
+            user=self.user,
+            action=self.action_name(),
+            form_data=self.serialize_data(),
+            selection=selection,
+            total=selection.items.count(),
+        )
+
+    def run(self, job):
+        import reversion
+        chunk_size = fetch_aristotle_settings().get('BULK_ACTION_CHUNK_SIZE', BULK_ACTION_CHUNK_SIZE)
+        success = []
+        failed = []
+
+        job.set_state(MDR.BULK_ACTION_JOB_STATES.running)
+        self.prepare()
+        for chunk in job.chunks(chunk_size):
+            if job.was_cancelled():
+                message = _("Action cancelled after %(num_items)s items were processed.") % {
+                    'num_items': job.processed
+                }
+                job.set_state(MDR.BULK_ACTION_JOB_STATES.cancelled, message)
+                return message
+
+            with transaction.atomic(), reversion.revisions.create_revision():
+                reversion.revisions.set_user(self.user)
+                chunk_success, chunk_failed = self.process_chunk(chunk)
+                reversion.revisions.set_comment(
+                    self.get_revision_comment(self.get_message(len(chunk), chunk_success, chunk_failed))
+                )
+            success.extend(chunk_success)
+            failed.extend(chunk_failed)
+            job.add_progress(len(chunk), len(chunk_failed))
+
+        message = self.get_message(job.processed, success, failed)
+        job.set_state(MDR.BULK_ACTION_JOB_STATES.complete, message)
+        return message
+
+
 class AddFavouriteForm(LoggedInBulkActionForm):
     classes="fa-bookmark"
     action_text = _('Add favourite')
@@ -162,14 +292,16 @@ class AddFavouriteForm(LoggedInBulkActionForm):
 
     def make_changes(self):
         items = self.items_to_change
-        bad_items = [str(i.id) for i in items if not user_can_view(self.user, i)]
-        items = items.visible(self.user)
-        self.user.profile.favourites.add(*items)
+        item_ids = list(items.values_list('pk', flat=True))
+        visible_ids = set(items.visible(self.user).values_list('pk', flat=True))
+        bad_items = [str(pk) for pk in item_ids if pk not in visible_ids]
+        # Adding by id lets the relation insert only the missing rows in one query
+        self.user.profile.favourites.add(*visible_ids)
         return _(
             "%(num_items)s items favourited. \n"
             "Some items failed, they had the id's: %(bad_ids)s"
         ) % {
-            'num_items': len(items),
+            'num_items': len(visible_ids),
             'bad_ids': ",".join(bad_items)
         }
 
@@ -180,12 +312,12 @@ class RemoveFavouriteForm(LoggedInBulkActionForm):
     items_label = "Items that will be removed from your favourites list"
 
     def make_changes(self):
-        items = self.items_to_change
-        self.user.profile.favourites.remove(*items)
-        return _('%(num_items)s items removed from favourites') % {'num_items': len(items)}
+        item_ids = list(self.items_to_change.values_list('pk', flat=True))
+        self.user.profile.favourites.remove(*item_ids)
+        return _('%(num_items)s items removed from favourites') % {'num_items': len(item_ids)}
 
 
-class ChangeStateForm(ChangeStatusForm, BulkActionForm):
+class ChangeStateForm(ChangeStatusForm, ChunkedBulkActionForm):
     confirm_page = "aristotle_mdr/actions/bulk_actions/change_status.html"
     classes="fa-university"
     action_text = _('Change registration status')
@@ -195,61 +327,62 @@ class ChangeStateForm(ChangeStatusForm, BulkActionForm):
         super(ChangeStateForm, self).__init__(*args, **kwargs)
         self.add_registration_authority_field()
 
-    def make_changes(self):
-        import reversion
+    def check_permissions(self):
         if not self.user.profile.is_registrar:
             raise PermissionDenied
+
+    def prepare(self):
+        self.registration_date = self.cleaned_data['registrationDate']
+        if self.registration_date is None:
+            self.registration_date = timezone.now().date()
+
+    def process_chunk(self, items):
         ras = self.cleaned_data['registrationAuthorities']
         state = self.cleaned_data['state']
-        items = self.items_to_change
-        regDate = self.cleaned_data['registrationDate']
         cascade = self.cleaned_data['cascadeRegistration']
         changeDetails = self.cleaned_data['changeDetails']
         failed = []
         success = []
-        with transaction.atomic(), reversion.revisions.create_revision():
-            reversion.revisions.set_user(self.user)
-
-            if regDate is None:
-                regDate = timezone.now().date()
-            for item in items:
-                for ra in ras:
-                    if cascade:
-                        register_method = ra.cascaded_register
-                    else:
-                        register_method = ra.register
-
-                    r = register_method(
-                        item,
-                        state,
-                        self.request.user,
-                        changeDetails=changeDetails,
-                        registrationDate=regDate,
-                    )
-                    for f in r['failed']:
-                        failed.append(f)
-                    for s in r['success']:
-                        success.append(s)
-            failed = list(set(failed))
-            success = list(set(success))
-            bad_items = sorted([str(i.id) for i in failed])
-            message = _(
-                "%(num_items)s items registered in %(num_ra)s registration authorities. \n"
-                "Some items failed, they had the id's: %(bad_ids)s"
-            ) % {
-                'num_items': len(items),
-                'num_ra': len(ras),
-                'bad_ids': ",".join(bad_items)
-            }
-            reversion.revisions.set_comment(changeDetails + "\n\n" + message)
-            return message
+        for item in items:
+            for ra in ras:
+                if cascade:
+                    register_method = ra.cascaded_register
+                else:
+                    register_method = ra.register
+
+                r = register_method(
+                    item,
+                    state,
+                    self.user,
+                    changeDetails=changeDetails,
+                    registrationDate=self.registration_date,
+                )
+                for f in r['failed']:
+                    failed.append(f)
+                for s in r['success']:
+                    success.append(s)
+        return list(set(success)), list(set(failed))
+
+    def get_message(self, num_items, success, failed):
+        bad_items = sorted(set([str(i.id) for i in failed]))
+        return _(
+            "%(num_items)s items registered in %(num_ra)s registration authorities. \n"
+            "Some items failed, they had the id's: %(bad_ids)s"
+        ) % {
+            'num_items': num_items,
+            'num_ra': len(self.cleaned_data['registrationAuthorities']),
+            'bad_ids': ",".join(bad_items)
+        }
+
+    def get_revision_comment(self, message):
+        return self.cleaned_data['changeDetails'] + "\n\n" + message
 
     @classmethod
     def can_use(cls, user):
         return user_is_registrar(user)
 
 
-class RequestReviewForm(LoggedInBulkActionForm):
+class RequestReviewForm(ChunkedBulkActionForm, LoggedInBulkActionForm):
     confirm_page = "aristotle_mdr/actions/bulk_actions/request_review.html"
     classes="fa-flag"
     action_text = _('Request review')
@@ -279,47 +412,43 @@ class RequestReviewForm(LoggedInBulkActionForm):
     def __init__(self, *args, **kwargs):
         super(RequestReviewForm, self).__init__(*args, **kwargs)
 
-    def make_changes(self):
-        import reversion
-        ra = self.cleaned_data['registration_authority']
-        state = self.cleaned_data['state']
-        items = self.items_to_change
-        cascade = self.cleaned_data['cascade_registration']
-        registration_date = self.cleaned_data['registration_date']
-        message = self.cleaned_data['message']
-
-        with transaction.atomic(), reversion.revisions.create_revision():
-            reversion.revisions.set_user(self.user)
-
-            review = MDR.ReviewRequest.objects.create(
-                requester=self.user,
-                registration_authority=ra,
-                registration_date=registration_date,
-                message=message,
-                state=state,
-                cascade_registration=cascade
-            )
-            failed = []
-            success = []
-            for item in items:
-                if item.can_view(self.user):
-                    success.append(item)
-                else:
-                    failed.append(item)
+    def prepare(self):
+        self.review = MDR.ReviewRequest.objects.create(
+            requester=self.user,
+            registration_authority=self.cleaned_data['registration_authority'],
+            registration_date=self.cleaned_data['registration_date'],
+            message=self.cleaned_data['message'],
+            state=self.cleaned_data['state'],
+            cascade_registration=self.cleaned_data['cascade_registration']
+        )
+
+    def process_chunk(self, items):
+        visible = items.visible(self.user).values_list('pk', flat=True)
+        visible = set(visible)
+        failed = []
+        success = []
+        for item in items:
+            if item.pk in visible:
+                success.append(item)
+            else:
+                failed.append(item)
 
-            review.concepts = success
+        self.review.concepts.add(*success)
+        return success, failed
 
-            user_message = mark_safe(_(
-                "%(num_items)s items requested for review - <a href='%(url)s'>see the review here</a>."
-            ) % {
-                'num_items': len(success),
-                'url': reverse('aristotle:userReviewDetails', args=[review.id])
-            })
-            reversion.revisions.set_comment(message + "\n\n" + user_message)
-            return user_message
+    def get_message(self, num_items, success, failed):
+        return mark_safe(_(
+            "%(num_items)s items requested for review - <a href='%(url)s'>see the review here</a>."
+        ) % {
+            'num_items': len(success),
+            'url': reverse('aristotle:userReviewDetails', args=[self.review.id])
+        })
+
+    def get_revision_comment(self, message):
+        return self.cleaned_data['message'] + "\n\n" + message
 
 
-class ChangeWorkgroupForm(BulkActionForm):
+class ChangeWorkgroupForm(ChunkedBulkActionForm):
     confirm_page = "aristotle_mdr/actions/bulk_actions/change_workgroup.html"
     classes="fa-users"
     action_text = _('Change workgroup')
@@ -339,56 +468,107 @@ class ChangeWorkgroupForm(BulkActionForm):
             widget=forms.Textarea
         )
 
-    def make_changes(self):
+    def check_permissions(self):
+        from aristotle_mdr.perms import user_can_move_to_workgroup
+        if not user_can_move_to_workgroup(self.user, self.cleaned_data['workgroup']):
+            raise PermissionDenied
+
+    def prepare(self):
+        self.move_from_checks = {}  # Cache workgroup permissions as we check them to speed things up
+
+    def can_remove_from(self, workgroup_ids):
+        from aristotle_mdr.perms import user_can_remove_from_workgroup
+        unchecked = [wg for wg in workgroup_ids if wg not in self.move_from_checks]
+        if None in unchecked:
+            # Only superusers can claim items that are not in a workgroup
+            self.move_from_checks[None] = self.user.is_superuser
+        for wg in MDR.Workgroup.objects.filter(pk__in=unchecked):
+            self.move_from_checks[wg.pk] = user_can_remove_from_workgroup(self.user, wg)
+        return [wg for wg in workgroup_ids if self.move_from_checks.get(wg, False)]
+
+    def process_chunk(self, items):
+        """
+        Moves the chunk with a single ``UPDATE``, checking permissions once per
+        distinct source workgroup. As this bypasses ``save()``, the moved items
+        are reindexed and their watchers notified in one batch afterwards.
+        """
         import reversion
-        from aristotle_mdr.perms import user_can_remove_from_workgroup, user_can_move_to_workgroup
         new_workgroup = self.cleaned_data['workgroup']
-        changeDetails = self.cleaned_data['changeDetails']
-        items = self.cleaned_data['items']
 
-        if not user_can_move_to_workgroup(self.user, new_workgroup):
-            raise PermissionDenied
+        source_workgroups = set(items.values_list('workgroup', flat=True))
+        movable = self.can_remove_from(source_workgroups)
+
+        moving = Q(workgroup__in=[wg for wg in movable if wg is not None])
+        if None in movable:
+            moving |= Q(workgroup__isnull=True)
+
+        success = list(items.filter(moving))
+        failed = list(items.exclude(pk__in=[i.pk for i in success]))
+        if not success:
+            return success, failed
+
+        moved_ids = [i.pk for i in success]
+        moved_from = {}
+        for item in success:
+            moved_from[item.workgroup_id] = moved_from.get(item.workgroup_id, 0) + 1
+        MDR._concept.objects.filter(pk__in=moved_ids).update(
+            workgroup=new_workgroup,
+            modified=timezone.now()
+        )
+        # The update doesn't send signals, so adjust the workgroup counters here
+        for workgroup_id, count in moved_from.items():
+            if workgroup_id is not None:
+                MDR.WorkgroupCounter.objects.add_items(workgroup_id, -count)
+        MDR.WorkgroupCounter.objects.add_items(new_workgroup.pk, len(moved_ids))
+        for item in success:
+            item.workgroup = new_workgroup
+
+        # Version each item as its own type, so the move shows in its history
+        # and compare views like any other edit. Each version also snapshots
+        # the objects the item follows, such as its statuses and slots.
+        for item in MDR._concept.objects.filter(pk__in=moved_ids).select_subclasses():
+            if reversion.revisions.is_registered(item.__class__):
+                reversion.revisions.add_to_revision(item)
+
+        def moved():
+            # Wait for the chunk to commit, so workers never see items that haven't moved yet
+            MDR.concepts_bulk_updated.send(
+                sender=MDR._concept,
+                concepts=MDR._concept.objects.filter(pk__in=moved_ids),
+                changed_fields=['workgroup'],
+            )
+            fire(
+                "concept_changes.concepts_moved_workgroup",
+                obj=new_workgroup,
+                concept_ids=moved_ids,
+                user_id=self.user.pk,
+            )
+        on_commit(moved)
+        return success, failed
 
-        move_from_checks = {}  # Cache workgroup permissions as we check them to speed things up
+    def get_message(self, num_items, success, failed):
+        new_workgroup = self.cleaned_data['workgroup']
+        bad_items = sorted([str(i.id) for i in failed])
+        if not bad_items:
+            message = _(
+                "%(num_items)s items moved into the workgroup '%(new_wg)s'. \n"
+            ) % {
+                'new_wg': new_workgroup.name,
+                'num_items': len(success),
+            }
+        else:
+            message = _(
+                "%(num_items)s items moved into the workgroup '%(new_wg)s'. \n"
+                "Some items failed, they had the id's: %(bad_ids)s"
+            ) % {
+                'new_wg': new_workgroup.name,
+                'num_items': len(success),
+                'bad_ids': ",".join(bad_items)
+            }
+        return message
 
-        failed = []
-        success = []
-        with transaction.atomic(), reversion.revisions.create_revision():
-            reversion.revisions.set_user(self.user)
-            for item in items:
-                can_move = move_from_checks.get(item.workgroup.pk, None)
-                if can_move is None:
-                    can_move = user_can_remove_from_workgroup(self.user, item.workgroup)
-                    move_from_checks[item.workgroup.pk] = can_move
-
-                if not can_move:
-                    failed.append(item)
-                else:
-                    success.append(item)
-                    item.workgroup = new_workgroup
-                    item.save()
-
-            failed = list(set(failed))
-            success = list(set(success))
-            bad_items = sorted([str(i.id) for i in failed])
-            if not bad_items:
-                message = _(
-                    "%(num_items)s items moved into the workgroup '%(new_wg)s'. \n"
-                ) % {
-                    'new_wg': new_workgroup.name,
-                    'num_items': len(success),
-                }
-            else:
-                message = _(
-                    "%(num_items)s items moved into the workgroup '%(new_wg)s'. \n"
-                    "Some items failed, they had the id's: %(bad_ids)s"
-                ) % {
-                    'new_wg': new_workgroup.name,
-                    'num_items': len(success),
-                    'bad_ids': ",".join(bad_items)
-                }
-            reversion.revisions.set_comment(changeDetails + "\n\n" + message)
-            return message
+    def get_revision_comment(self, message):
+        return self.cleaned_data['changeDetails'] + "\n\n" + message
 
     @classmethod
     def can_use(cls, user):
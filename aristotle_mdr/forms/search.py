@@ -1,8 +1,20 @@
 import datetime
+import hashlib
+import json
+import logging
+import uuid
+from collections import defaultdict, OrderedDict
+from timeit import default_timer
+
 from django import forms
 from django.core.exceptions import ImproperlyConfigured
 from django.apps import apps
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
 from django.utils.module_loading import import_string
 from django.utils.translation import ugettext_lazy as _
 
@@ -20,8 +32,10 @@ from aristotle_mdr.widgets import (
     BootstrapDropdownSelectMultiple, BootstrapDropdownIntelligentDate,
     BootstrapDropdownSelect, BootstrapDateTimePicker
 )
+from aristotle_mdr.perms import membership_version, user_permission_terms
 from aristotle_mdr.utils import fetch_aristotle_settings, fetch_metadata_apps
 
+logger = logging.getLogger(__name__)
 
 QUICK_DATES = Choices(
     ('', 'anytime', _('Any time')),
@@ -118,6 +132,25 @@ def get_permission_sqs(*args, **kwargs):
     return psqs_kls(*args, **kwargs)
 
 
+SEARCH_INDEX_VERSION_KEY = 'aristotle_search_index_version'
+
+
+def search_index_version():
+    """
+    Returns an opaque token that changes whenever the search index is updated,
+    so anything cached from search results can be keyed on it.
+    """
+    version = cache.get(SEARCH_INDEX_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(SEARCH_INDEX_VERSION_KEY, version, None)
+    return version
+
+
+def search_index_updated():
+    cache.delete(SEARCH_INDEX_VERSION_KEY)
+
+
 class EmptyPermissionSearchQuerySet(EmptySearchQuerySet):
     # Just like a Haystack EmptySearchQuerySet, this behaves like a PermissionsSearchQuerySet
     # But returns nothing all the time.
@@ -144,22 +177,25 @@ class PermissionSearchQuerySet(SearchQuerySet):
             return sqs
 
         q |= SQ(submitter_id=user.pk)  # users can see items they create
+        terms = user_permission_terms(user)
         if user.is_superuser:
             q = SQ()  # Super-users can see everything
         else:
             # Non-registrars can only see public things or things in their workgroup
             # if they have no workgroups they won't see anything extra
-            if user.profile.workgroups.count() > 0:
-                # for w in user.profile.workgroups.all():
-                #    q |= SQ(workgroup=str(w.id))
-                q |= SQ(workgroup__in=[int(w.id) for w in user.profile.workgroups.all()])
-            if user.profile.is_registrar:
+            if terms['workgroups']:
+                q |= SQ(workgroup__in=[int(w) for w in terms['workgroups']])
+            if terms['registration_authorities']:
                 # if registrar, also filter through items in the registered in their authorities
-                q |= SQ(registrationAuthorities__in=[str(r.id) for r in user.profile.registrarAuthorities])
+                q |= SQ(registrationAuthorities__in=[str(r) for r in terms['registration_authorities']])
         if public_only:
             q &= SQ(is_public=True)
         if user_workgroups_only:
-            q &= SQ(workgroup__in=[str(w.id) for w in user.profile.workgroups.all()])
+            if user.is_superuser:
+                workgroups = MDR.Workgroup.objects.values_list('pk', flat=True)
+            else:
+                workgroups = terms['workgroups']
+            q &= SQ(workgroup__in=[str(w) for w in workgroups])
 
         if q:
             sqs = sqs.filter(q)
@@ -181,6 +217,64 @@ class PermissionSearchQuerySet(SearchQuerySet):
         return sqs
 
 
+def load_concepts(pks):
+    """
+    Load the items with the given primary keys in a single query, as their
+    subclasses, with their workgroups and current statuses (and registration
+    authorities) prefetched. Returns a dictionary of the items by primary key.
+    """
+    today = timezone.now().date()
+    current_statuses = MDR.Status.objects.filter(
+        Q(registrationDate__lte=today) &
+        (Q(until_date__gte=today) | Q(until_date__isnull=True))
+    ).select_related('registrationAuthority').order_by(
+        "registrationAuthority", "-registrationDate", "-created"
+    )
+    items = MDR._concept.objects.select_subclasses().filter(
+        pk__in=pks
+    ).select_related('workgroup').prefetch_related(
+        Prefetch('statuses', queryset=current_statuses, to_attr='prefetched_current_statuses')
+    )
+
+    loaded = {}
+    for item in items:
+        # Keep the most recent status in each registration authority, like current_statuses()
+        seen_ras = set()
+        item.search_current_statuses = []
+        for status in item.prefetched_current_statuses:
+            if status.registrationAuthority_id not in seen_ras:
+                seen_ras.add(status.registrationAuthority_id)
+                item.search_current_statuses.append(status)
+        loaded[item.pk] = item
+    return loaded
+
+
+def hydrate_search_results(results):
+    """
+    Load the items for a page of search results in bulk.
+
+    Haystack loads the object for each search result separately, and the search
+    templates then look up the current statuses of each item. This loads every
+    item on the page in a single query (see ``load_concepts``), and attaches
+    them to the search results.
+    """
+    results = [result for result in results if result is not None]
+    pks_by_model = defaultdict(list)
+    for result in results:
+        if result.model is not None and issubclass(result.model, MDR._concept):
+            pks_by_model[result.model].append(int(result.pk))
+    if not pks_by_model:
+        return results
+
+    loaded = load_concepts([pk for pks in pks_by_model.values() for pk in pks])
+
+    for result in results:
+        item = loaded.get(int(result.pk)) if result.model in pks_by_model else None
+        if item is not None:
+            result.object = item
+    return results
+
+
 class TokenSearchForm(FacetedSearchForm):
     token_models = []
     kwargs = {}
@@ -345,6 +439,11 @@ class PermissionSearchForm(TokenSearchForm):
     # F for facet!
     # searchqueryset = PermissionSearchQuerySet
 
+    repeat_search = False
+    auto_correct_spell_search = False
+    auto_broaden_search = False
+    result_count = 0
+
     def __init__(self, *args, **kwargs):
         if 'searchqueryset' not in kwargs.keys() or kwargs['searchqueryset'] is None:
             kwargs['searchqueryset'] = get_permission_sqs()
@@ -378,7 +477,82 @@ class PermissionSearchForm(TokenSearchForm):
             return []
         return [f for f in self.filters if self.cleaned_data.get(f, False)]
 
+    def get_page_limits(self):
+        """
+        Return the start and end offsets of the requested page of results,
+        so the top page can be fetched in the same request as the hit count and facets.
+        """
+        from django.conf import settings
+        per_page = getattr(self, 'results_per_page', None)
+        if per_page is None:
+            per_page = getattr(settings, 'HAYSTACK_SEARCH_RESULTS_PER_PAGE', 20)
+        try:
+            page_no = max(int(self.request.GET.get('page', 1)), 1)
+        except (TypeError, ValueError):
+            page_no = 1
+        start = (page_no - 1) * per_page
+        return start, start + per_page
+
+    def record_timing(self, stage, started):
+        self.search_timings[stage] = self.search_timings.get(stage, 0) + (default_timer() - started)
+
+    def execute(self, sqs):
+        """
+        Run the search once for the requested page. Haystack returns the hit count,
+        facet counts and results from a single backend query and caches them on
+        the search queryset, so later calls to count(), facet_counts() and
+        slicing the same page don't go back to the backend.
+        """
+        started = default_timer()
+        start, end = self.get_page_limits()
+        sqs[start:end]
+        self.result_count = sqs.count()
+        self.record_timing('execute', started)
+        return sqs
+
+    def get_facet_cache_key(self):
+        """
+        Returns the key the facet counts for this search are cached under.
+
+        The key is made from the normalised filters, who is searching, and the
+        search index version, so the counts are recalculated once the index is
+        updated. Anonymous users share one set of cached facets, as do
+        superusers, but every other user has their own, as they can see the
+        items they submitted and those in their workgroups.
+        """
+        user = self.request.user
+        if user.is_anonymous():
+            signature = 'public'
+        elif user.is_superuser:
+            signature = 'superuser'
+        else:
+            # Users can see the items they submitted, so these can't be shared
+            signature = 'user_%s_%s' % (user.pk, membership_version(user))
+
+        filters = []
+        for name, value in self.cleaned_data.items():
+            if name in ['q', 'sort'] or value in [None, '', [], False]:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = sorted(force_text(v) for v in value)
+            else:
+                value = force_text(value)
+            filters.append((name, value))
+        normalised = {
+            'filters': sorted(filters),
+            'facets': sorted(self.request.GET.getlist('f', [])),
+            'tokens': sorted((k, force_text(v)) for k, v in self.kwargs.items()),
+            'models': sorted(
+                "%s.%s" % (m._meta.app_label, m._meta.model_name) for m in self.token_models
+            ),
+        }
+        digest = hashlib.md5(json.dumps(normalised, sort_keys=True).encode('utf-8')).hexdigest()
+        return 'aristotle_search_facets_%s_%s_%s' % (signature, search_index_version(), digest)
+
     def search(self, repeat_search=False):
+        if not repeat_search:
+            self.search_timings = OrderedDict()
+        started = default_timer()
         # First, store the SearchQuerySet received from other processing.
         sqs = super(PermissionSearchForm, self).search()
         if not self.token_models and self.get_models():
@@ -389,12 +563,22 @@ class PermissionSearchForm(TokenSearchForm):
         if not has_filter and not self.query_text:
             return self.no_query_found()
 
+        facet_cache_key = None
+        cached_facets = None
         if self.applied_filters and not self.query_text:  # and not self.kwargs:
             # If there is a filter, but no query then we'll force some results.
             sqs = self.searchqueryset.order_by('-modified')
             self.filter_search = True
             self.attempted_filter_search = True
 
+            # Filter only searches are used for browsing, so the same facets
+            # over the whole registry are asked for again and again.
+            facet_cache_seconds = fetch_aristotle_settings().get('SEARCH_FACET_CACHE_SECONDS', 600)
+            if facet_cache_seconds and not repeat_search:
+                facet_cache_key = self.get_facet_cache_key()
+                cached_facets = cache.get(facet_cache_key)
+        self.facets_from_cache = cached_facets is not None
+
         states = self.cleaned_data.get('state', None)
         ras = self.cleaned_data.get('ra', None)
         restriction = self.cleaned_data['res']
@@ -422,28 +606,6 @@ class PermissionSearchForm(TokenSearchForm):
             facets_details['applied'] = list(set(facets_details['applied'] + [value]))
             extra_facets_details[_facet] = facets_details
 
-        self.has_spelling_suggestions = False
-        if not self.repeat_search:
-
-            if sqs.count() < 5:
-                self.check_spelling(sqs)
-
-            if sqs.count() == 0:
-                if sqs.count() == 0 and self.has_spelling_suggestions:
-                    self.auto_correct_spell_search = True
-                    self.cleaned_data['q'] = self.suggested_query
-                elif has_filter and self.cleaned_data['q']:
-                    # If there are 0 results with a search term, and filters applied
-                    # lets be nice and remove the filters and try again.
-                    # There will be a big message on the search page that says what we did.
-                    for f in self.filters:
-                        self.cleaned_data[f] = None
-                    self.auto_broaden_search = True
-                # Re run the query with the updated details
-                sqs = self.search(repeat_search=True)
-            # Only apply sorting on the first pass through
-            sqs = self.apply_sorting(sqs)
-
         # Don't applying sorting on the facet as ElasticSearch2 doesn't like this.
         filters_to_facets = {
             'ra': 'registrationAuthorities',
@@ -451,7 +613,7 @@ class PermissionSearchForm(TokenSearchForm):
             'state': 'statuses',
         }
         for _filter, facet in filters_to_facets.items():
-            if _filter not in self.applied_filters:
+            if _filter not in self.applied_filters and not self.facets_from_cache:
                 # Don't do this: sqs = sqs.facet(facet, sort='count')
                 sqs = sqs.facet(facet)
 
@@ -461,7 +623,7 @@ class PermissionSearchForm(TokenSearchForm):
         }
         if self.request.user.is_active:
             for _filter, facet in logged_in_facets.items():
-                if _filter not in self.applied_filters:
+                if _filter not in self.applied_filters and not self.facets_from_cache:
                     # Don't do this: sqs = sqs.facet(facet, sort='count')
                     sqs = sqs.facet(facet)
 
@@ -482,18 +644,56 @@ class PermissionSearchForm(TokenSearchForm):
                             'allow_search': getattr(field, 'allow_search', False),
                         })
                         extra_facets_details[name]= x
-                        # Don't do this: sqs = sqs.facet(facet, sort='count')  # Why Sam, why?
-                        sqs = sqs.facet(name)
+                        if not self.facets_from_cache:
+                            # Don't do this: sqs = sqs.facet(facet, sort='count')  # Why Sam, why?
+                            sqs = sqs.facet(name)
 
-        self.facets = sqs.facet_counts()
+        self.extra_facets = extra_facets
+        self.extra_facets_details = extra_facets_details
+        self.record_timing('build', started)
 
-        if 'fields' in self.facets:
-            self.extra_facet_fields = [
-                (k, {'values': sorted(v, key=lambda x: -x[1])[:10], 'details': extra_facets_details[k]})
-                for k, v in self.facets['fields'].items()
-                if k in extra_facets
-            ]
+        if self.repeat_search:
+            # The outer search sorts and executes the query
+            return sqs
+
+        sqs = self.execute(self.apply_sorting(sqs))
+
+        if self.result_count == 0:
+            if self.has_spelling_suggestions:
+                self.auto_correct_spell_search = True
+                self.cleaned_data['q'] = self.suggested_query
+            elif has_filter and self.cleaned_data['q']:
+                # If there are 0 results with a search term, and filters applied
+                # lets be nice and remove the filters and try again.
+                # There will be a big message on the search page that says what we did.
+                for f in self.filters:
+                    self.cleaned_data[f] = None
+                self.auto_broaden_search = True
+            if self.auto_correct_spell_search or self.auto_broaden_search:
+                # Re run the query with the updated details
+                sqs = self.execute(self.apply_sorting(self.search(repeat_search=True)))
 
+        if self.facets_from_cache:
+            facets = cached_facets
+        else:
+            facets = sqs.facet_counts()
+            if facet_cache_key is not None:
+                cache.set(facet_cache_key, facets, facet_cache_seconds)
+        self.build_facets(facets)
+        logger.debug(
+            "Search for %r took %s", self.cleaned_data.get('q'),
+            ", ".join("%s: %.3fs" % timing for timing in self.search_timings.items())
+        )
+        return sqs
+
+    def build_facets(self, facets):
+        # Copy the facets so the counts cached on the search query aren't altered
+        self.facets = dict(facets)
+        extra_facets = self.extra_facets
+        extra_facets_details = self.extra_facets_details
+
+        if 'fields' in self.facets:
+            self.facets['fields'] = dict(self.facets['fields'])
             self.extra_facet_fields = [
                 (k, {
                     'values': [
@@ -511,46 +711,79 @@ class PermissionSearchForm(TokenSearchForm):
                 # Return the 5 top results for each facet in order of number of results.
                 self.facets['fields'][facet] = sorted(counts, key=lambda x: -x[1])[:10]
 
-        return sqs
+    @cached_property
+    def spelling(self):
+        """
+        Spelling suggestions need extra queries against the backend, so they are only
+        worked out when a template asks for them, or when a search had no results.
+        Suggestions are only made when a search has very few results.
+        """
+        spelling = {
+            'has_suggestions': False,
+            'suggestions': [],
+            'original_query': None,
+            'suggested_query': None,
+        }
+        if self.repeat_search or self.result_count >= 5 or not self.query_text:
+            return spelling
+
+        started = default_timer()
+        original_query = self.cleaned_data.get('q', "")
+
+        try:  # Python 2
+            from urllib import quote_plus
+        except:  # Python 3
+            from urllib.parse import quote_plus
+
+        suggestions = []
+        has_suggestions = False
+        suggested_query = []
+
+        # lets assume the words are ordered in importance
+        # So we suggest words in order
+        optimal_query = original_query
+        for token in original_query.split(" "):
+            if token:  # remove blanks
+                suggestion = self.searchqueryset.spelling_suggestion(token)
+                if suggestion:
+                    test_query = optimal_query.replace(token, suggestion)
+                    # Haystack can *over correct* so we'll do a quick search with the
+                    # suggested spelling to compare words against
+                    try:
+                        self.searchqueryset.auto_query(test_query)[0]
+                        suggested_query.append(suggestion)
+                        has_suggestions = True
+                        optimal_query = test_query
+                    except:
+                        suggestion = None
+                else:
+                    suggested_query.append(token)
+                suggestions.append((token, suggestion))
+        if optimal_query != original_query:
+            spelling.update({
+                'has_suggestions': has_suggestions,
+                'suggestions': suggestions,
+                'original_query': original_query,
+                'suggested_query': quote_plus(' '.join(suggested_query), safe=""),
+            })
+        self.record_timing('spelling', started)
+        return spelling
 
-    def check_spelling(self, sqs):
-        if self.query_text:
-            original_query = self.cleaned_data.get('q', "")
-
-            try:  # Python 2
-                from urllib import quote_plus
-            except:  # Python 3
-                from urllib.parse import quote_plus
-
-            suggestions = []
-            has_suggestions = False
-            suggested_query = []
-
-            # lets assume the words are ordered in importance
-            # So we suggest words in order
-            optimal_query = original_query
-            for token in self.cleaned_data.get('q', "").split(" "):
-                if token:  # remove blanks
-                    suggestion = self.searchqueryset.spelling_suggestion(token)
-                    if suggestion:
-                        test_query = optimal_query.replace(token, suggestion)
-                        # Haystack can *over correct* so we'll do a quick search with the
-                        # suggested spelling to compare words against
-                        try:
-                            self.searchqueryset.auto_query(test_query)[0]
-                            suggested_query.append(suggestion)
-                            has_suggestions = True
-                            optimal_query = test_query
-                        except:
-                            suggestion = None
-                    else:
-                        suggested_query.append(token)
-                    suggestions.append((token, suggestion))
-            if optimal_query != original_query:
-                self.spelling_suggestions = suggestions
-                self.has_spelling_suggestions = has_suggestions
-                self.original_query = self.cleaned_data.get('q')
-                self.suggested_query = quote_plus(' '.join(suggested_query), safe="")
+    @property
+    def has_spelling_suggestions(self):
+        return self.spelling['has_suggestions']
+
+    @property
+    def spelling_suggestions(self):
+        return self.spelling['suggestions']
+
+    @property
+    def original_query(self):
+        return self.spelling['original_query']
+
+    @property
+    def suggested_query(self):
+        return self.spelling['suggested_query']
 
     def apply_date_filtering(self, sqs):
         modify_quick_date = self.cleaned_data['mq']
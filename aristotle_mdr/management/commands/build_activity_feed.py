@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from aristotle_mdr.activity import build_activity_feed
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the activity feeds shown on user and workgroup pages from the saved revisions.'
+
+    def handle(self, *args, **options):
+        added = build_activity_feed()
+        self.stdout.write('Rebuilt activity feed with %s activities' % added)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from aristotle_mdr.name_index import rebuild_name_index, uses_trigram_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the index of item names used for name lookups in autocompletes and creation wizards.'
+
+    def handle(self, *args, **options):
+        if uses_trigram_index():
+            self.stdout.write('Item names are indexed by the database trigram index, no name index is needed')
+            return
+        count = rebuild_name_index()
+        self.stdout.write('Indexed the names of %s items' % count)
@@ -0,0 +1,80 @@
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from aristotle_mdr import sitemaps
+
+MANIFEST_FILENAME = 'sitemaps.json'
+INDEX_FILENAME = 'sitemap.xml.gz'
+
+
+def write_gzip(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            gz.write(text.encode('utf-8'))
+    os.rename(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes gzipped sitemap files for the public items in the registry to a directory, '
+        'only rewriting the pages that have changed since it was last run. This can be run periodically, for example from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='The directory to write the sitemap files to')
+        parser.add_argument(
+            '--base-url', required=True,
+            help='The URL of the registry, for example https://registry.example.com'
+        )
+        parser.add_argument(
+            '--sitemaps-url', default=None,
+            help='The URL the sitemap files are served from, defaults to the base URL followed by /sitemaps'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        base_url = options['base_url'].rstrip('/')
+        sitemaps_url = (options['sitemaps_url'] or base_url + '/sitemaps').rstrip('/')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            manifest = {}
+        previous = manifest.get('pages', {}) if manifest.get('base_url') == base_url else {}
+
+        def page_path(page):
+            return os.path.join(directory, 'sitemap_%s.xml.gz' % page)
+
+        pages = sitemaps.page_signatures()
+        current = {}
+        written = 0
+        for page, (count, pk_sum, lastmod) in pages:
+            stamp = [count, str(pk_sum), lastmod.isoformat() if lastmod else None]
+            current[str(page)] = stamp
+            if previous.get(str(page)) == stamp and os.path.exists(page_path(page)):
+                continue
+            write_gzip(page_path(page), sitemaps.render_page(base_url, page))
+            written += 1
+
+        for page in set(previous.keys()) - set(current.keys()):
+            if os.path.exists(page_path(page)):
+                os.remove(page_path(page))
+
+        write_gzip(
+            os.path.join(directory, INDEX_FILENAME),
+            sitemaps.render_index(
+                base_url, pages,
+                page_url=lambda page: '%s/sitemap_%s.xml.gz' % (sitemaps_url, page)
+            )
+        )
+        with open(manifest_path, 'w') as f:
+            json.dump({'base_url': base_url, 'pages': current}, f)
+
+        self.stdout.write('Wrote %s of %s sitemap pages to %s' % (written, len(pages), directory))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from aristotle_mdr.models import BulkActionSelection
+
+
+class Command(BaseCommand):
+    help = 'Removes expired "select all" selections stored for bulk actions. This should be run periodically, for example from cron.'
+
+    def handle(self, *args, **options):
+        count = BulkActionSelection.objects.reap()
+        self.stdout.write('Removed %s expired bulk action selections' % count)
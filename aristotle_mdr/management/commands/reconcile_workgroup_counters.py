@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from aristotle_mdr.models import WorkgroupCounter, WorkgroupMembership
+
+
+class Command(BaseCommand):
+    help = 'Counts the items and members of every workgroup again, correcting any counters and memberships that have drifted. This should be run periodically, for example from cron.'
+
+    def handle(self, *args, **options):
+        WorkgroupMembership.objects.sync()
+        changed = WorkgroupCounter.objects.recount()
+        self.stdout.write('Reconciled workgroup counters, %s counters were corrected' % changed)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from aristotle_mdr.metrics import refresh_metrics
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the item counts shown on the registry statistics pages. This should be run periodically, for example from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            dest='full',
+            default=False,
+            help='Rebuild every metric from scratch, rather than only adding the items created since the last refresh.',
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = refresh_metrics(full=options['full'])
+        self.stdout.write('Refreshed registry metrics, %s metrics were rebuilt' % rebuilt)
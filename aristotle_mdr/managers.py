@@ -43,6 +43,7 @@ class ConceptQuerySet(MetadataItemQuerySet):
             ObjectClass.objects.visible().filter(name__contains="Person")
         """
         from aristotle_mdr.models import REVIEW_STATES
+        from aristotle_mdr.perms import user_permission_terms
         if user.is_superuser:
             return self.all()
         if user.is_anonymous():
@@ -52,18 +53,19 @@ class ConceptQuerySet(MetadataItemQuerySet):
         if user.is_active:
             # User can see everything they've made.
             q |= Q(submitter=user)
-            if user.profile.workgroups:
+            terms = user_permission_terms(user)
+            if terms['workgroups']:
                 # User can see everything in their workgroups.
-                q |= Q(workgroup__in=user.profile.workgroups)
-                # q |= Q(workgroup__user__profile=user)
-            if user.profile.is_registrar:
+                q |= Q(workgroup__in=terms['workgroups'])
+            registration_authorities = terms['registration_authorities']
+            if registration_authorities:
                 # Registars can see items they have been asked to review
                 q |= Q(
-                    Q(review_requests__registration_authority__registrars__profile__user=user) & ~Q(review_requests__status=REVIEW_STATES.cancelled)
+                    Q(review_requests__registration_authority__in=registration_authorities) & ~Q(review_requests__status=REVIEW_STATES.cancelled)
                 )
                 # Registars can see items that have been registered in their registration authority
                 q |= Q(
-                    Q(statuses__registrationAuthority__registrars__profile__user=user)
+                    Q(statuses__registrationAuthority__in=registration_authorities)
                 )
         extra_q = fetch_aristotle_settings().get('EXTRA_CONCEPT_QUERYSETS', {}).get('visible', None)
         if extra_q:
@@ -91,11 +93,14 @@ class ConceptQuerySet(MetadataItemQuerySet):
         # User can edit everything they've made thats not locked
         q |= Q(submitter=user, _is_locked=False)
 
-        if user.submitter_in.exists() or user.steward_in.exists():
-            if user.submitter_in.exists():
-                q |= Q(_is_locked=False, workgroup__submitters__profile__user=user)
-            if user.steward_in.exists():
-                q |= Q(workgroup__stewards__profile__user=user)
+        from aristotle_mdr.perms import user_workgroup_roles
+        roles = user_workgroup_roles(user)
+        submitter_in = [wg for wg, wg_roles in roles.items() if 'submitter' in wg_roles]
+        steward_in = [wg for wg, wg_roles in roles.items() if 'steward' in wg_roles]
+        if submitter_in:
+            q |= Q(_is_locked=False, workgroup__in=submitter_in)
+        if steward_in:
+            q |= Q(workgroup__in=steward_in)
         return self.filter(q)
 
     def public(self):
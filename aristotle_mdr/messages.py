@@ -35,6 +35,14 @@ def workgroup_item_new(recipient, obj):
     notify.send(obj, recipient=recipient, verb="was modified in the workgroup", target=obj.workgroup)
 
 
+def workgroup_items_moved(recipient, actor, workgroup, count):
+    notify.send(actor, recipient=recipient, verb="moved %s items into the workgroup" % count, target=workgroup)
+
+
+def favourites_moved(recipient, actor, workgroup, count):
+    notify.send(actor, recipient=recipient, verb="moved %s favourited items into the workgroup" % count, target=workgroup)
+
+
 def new_comment_created(comment):
     post = comment.post
     author_name = comment.author.get_full_name() or comment.author
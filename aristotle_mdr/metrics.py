@@ -0,0 +1,215 @@
+"""
+Registry metrics
+----------------
+
+The registry statistics pages count the items of each type, in each workgroup
+and registered by each registration authority. Counting these on every page view
+gets slower as the registry grows, so the counts are kept in the
+:class:`~aristotle_mdr.models.RegistryMetric` table instead, along with a
+histogram of the number of items created on each day, which gives the number
+created in the last 7 or 30 days without another query.
+
+The table is refreshed by the ``refresh_registry_metrics`` management command,
+which should be run periodically, for example from cron. Metrics older than the
+``REGISTRY_METRICS_MAX_AGE`` setting are also refreshed when they are next shown,
+so they never fall too far behind if the command isn't run. Each refresh only
+reads the items created since the last one and adds them to the histograms.
+The totals are counted again with one grouped query for each kind of metric,
+and any metric whose total no longer matches its histogram, because items were
+deleted, moved to another workgroup or registered, is rebuilt on its own.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from aristotle_mdr.models import (
+    REGISTRY_METRIC_KINDS,
+    RegistryMetric,
+    Status,
+    _concept,
+)
+from aristotle_mdr.utils import fetch_aristotle_settings
+
+LAST_REFRESHED_KEY = 'aristotle_mdr_registry_metrics_refreshed'
+REGISTRY_METRICS_MAX_AGE = 3600
+
+# If more metrics than this need rebuilding, every row is read rather than
+# filtering for each of them.
+REBUILD_FILTER_LIMIT = 100
+
+
+def _sources(kind):
+    """
+    Returns the queryset a kind of metric counts, the fields that make up the key,
+    the field counted and the field holding when it was created.
+    """
+    if kind == REGISTRY_METRIC_KINDS.model:
+        return _concept.objects.all(), ['uuid__app_label', 'uuid__model_name'], 'pk', 'created'
+    if kind == REGISTRY_METRIC_KINDS.workgroup:
+        return _concept.objects.filter(workgroup__isnull=False), ['workgroup'], 'pk', 'created'
+    return Status.objects.all(), ['registrationAuthority'], 'concept', 'concept__created'
+
+
+def _make_key(values):
+    return '.'.join('%s' % value for value in values)
+
+
+def _key_q(key_fields, keys):
+    query = Q()
+    for key in keys:
+        query |= Q(**dict(zip(key_fields, key.split('.'))))
+    return query
+
+
+def _day(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().isoformat()
+
+
+def today():
+    now = timezone.now()
+    if timezone.is_aware(now):
+        now = timezone.localtime(now)
+    return now.date()
+
+
+def _created_rows(queryset, key_fields, item_field, created_field):
+    """Yields the ``(key, created)`` of each item counted in a queryset."""
+    rows = queryset.order_by().values_list(*(key_fields + [item_field, created_field])).distinct()
+    for row in rows.iterator():
+        yield _make_key(row[:len(key_fields)]), row[-1]
+
+
+@transaction.atomic
+def refresh_kind(kind, now=None, full=False):
+    """
+    Refreshes the metrics of one kind with the items created up to ``now``.
+    If ``full`` is True every metric is rebuilt from scratch.
+    """
+    if now is None:
+        now = timezone.now()
+    queryset, key_fields, item_field, created_field = _sources(kind)
+    queryset = queryset.filter(**{created_field + '__lte': now})
+
+    totals = dict(
+        (_make_key(row[field] for field in key_fields), row['metric_total'])
+        for row in queryset.order_by().values(*key_fields).annotate(
+            metric_total=Count(item_field, distinct=True)
+        )
+    )
+
+    metrics = {}
+    if not full:
+        metrics = dict((m.key, m) for m in RegistryMetric.objects.filter(kind=kind))
+    RegistryMetric.objects.filter(kind=kind).exclude(
+        key__in=[key for key in metrics.keys() if key in totals]
+    ).delete()
+
+    histograms = {}
+    changed = set()
+    current = [m for key, m in metrics.items() if key in totals]
+    current_keys = set(m.key for m in current)
+    for metric in current:
+        histograms[metric.key] = metric.get_histogram()
+    if current:
+        # Add the items created since the last refresh to the histograms
+        since = min(m.counted_until for m in current)
+        new_items = queryset.filter(**{created_field + '__gt': since})
+        for key, created in _created_rows(new_items, key_fields, item_field, created_field):
+            if key not in current_keys or created <= metrics[key].counted_until:
+                continue
+            day = _day(created)
+            histograms[key][day] = histograms[key].get(day, 0) + 1
+            changed.add(key)
+
+    rebuild = set(
+        key for key, total in totals.items()
+        if key not in histograms or sum(histograms[key].values()) != total
+    )
+    changed |= rebuild & current_keys
+    if rebuild:
+        items = queryset
+        if len(rebuild) <= REBUILD_FILTER_LIMIT:
+            items = queryset.filter(_key_q(key_fields, rebuild))
+        for key in rebuild:
+            histograms[key] = {}
+        for key, created in _created_rows(items, key_fields, item_field, created_field):
+            if key in rebuild:
+                day = _day(created)
+                histograms[key][day] = histograms[key].get(day, 0) + 1
+
+    for key in changed:
+        metric = metrics[key]
+        metric.total = totals[key]
+        metric.histogram = json.dumps(histograms[key], sort_keys=True)
+        metric.save()
+    RegistryMetric.objects.filter(kind=kind).update(counted_until=now, refreshed=now)
+    RegistryMetric.objects.bulk_create([
+        RegistryMetric(
+            kind=kind, key=key, total=totals[key],
+            histogram=json.dumps(histograms[key], sort_keys=True), counted_until=now,
+        )
+        for key in totals if key not in current_keys
+    ])
+    return len(rebuild)
+
+
+def refresh_metrics(full=False):
+    """
+    Refreshes every kind of metric, and returns the number of metrics that had to be rebuilt.
+    """
+    now = timezone.now()
+    rebuilt = 0
+    for kind, label in REGISTRY_METRIC_KINDS:
+        rebuilt += refresh_kind(kind, now, full=full)
+    cache.set(LAST_REFRESHED_KEY, now, None)
+    return rebuilt
+
+
+def last_refreshed():
+    """Returns when the metrics were last refreshed, or None if they never have been."""
+    refreshed = cache.get(LAST_REFRESHED_KEY, None)
+    if refreshed is None:
+        refreshed = RegistryMetric.objects.order_by('-counted_until').values_list('counted_until', flat=True).first()
+    return refreshed
+
+
+def is_stale():
+    """
+    Returns True if the metrics have never been refreshed, or were last
+    refreshed longer ago than the ``REGISTRY_METRICS_MAX_AGE`` setting.
+    """
+    refreshed = last_refreshed()
+    if refreshed is None:
+        return True
+    max_age = fetch_aristotle_settings().get('REGISTRY_METRICS_MAX_AGE', REGISTRY_METRICS_MAX_AGE)
+    return max_age is not None and timezone.now() - refreshed > datetime.timedelta(seconds=max_age)
+
+
+def get_metrics(kind):
+    """
+    Returns a dictionary of the metrics of one kind by their key.
+    The metrics are refreshed first if they are stale.
+    """
+    if is_stale():
+        refresh_metrics()
+    return dict((m.key, m) for m in RegistryMetric.objects.filter(kind=kind))
+
+
+def metric_counts(metric):
+    """Returns the total and the number of items created in the last 7 and 30 days for a metric."""
+    if metric is None:
+        return {'all_time': 0, 't7': 0, 't30': 0}
+    day = today()
+    return {
+        'all_time': metric.total,
+        't7': metric.created_since(day - datetime.timedelta(days=7)),
+        't30': metric.created_since(day - datetime.timedelta(days=30)),
+    }
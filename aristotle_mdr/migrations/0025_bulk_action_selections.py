@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import aristotle_mdr.fields
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aristotle_mdr', '0024_add_uuid_instances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkActionSelection',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bulk_action_selections', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BulkActionSelectionItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('concept', aristotle_mdr.fields.ConceptForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bulk_action_selections', to='aristotle_mdr._concept')),
+                ('selection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='aristotle_mdr.BulkActionSelection')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='bulkactionselectionitem',
+            unique_together=set([('selection', 'concept')]),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.deletion
+import aristotle_mdr.fields
+
+NAME_KEY_LENGTH = 255
+TRIGRAM_INDEX_NAME = 'aristotle_mdr__concept_name_trgm'
+UPPER_NAME_INDEX_NAME = 'aristotle_mdr__concept_name_upper'
+
+
+def name_key(name):
+    return " ".join(name.lower().split())[:NAME_KEY_LENGTH]
+
+
+def trigrams(text):
+    text = text.lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError:
+        # The extension isn't available, so the portable name index will be used
+        return
+    table = schema_editor.quote_name(apps.get_model('aristotle_mdr', '_concept')._meta.db_table)
+    schema_editor.execute(
+        "CREATE INDEX %s ON %s USING gin (UPPER(name) gin_trgm_ops)" % (TRIGRAM_INDEX_NAME, table)
+    )
+    schema_editor.execute(
+        "CREATE INDEX %s ON %s (UPPER(name))" % (UPPER_NAME_INDEX_NAME, table)
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS %s" % TRIGRAM_INDEX_NAME)
+    schema_editor.execute("DROP INDEX IF EXISTS %s" % UPPER_NAME_INDEX_NAME)
+
+
+def build_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [TRIGRAM_INDEX_NAME])
+            if cursor.fetchone() is not None:
+                return
+
+    _concept = apps.get_model('aristotle_mdr', '_concept')
+    ConceptNameKey = apps.get_model('aristotle_mdr', 'ConceptNameKey')
+    ConceptNameTrigram = apps.get_model('aristotle_mdr', 'ConceptNameTrigram')
+    db_alias = schema_editor.connection.alias
+
+    items = list(_concept.objects.using(db_alias).values_list('pk', 'name'))
+    ConceptNameKey.objects.using(db_alias).bulk_create([
+        ConceptNameKey(concept_id=pk, key=name_key(name)) for pk, name in items
+    ], batch_size=500)
+    ConceptNameTrigram.objects.using(db_alias).bulk_create([
+        ConceptNameTrigram(concept_id=pk, trigram=gram)
+        for pk, name in items for gram in trigrams(name)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aristotle_mdr', '0026_bulk_action_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConceptNameKey',
+            fields=[
+                ('concept', aristotle_mdr.fields.ConceptOneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='name_key', serialize=False, to='aristotle_mdr._concept')),
+                ('key', models.CharField(db_index=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConceptNameTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('concept', aristotle_mdr.fields.ConceptForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='aristotle_mdr._concept')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='conceptnametrigram',
+            index_together=set([('trigram', 'concept')]),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+        migrations.RunPython(build_name_index, migrations.RunPython.noop),
+    ]
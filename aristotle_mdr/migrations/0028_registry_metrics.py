@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aristotle_mdr', '0027_concept_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistryMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('model', 'Item type'), ('workgroup', 'Workgroup'), ('registration_authority', 'Registration authority')], max_length=32)),
+                ('key', models.CharField(help_text="The item type as 'app_label.model_name', or the id of the workgroup or registration authority", max_length=256)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('histogram', models.TextField(default='{}', help_text='A JSON object of the number of items created on each day')),
+                ('counted_until', models.DateTimeField(help_text='Items created up to this time are included in the counts')),
+                ('refreshed', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='registrymetric',
+            unique_together=set([('kind', 'key')]),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_workgroup_counters(apps, schema_editor):
+    Workgroup = apps.get_model('aristotle_mdr', 'Workgroup')
+    WorkgroupCounter = apps.get_model('aristotle_mdr', 'WorkgroupCounter')
+    _concept = apps.get_model('aristotle_mdr', '_concept')
+    db_alias = schema_editor.connection.alias
+
+    item_counts = dict(
+        _concept.objects.using(db_alias).filter(workgroup__isnull=False).order_by()
+        .values_list('workgroup_id').annotate(num=models.Count('pk'))
+    )
+    members = {}
+    for relation in ['viewers', 'submitters', 'stewards', 'managers']:
+        descriptor = getattr(Workgroup, relation)
+        field = descriptor.field
+        for wg_id, user_id in descriptor.through.objects.using(db_alias).values_list(
+            field.m2m_column_name(), field.m2m_reverse_name()
+        ):
+            members.setdefault(wg_id, set()).add(user_id)
+
+    # The state counts are left stale, and are counted when each workgroup is next viewed
+    WorkgroupCounter.objects.using(db_alias).bulk_create([
+        WorkgroupCounter(
+            workgroup_id=wg_id,
+            item_count=item_counts.get(wg_id, 0),
+            member_count=len(members.get(wg_id, [])),
+            stale=True,
+        )
+        for wg_id in Workgroup.objects.using(db_alias).values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aristotle_mdr', '0028_registry_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkgroupCounter',
+            fields=[
+                ('workgroup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='aristotle_mdr.Workgroup')),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('state_counts', models.TextField(default='{}', help_text='A JSON object of the number of items with a current status in each state')),
+                ('states_expire', models.DateField(blank=True, help_text='When the first counted status expires, after which the state counts need to be counted again', null=True)),
+                ('stale', models.BooleanField(default=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_workgroup_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+WORKGROUP_ROLE_RELATIONS = [
+    ('viewer', 'viewers'),
+    ('submitter', 'submitters'),
+    ('steward', 'stewards'),
+    ('manager', 'managers'),
+]
+
+
+def build_workgroup_memberships(apps, schema_editor):
+    Workgroup = apps.get_model('aristotle_mdr', 'Workgroup')
+    WorkgroupMembership = apps.get_model('aristotle_mdr', 'WorkgroupMembership')
+    db_alias = schema_editor.connection.alias
+
+    roles = {}
+    for role, relation in WORKGROUP_ROLE_RELATIONS:
+        descriptor = getattr(Workgroup, relation)
+        field = descriptor.field
+        for pair in descriptor.through.objects.using(db_alias).values_list(
+            field.m2m_column_name(), field.m2m_reverse_name()
+        ):
+            roles.setdefault(pair, set()).add(role)
+
+    WorkgroupMembership.objects.using(db_alias).bulk_create([
+        WorkgroupMembership(
+            workgroup_id=wg_id,
+            user_id=user_id,
+            **dict(('is_%s' % role, role in user_roles) for role, relation in WORKGROUP_ROLE_RELATIONS)
+        )
+        for (wg_id, user_id), user_roles in roles.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aristotle_mdr', '0029_workgroup_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkgroupMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_viewer', models.BooleanField(default=False)),
+                ('is_submitter', models.BooleanField(default=False)),
+                ('is_steward', models.BooleanField(default=False)),
+                ('is_manager', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workgroup_memberships', to=settings.AUTH_USER_MODEL)),
+                ('workgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='aristotle_mdr.Workgroup')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='workgroupmembership',
+            unique_together=set([('user', 'workgroup')]),
+        ),
+        migrations.RunPython(build_workgroup_memberships, migrations.RunPython.noop),
+    ]
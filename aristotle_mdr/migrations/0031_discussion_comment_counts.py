@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def count_discussion_comments(apps, schema_editor):
+    DiscussionPost = apps.get_model('aristotle_mdr', 'DiscussionPost')
+    DiscussionComment = apps.get_model('aristotle_mdr', 'DiscussionComment')
+    db_alias = schema_editor.connection.alias
+
+    counts = dict(
+        DiscussionComment.objects.using(db_alias).order_by().values('post').annotate(
+            total=models.Count('pk')
+        ).values_list('post', 'total')
+    )
+    last_comments = {}
+    for pk, post_id, created in DiscussionComment.objects.using(db_alias).order_by(
+        'created', 'pk'
+    ).values_list('pk', 'post', 'created').iterator():
+        last_comments[post_id] = (pk, created)
+
+    for post in DiscussionPost.objects.using(db_alias).only('pk', 'created').iterator():
+        last = last_comments.get(post.pk)
+        DiscussionPost.objects.using(db_alias).filter(pk=post.pk).update(
+            comment_count=counts.get(post.pk, 0),
+            last_comment=last[0] if last else None,
+            last_activity=last[1] if last else post.created,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aristotle_mdr', '0030_workgroup_memberships'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussionpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='discussionpost',
+            name='last_comment',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, editable=False, to='aristotle_mdr.DiscussionComment', null=True),
+        ),
+        migrations.AddField(
+            model_name='discussionpost',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterIndexTogether(
+            name='discussionpost',
+            index_together=set([('workgroup', 'modified')]),
+        ),
+        migrations.RunPython(count_discussion_comments, migrations.RunPython.noop),
+    ]
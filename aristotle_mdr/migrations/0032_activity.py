@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reversion', '__first__'),
+        ('aristotle_mdr', '0031_discussion_comment_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('verb', models.CharField(max_length=16, choices=[('created', 'Created'), ('changed', 'Changed')])),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('concept', models.ForeignKey(related_name='activities', to='aristotle_mdr._concept')),
+                ('revision', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='reversion.Revision', null=True)),
+                ('user', models.ForeignKey(related_name='activities', on_delete=django.db.models.deletion.SET_NULL, blank=True, to=settings.AUTH_USER_MODEL, null=True)),
+                ('workgroup', models.ForeignKey(related_name='activities', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='aristotle_mdr.Workgroup', null=True)),
+            ],
+            options={
+                'ordering': ['-timestamp', '-pk'],
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='activity',
+            index_together=set([('user', 'timestamp'), ('workgroup', 'timestamp')]),
+        ),
+    ]
@@ -4,11 +4,12 @@ from __future__ import absolute_import
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import reverse
 from django.db import models, transaction
 from django.db.models import Q
-from django.db.models.signals import post_save, m2m_changed, post_delete, pre_save
+from django.db.models.signals import post_save, m2m_changed, post_delete, pre_delete, pre_save
 from django.dispatch import receiver, Signal
 from django.utils import timezone
 from django.utils.module_loading import import_string
@@ -22,11 +23,14 @@ import uuid
 from django.utils.encoding import python_2_unicode_compatible  # Python 2
 
 import reversion  # import revisions
+from reversion.models import Version
 
 import datetime
+import json
 from ckeditor_uploader.fields import RichTextUploadingField as RichTextField
 from aristotle_mdr import perms
 from aristotle_mdr import messages
+from aristotle_mdr import name_index
 from aristotle_mdr.utils import (
     fetch_aristotle_settings,
     fetch_metadata_apps,
@@ -37,7 +41,7 @@ from aristotle_mdr.utils import (
 )
 from aristotle_mdr import comparators
 
-from .fields import ConceptForeignKey, ConceptManyToManyField
+from .fields import ConceptForeignKey, ConceptManyToManyField, ConceptOneToOneField
 from .managers import MetadataItemManager, ConceptManager, UUIDManager
 
 import logging
@@ -73,6 +77,9 @@ VERY_RECENTLY_SECONDS = 15
 
 
 concept_visibility_updated = Signal(providing_args=["concept"])
+# Sent when a set of concepts is changed with a queryset ``update``, which
+# doesn't call ``save()`` or send ``post_save`` for each item.
+concepts_bulk_updated = Signal(providing_args=["concepts", "changed_fields"])
 
 
 class UUID(models.Model):
@@ -465,13 +472,10 @@ class Workgroup(registryGroup):
 
     @property
     def members(self):
-        return self.viewers.all() \
-            | self.submitters.all() \
-            | self.stewards.all() \
-            | self.managers.all()
+        return get_user_model().objects.filter(workgroup_memberships__workgroup=self)
 
     def can_view(self, user):
-        return self.members.filter(pk=user.pk).exists()
+        return self.memberships.filter(user_id=user.pk).exists()
 
     @property
     def classedItems(self):
@@ -507,6 +511,86 @@ class Workgroup(registryGroup):
         self.managers.remove(user)
 
 
+# The workgroup relation for each role, and the flag for it on a membership
+WORKGROUP_ROLE_RELATIONS = [
+    ('viewer', 'viewers'),
+    ('submitter', 'submitters'),
+    ('steward', 'stewards'),
+    ('manager', 'managers'),
+]
+
+
+def _workgroup_role_pairs(workgroup_ids=None, user_ids=None):
+    """
+    Returns a dictionary of the set of roles for each ``(workgroup id, user id)``
+    in the workgroup role relations, optionally only for some workgroups and users.
+    """
+    roles = {}
+    for role, relation in WORKGROUP_ROLE_RELATIONS:
+        descriptor = getattr(Workgroup, relation)
+        field = descriptor.field
+        pairs = descriptor.through.objects.all()
+        if workgroup_ids is not None:
+            pairs = pairs.filter(**{field.m2m_field_name() + '__in': workgroup_ids})
+        if user_ids is not None:
+            pairs = pairs.filter(**{field.m2m_reverse_field_name() + '__in': user_ids})
+        for pair in pairs.values_list(field.m2m_column_name(), field.m2m_reverse_name()):
+            roles.setdefault(pair, set()).add(role)
+    return roles
+
+
+class WorkgroupMembershipManager(models.Manager):
+    def sync(self, workgroup_ids=None, user_ids=None):
+        """
+        Updates the memberships of some users in some workgroups, or every
+        membership, to match the workgroup role relations.
+        """
+        roles = _workgroup_role_pairs(workgroup_ids, user_ids)
+        existing = self.all()
+        if workgroup_ids is not None:
+            existing = existing.filter(workgroup_id__in=workgroup_ids)
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing = dict(((m.workgroup_id, m.user_id), m) for m in existing)
+
+        self.filter(pk__in=[m.pk for pair, m in existing.items() if pair not in roles]).delete()
+        new_memberships = []
+        for (wg_id, user_id), user_roles in roles.items():
+            flags = dict(('is_%s' % role, role in user_roles) for role, relation in WORKGROUP_ROLE_RELATIONS)
+            membership = existing.get((wg_id, user_id))
+            if membership is None:
+                new_memberships.append(WorkgroupMembership(workgroup_id=wg_id, user_id=user_id, **flags))
+            elif any(getattr(membership, flag) != value for flag, value in flags.items()):
+                self.filter(pk=membership.pk).update(**flags)
+        self.bulk_create(new_memberships)
+
+
+class WorkgroupMembership(models.Model):
+    """
+    One row for each member of a workgroup, with a flag for each of their roles,
+    kept in step with the workgroup role relations by signals.
+
+    Checking if a user is in a workgroup, or listing a workgroup's members or
+    a user's workgroups, is then a single indexed lookup rather than a union of
+    the four role relations.
+    """
+    workgroup = models.ForeignKey(Workgroup, related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='workgroup_memberships')
+    is_viewer = models.BooleanField(default=False)
+    is_submitter = models.BooleanField(default=False)
+    is_steward = models.BooleanField(default=False)
+    is_manager = models.BooleanField(default=False)
+
+    objects = WorkgroupMembershipManager()
+
+    class Meta:
+        unique_together = ('user', 'workgroup')
+
+    @property
+    def roles(self):
+        return set(role for role, relation in WORKGROUP_ROLE_RELATIONS if getattr(self, 'is_%s' % role))
+
+
 class discussionAbstract(TimeStampedModel):
     body = models.TextField()
     author = models.ForeignKey(settings.AUTH_USER_MODEL)
@@ -528,9 +612,22 @@ class DiscussionPost(discussionAbstract):
         related_name='relatedDiscussions',
     )
     closed = models.BooleanField(default=False)
+    # Kept up to date as comments are added and removed, so lists of posts
+    # don't need to look at the comments of every post.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment = models.ForeignKey(
+        'DiscussionComment',
+        null=True, blank=True, editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    last_activity = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-modified']
+        index_together = [
+            ['workgroup', 'modified'],
+        ]
 
     @property
     def active(self):
@@ -544,6 +641,28 @@ class DiscussionComment(discussionAbstract):
         ordering = ['created']
 
 
+@receiver(post_save, sender=DiscussionComment)
+def count_comment_added(sender, instance, created, **kwargs):
+    if not created or kwargs.get('raw'):
+        return
+    DiscussionPost.objects.filter(pk=instance.post_id).update(
+        comment_count=models.F('comment_count') + 1,
+        last_comment=instance,
+        last_activity=instance.created,
+    )
+
+
+@receiver(post_delete, sender=DiscussionComment)
+def count_comment_removed(sender, instance, **kwargs):
+    comments = DiscussionComment.objects.filter(post_id=instance.post_id)
+    last = comments.order_by('-created', '-pk').values_list('pk', 'created').first()
+    DiscussionPost.objects.filter(pk=instance.post_id).update(
+        comment_count=comments.count(),
+        last_comment=last[0] if last else None,
+        last_activity=last[1] if last else models.F('created'),
+    )
+
+
 # class ReferenceDocument(models.Model):
 #     url = models.URLField()
 #     definition = models.TextField()
@@ -565,6 +684,8 @@ class _concept(baseAristotleObject):
     objects = ConceptManager()
     template = "aristotle_mdr/concepts/managedContent.html"
     list_details_template = "aristotle_mdr/helpers/concept_list_details.html"
+    # Related items shown by the list_details_template, loaded with the items in lists
+    list_details_related = []
 
     workgroup = models.ForeignKey(Workgroup, related_name="items", null=True, blank=True)
     submitter = models.ForeignKey(
@@ -735,6 +856,33 @@ class _concept(baseAristotleObject):
         self.save()
         concept_visibility_updated.send(sender=self.__class__, concept=self)
 
+    def registration_history(self):
+        """
+        Returns every status of the item, grouped by registration authority,
+        as a list of ``(registration_authority, statuses)`` with the most recent
+        status first. Registration authorities and statuses are dictionaries of
+        their fields, loaded in a single query.
+
+        The history is cached until the item's statuses, or any registration
+        authority, changes.
+        """
+        key = registration_history_cache_key(self.pk)
+        history = cache.get(key, None)
+        if history is None:
+            history = []
+            statuses = self.statuses.order_by("registrationAuthority", "-registrationDate").values(
+                'registrationAuthority_id', 'registrationAuthority__name',
+                'registrationDate', 'until_date', 'state', 'changeDetails',
+            )
+            for status in statuses:
+                ra_id = status.pop('registrationAuthority_id')
+                ra_name = status.pop('registrationAuthority__name')
+                if not history or history[-1][0]['id'] != ra_id:
+                    history.append(({'id': ra_id, 'name': ra_name}, []))
+                history[-1][1].append(status)
+            cache.set(key, history, None)
+        return history
+
     def current_statuses(self, qs=None, when=timezone.now()):
         if qs is None:
             qs = self.statuses.all()
@@ -945,6 +1093,236 @@ post_save.connect(recache_concept_states, sender=Status)
 post_delete.connect(recache_concept_states, sender=Status)
 
 
+REGISTRATION_HISTORY_VERSION_KEY = 'aristotle_registration_history_version'
+
+
+def registration_history_cache_key(concept_id):
+    # The version changes whenever a registration authority is saved, as their names are in the history
+    version = cache.get(REGISTRATION_HISTORY_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(REGISTRATION_HISTORY_VERSION_KEY, version, None)
+    return 'aristotle_registration_history_%s_%s' % (concept_id, version)
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def clear_registration_history(sender, instance, **kwargs):
+    cache.delete(registration_history_cache_key(instance.concept_id))
+
+
+@receiver(post_save, sender=RegistrationAuthority)
+@receiver(post_delete, sender=RegistrationAuthority)
+def clear_registration_histories(sender, instance, **kwargs):
+    cache.delete(REGISTRATION_HISTORY_VERSION_KEY)
+
+
+NOT_REGISTERED = 'none'
+
+
+def _workgroup_member_ids(workgroup_ids):
+    """Returns a dictionary of the set of member ids of each workgroup, by workgroup id."""
+    members = dict((wg_id, set()) for wg_id in workgroup_ids)
+    for wg_id, user_id in _workgroup_role_pairs(workgroup_ids).keys():
+        members[wg_id].add(user_id)
+    return members
+
+
+class WorkgroupCounterManager(models.Manager):
+    def mark_stale(self, workgroup_ids):
+        """
+        Marks the registration state counts of some workgroups as out of date,
+        so they are counted again the next time they are needed.
+        """
+        self.filter(workgroup_id__in=workgroup_ids).update(stale=True)
+
+    def add_items(self, workgroup_id, count):
+        self.filter(workgroup_id=workgroup_id).update(
+            item_count=models.F('item_count') + count, stale=True
+        )
+
+    def recount_members(self, workgroup_ids):
+        for wg_id, members in _workgroup_member_ids(workgroup_ids).items():
+            self.filter(workgroup_id=wg_id).update(member_count=len(members))
+
+    def recount(self, workgroup_ids=None):
+        """
+        Counts the items, members and items in each registration state of some
+        workgroups, or every workgroup, with one grouped query for each count.
+        Returns the number of counters that had to be changed.
+        """
+        workgroups = Workgroup.objects.all()
+        if workgroup_ids is not None:
+            workgroups = workgroups.filter(pk__in=workgroup_ids)
+        workgroup_ids = list(workgroups.values_list('pk', flat=True))
+
+        today = timezone.now().date()
+        items = _concept.objects.filter(workgroup_id__in=workgroup_ids).order_by()
+        item_counts = dict(
+            items.values_list('workgroup_id').annotate(num=models.Count('pk'))
+        )
+        state_counts = dict((wg_id, {}) for wg_id in workgroup_ids)
+        for wg_id, state, count in items.filter(
+            Q(statuses__until_date__gte=today) | Q(statuses__until_date__isnull=True)
+        ).values_list('workgroup_id', 'statuses__state').annotate(num=models.Count('pk')):
+            state_counts[wg_id][NOT_REGISTERED if state is None else str(state)] = count
+        expiries = dict(
+            Status.objects.filter(
+                concept__workgroup_id__in=workgroup_ids, until_date__gte=today
+            ).order_by().values_list('concept__workgroup_id').annotate(expires=models.Min('until_date'))
+        )
+        members = _workgroup_member_ids(workgroup_ids)
+
+        counters = self.in_bulk(workgroup_ids)
+        changed = 0
+        for wg_id in workgroup_ids:
+            values = {
+                'item_count': item_counts.get(wg_id, 0),
+                'member_count': len(members[wg_id]),
+                'state_counts': json.dumps(state_counts[wg_id], sort_keys=True),
+                'states_expire': expiries.get(wg_id),
+                'stale': False,
+            }
+            counter = counters.get(wg_id)
+            if counter is None:
+                self.create(workgroup_id=wg_id, **values)
+                changed += 1
+            elif any(getattr(counter, field) != value for field, value in values.items()):
+                self.filter(workgroup_id=wg_id).update(**values)
+                changed += 1
+        return changed
+
+
+class WorkgroupCounter(models.Model):
+    """
+    The number of items, members and items in each registration state of a
+    workgroup, so workgroup pages and lists don't count them on every view.
+
+    Item counts are updated as items are created, moved and deleted, and member
+    counts when the members change. The registration state counts are marked as
+    stale when an item or status changes, and counted again the next time they
+    are needed. ``reconcile_workgroup_counters`` counts everything again, in
+    case an item was changed without sending signals.
+    """
+    workgroup = models.OneToOneField(Workgroup, primary_key=True, related_name='counter')
+    item_count = models.PositiveIntegerField(default=0)
+    member_count = models.PositiveIntegerField(default=0)
+    state_counts = models.TextField(
+        default='{}',
+        help_text=_("A JSON object of the number of items with a current status in each state")
+    )
+    states_expire = models.DateField(
+        null=True, blank=True,
+        help_text=_("When the first counted status expires, after which the state counts need to be counted again")
+    )
+    stale = models.BooleanField(default=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = WorkgroupCounterManager()
+
+    @property
+    def is_stale(self):
+        return self.stale or (
+            self.states_expire is not None and self.states_expire < timezone.now().date()
+        )
+
+    def get_state_counts(self):
+        """
+        Returns a list of ``(state name, count)``, starting with unregistered items.
+        """
+        counts = json.loads(self.state_counts)
+        not_registered = counts.pop(NOT_REGISTERED, None)
+        states = [(STATES[int(state)], count) for state, count in sorted(counts.items(), key=lambda s: int(s[0]))]
+        if not_registered is not None:
+            states.insert(0, (_("Not registered"), not_registered))
+        return states
+
+
+def get_workgroup_counter(workgroup):
+    """
+    Returns the counter for a workgroup, counting it first if it is missing or stale.
+    """
+    try:
+        counter = workgroup.counter
+    except WorkgroupCounter.DoesNotExist:
+        counter = None
+    if counter is None or counter.is_stale:
+        WorkgroupCounter.objects.recount([workgroup.pk])
+        counter = WorkgroupCounter.objects.get(workgroup=workgroup)
+        workgroup.counter = counter
+    return counter
+
+
+@receiver(post_save, sender=Workgroup)
+def create_workgroup_counter(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        WorkgroupCounter.objects.get_or_create(workgroup=instance, defaults={'stale': False})
+
+
+@receiver(post_save)
+def count_saved_concept(sender, instance, created, **kwargs):
+    if not issubclass(sender, _concept) or kwargs.get('raw'):
+        return
+    if created:
+        if instance.workgroup_id is not None:
+            WorkgroupCounter.objects.add_items(instance.workgroup_id, 1)
+    elif instance.tracker.has_changed('workgroup_id'):
+        previous = instance.tracker.previous('workgroup_id')
+        if previous is not None:
+            WorkgroupCounter.objects.add_items(previous, -1)
+        if instance.workgroup_id is not None:
+            WorkgroupCounter.objects.add_items(instance.workgroup_id, 1)
+
+
+@receiver(post_delete, sender=_concept)
+def count_deleted_concept(sender, instance, **kwargs):
+    # Deleting any item deletes its _concept row, so this is only counted once
+    if instance.workgroup_id is not None:
+        WorkgroupCounter.objects.add_items(instance.workgroup_id, -1)
+
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+def count_status_changed(sender, instance, **kwargs):
+    WorkgroupCounter.objects.filter(workgroup__items__pk=instance.concept_id).update(stale=True)
+
+
+def workgroup_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Keep the memberships and member counts in step with the role relations
+    if action not in ['post_add', 'post_remove', 'pre_clear', 'post_clear']:
+        return
+    workgroup_field = [
+        f for f in sender._meta.fields
+        if f.is_relation and f.related_model == Workgroup
+    ][0]
+    user_field = [
+        f for f in sender._meta.fields
+        if f.is_relation and f.related_model == get_user_model()
+    ][0]
+    if action == 'pre_clear':
+        # Find who is being removed before they are gone
+        if reverse:
+            instance._cleared_role_ids = list(
+                sender.objects.filter(**{user_field.name: instance}).values_list(workgroup_field.attname, flat=True)
+            )
+        else:
+            instance._cleared_role_ids = list(
+                sender.objects.filter(**{workgroup_field.name: instance}).values_list(user_field.attname, flat=True)
+            )
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_role_ids', [])
+    if reverse:
+        workgroup_ids, user_ids = list(pk_set), [instance.pk]
+    else:
+        workgroup_ids, user_ids = [instance.pk], list(pk_set)
+    WorkgroupMembership.objects.sync(workgroup_ids, user_ids)
+    WorkgroupCounter.objects.recount_members(workgroup_ids)
+
+for role, relation in WORKGROUP_ROLE_RELATIONS:
+    m2m_changed.connect(workgroup_roles_changed, sender=getattr(Workgroup, relation).through)
+
+
 class ObjectClass(concept):
     """
     Set of ideas, abstractions or things in the real world that are
@@ -991,6 +1369,7 @@ class UnitOfMeasure(concept):
 
     template = "aristotle_mdr/concepts/unitOfMeasure.html"
     list_details_template = "aristotle_mdr/concepts/list_details/unit_of_measure.html"
+    list_details_related = ['measure']
     measure = models.ForeignKey(Measure, blank=True, null=True)
     symbol = models.CharField(max_length=20, blank=True)
 
@@ -1079,6 +1458,7 @@ class ValueDomain(concept):
 
     template = "aristotle_mdr/concepts/valueDomain.html"
     list_details_template = "aristotle_mdr/concepts/list_details/value_domain.html"
+    list_details_related = ['data_type', 'unit_of_measure__measure']
     comparator = comparators.ValueDomainComparator
     serialize_weak_entities = [
         ('permissible_values', 'permissiblevalue_set'),
@@ -1251,6 +1631,7 @@ class DataElement(concept):
 
     template = "aristotle_mdr/concepts/dataElement.html"
     list_details_template = "aristotle_mdr/concepts/list_details/data_element.html"
+    list_details_related = ['dataElementConcept', 'valueDomain']
 
     dataElementConcept = ConceptForeignKey(  # 11.5.3.2
         DataElementConcept,
@@ -1312,6 +1693,313 @@ class DataElementDerivation(concept):
     )
 
 
+# Selections are only needed between rendering a list and confirming an
+# action, but are kept for a day so long running confirmation pages still work.
+BULK_ACTION_SELECTION_MAX_AGE = 60 * 60 * 24
+
+
+class BulkActionSelectionManager(models.Manager):
+    def create_from_queryset(self, queryset, user=None):
+        """
+        Stores the primary keys of every item in ``queryset`` against a new
+        selection with a single ``INSERT ... SELECT`` statement, so that
+        selecting every item in a large list doesn't require loading them.
+        """
+        from django.db import connections
+
+        if user is not None and user.is_anonymous():
+            user = None
+
+        pk_column = queryset.model._meta.pk.column
+        ids = queryset.order_by().values_list('pk', flat=True).distinct()
+        sql, params = ids.query.sql_with_params()
+
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            selection = self.create(user=user)
+            selection_id = BulkActionSelectionItem._meta.get_field('selection').get_db_prep_value(
+                selection.pk, connection
+            )
+            cursor.execute(
+                "INSERT INTO {table} ({selection_col}, {concept_col}) "
+                "SELECT %s, U0.{pk} FROM ({sql}) U0".format(
+                    table=qn(BulkActionSelectionItem._meta.db_table),
+                    selection_col=qn(BulkActionSelectionItem._meta.get_field('selection').column),
+                    concept_col=qn(BulkActionSelectionItem._meta.get_field('concept').column),
+                    pk=qn(pk_column),
+                    sql=sql,
+                ),
+                [selection_id] + list(params)
+            )
+        return selection
+
+    def expired(self, when=None):
+        if when is None:
+            when = timezone.now()
+        max_age = fetch_aristotle_settings().get(
+            'BULK_ACTION_SELECTION_MAX_AGE', BULK_ACTION_SELECTION_MAX_AGE
+        )
+        return self.filter(created__lt=when - datetime.timedelta(seconds=max_age))
+
+    def reap(self, when=None):
+        """
+        Deletes all expired selections (and their items), returns the number
+        of selections removed.
+        """
+        expired = self.expired(when)
+        count = expired.count()
+        BulkActionSelectionItem.objects.filter(selection__in=expired).delete()
+        expired.delete()
+        return count
+
+
+class BulkActionSelection(models.Model):
+    """
+    A server-side snapshot of the items in a list, used when a user chooses to
+    apply a bulk action to "all items" rather than a hand-picked set.
+    """
+    objects = BulkActionSelectionManager()
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True, blank=True,
+        related_name='bulk_action_selections'
+    )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @property
+    def concepts(self):
+        return _concept.objects.filter(bulk_action_selections__selection=self)
+
+
+class BulkActionSelectionItem(models.Model):
+    selection = models.ForeignKey(BulkActionSelection, related_name='items')
+    concept = ConceptForeignKey(_concept, related_name='bulk_action_selections')
+
+    class Meta:
+        unique_together = ('selection', 'concept')
+
+
+BULK_ACTION_JOB_STATES = Choices(
+    (0, 'pending', _('Pending')),
+    (5, 'running', _('Running')),
+    (10, 'complete', _('Complete')),
+    (15, 'cancelled', _('Cancelled')),
+    (20, 'failed', _('Failed')),
+)
+
+
+class BulkActionJob(TimeStampedModel):
+    """
+    Tracks the progress of a bulk action that is applied in chunks, either
+    during the request or by a background worker.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='bulk_action_jobs')
+    action = models.CharField(
+        max_length=512,
+        help_text=_("The python path of the bulk action form being run")
+    )
+    form_data = models.TextField(
+        blank=True,
+        help_text=_("The submitted form data, used to rebuild the action in a background worker")
+    )
+    selection = models.ForeignKey(BulkActionSelection, related_name='jobs')
+    state = models.IntegerField(
+        choices=BULK_ACTION_JOB_STATES,
+        default=BULK_ACTION_JOB_STATES.pending
+    )
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    message = models.TextField(blank=True)
+
+    @property
+    def is_finished(self):
+        return self.state in [
+            BULK_ACTION_JOB_STATES.complete,
+            BULK_ACTION_JOB_STATES.cancelled,
+            BULK_ACTION_JOB_STATES.failed,
+        ]
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 100
+        return int(100 * self.processed / self.total)
+
+    def chunks(self, size):
+        """
+        Yields querysets of at most ``size`` selected concepts, in primary key
+        order, paging with a keyset rather than an offset.
+        """
+        last_id = 0
+        while True:
+            ids = list(
+                self.selection.items.filter(concept_id__gt=last_id)
+                .order_by('concept_id')
+                .values_list('concept_id', flat=True)[:size]
+            )
+            if not ids:
+                return
+            last_id = ids[-1]
+            yield _concept.objects.filter(pk__in=ids).order_by('pk')
+
+    def was_cancelled(self):
+        return BulkActionJob.objects.filter(pk=self.pk, cancel_requested=True).exists()
+
+    def add_progress(self, processed, failed=0):
+        # Update with F expressions so the status page sees every chunk
+        # as it completes, without racing a concurrent cancel request.
+        BulkActionJob.objects.filter(pk=self.pk).update(
+            processed=models.F('processed') + processed,
+            failed=models.F('failed') + failed,
+            modified=timezone.now(),
+        )
+        self.processed += processed
+        self.failed += failed
+
+    def set_state(self, state, message=None):
+        self.state = state
+        fields = ['state', 'modified']
+        if message is not None:
+            self.message = message
+            fields.append('message')
+        self.save(update_fields=fields)
+
+
+class ConceptNameKey(models.Model):
+    """
+    The normalised name of an item, used to find items with the same name
+    without a case-insensitive scan of every name.
+    See :mod:`aristotle_mdr.name_index`.
+    """
+    concept = ConceptOneToOneField(
+        _concept,
+        primary_key=True,
+        related_name='name_key'
+    )
+    key = models.CharField(max_length=255, db_index=True)
+
+
+class ConceptNameTrigram(models.Model):
+    """
+    One of the three character sequences in the name of an item, used to
+    narrow down the items that can contain some text in their name.
+    See :mod:`aristotle_mdr.name_index`.
+    """
+    concept = ConceptForeignKey(
+        _concept,
+        related_name='name_trigrams'
+    )
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        index_together = [
+            ['trigram', 'concept'],
+        ]
+
+
+REGISTRY_METRIC_KINDS = Choices(
+    ('model', _('Item type')),
+    ('workgroup', _('Workgroup')),
+    ('registration_authority', _('Registration authority')),
+)
+
+
+class RegistryMetric(models.Model):
+    """
+    The number of items of one type, in one workgroup or registered by one
+    registration authority, along with how many were created on each day.
+    See :mod:`aristotle_mdr.metrics`.
+    """
+    kind = models.CharField(max_length=32, choices=REGISTRY_METRIC_KINDS)
+    key = models.CharField(
+        max_length=256,
+        help_text=_("The item type as 'app_label.model_name', or the id of the workgroup or registration authority")
+    )
+    total = models.PositiveIntegerField(default=0)
+    histogram = models.TextField(
+        default='{}',
+        help_text=_("A JSON object of the number of items created on each day")
+    )
+    counted_until = models.DateTimeField(
+        help_text=_("Items created up to this time are included in the counts")
+    )
+    refreshed = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+    def get_histogram(self):
+        return json.loads(self.histogram)
+
+    def created_since(self, day):
+        """Returns the number of items created on or after a date."""
+        day = day.isoformat()
+        return sum(count for created, count in self.get_histogram().items() if created >= day)
+
+
+ACTIVITY_VERBS = Choices(
+    ('created', _('Created')),
+    ('changed', _('Changed')),
+)
+
+
+class Activity(models.Model):
+    """
+    An entry in the activity feed, added for each item saved in a revision.
+    Recent activity for a user or workgroup is read from here in one query,
+    rather than loading the versions in each revision.
+    See :mod:`aristotle_mdr.activity`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='activities'
+    )
+    concept = models.ForeignKey(_concept, related_name='activities')
+    workgroup = models.ForeignKey(
+        Workgroup,
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='activities'
+    )
+    revision = models.ForeignKey(
+        'reversion.Revision',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    verb = models.CharField(max_length=16, choices=ACTIVITY_VERBS)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-timestamp', '-pk']
+        index_together = [
+            ['user', 'timestamp'],
+            ['workgroup', 'timestamp'],
+        ]
+
+    def get_concept_url(self):
+        from aristotle_mdr.sitemaps import item_url
+        if self.concept.uuid_id and self.concept.uuid.model_name:
+            return item_url(self.concept_id, self.concept.name, self.concept.uuid.model_name)
+        return self.concept.get_absolute_url()
+
+
+# Favourites are checked on nearly every page a user sees, so the ids are
+# cached and invalidated whenever the favourites relation changes.
+FAVOURITES_CACHE_SECONDS = 60 * 60
+
+
+def favourites_cache_key(user_id):
+    return 'aristotle_favourites_%s' % user_id
+
+
 # Create a 1-1 user profile so we don't need to extend user
 # Thanks to http://stackoverflow.com/a/965883/764357
 class PossumProfile(models.Model):
@@ -1349,12 +2037,7 @@ class PossumProfile(models.Model):
         if self.user.is_superuser:
             return Workgroup.objects.all()
         else:
-            return (
-                self.user.viewer_in.all() |
-                self.user.submitter_in.all() |
-                self.user.steward_in.all() |
-                self.user.workgroup_manager_in.all()
-            ).distinct()
+            return Workgroup.objects.filter(memberships__user=self.user)
 
     @property
     def myWorkgroups(self):
@@ -1365,10 +2048,10 @@ class PossumProfile(models.Model):
         if self.user.is_superuser:
             return Workgroup.objects.all()
         else:
-            return (
-                self.user.submitter_in.all() |
-                self.user.steward_in.all()
-            ).distinct().filter(archived=False)
+            return Workgroup.objects.filter(
+                Q(memberships__is_submitter=True) | Q(memberships__is_steward=True),
+                memberships__user=self.user,
+            ).filter(archived=False)
 
     @property
     def is_registrar(self):
@@ -1391,8 +2074,32 @@ class PossumProfile(models.Model):
     def is_workgroup_manager(self, wg=None):
         return perms.user_is_workgroup_manager(self.user, wg)
 
+    @property
+    def favourite_ids(self):
+        """
+        The set of ids of the items this user has favourited.
+        This is loaded at most once per profile instance (and so once per request)
+        and shared between requests until the users favourites change.
+        """
+        if getattr(self, '_favourite_ids', None) is None:
+            key = favourites_cache_key(self.user_id)
+            favourite_ids = cache.get(key)
+            if favourite_ids is None:
+                favourite_ids = set(self.favourites.values_list('pk', flat=True))
+                cache.set(key, favourite_ids, FAVOURITES_CACHE_SECONDS)
+            self._favourite_ids = favourite_ids
+        return self._favourite_ids
+
+    @property
+    def favourites_count(self):
+        return len(self.favourite_ids)
+
+    def clear_favourites_cache(self):
+        self._favourite_ids = None
+        cache.delete(favourites_cache_key(self.user_id))
+
     def is_favourite(self, item):
-        return self.favourites.filter(pk=item.pk).exists()
+        return item.pk in self.favourite_ids
 
     def toggleFavourite(self, item):
         if self.is_favourite(item):
@@ -1407,6 +2114,72 @@ def create_user_profile(sender, instance, created, **kwargs):
 post_save.connect(create_user_profile, sender=settings.AUTH_USER_MODEL)
 
 
+@receiver(m2m_changed, sender=PossumProfile.favourites.through)
+def favourites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear', 'post_clear']:
+        return
+    if not reverse:
+        instance.clear_favourites_cache()
+        return
+    # The relation was changed from the item side, so clear every profile touched.
+    if action == 'pre_clear':
+        instance._favourited_by_user_ids = list(instance.favourited_by.values_list('user_id', flat=True))
+        return
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_favourited_by_user_ids', [])
+    else:
+        user_ids = PossumProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    cache.delete_many([favourites_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(pre_delete, sender=_concept)
+def favourited_concept_deleted(sender, instance, **kwargs):
+    # Deleting an item removes it from favourites without sending m2m_changed
+    user_ids = instance.favourited_by.values_list('user_id', flat=True)
+    cache.delete_many([favourites_cache_key(user_id) for user_id in user_ids])
+
+
+def membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Users permission terms are cached against their membership version,
+    # so any change to who is in a workgroup or registration authority resets it.
+    if action not in ['post_add', 'post_remove', 'pre_clear', 'post_clear']:
+        return
+    if reverse:
+        if action != 'pre_clear':
+            perms.clear_membership_version([instance.pk])
+        return
+    if action == 'pre_clear':
+        user_field = [
+            f for f in sender._meta.fields
+            if f.is_relation and f.related_model == get_user_model()
+        ][0]
+        group_field = [
+            f for f in sender._meta.fields
+            if f.is_relation and isinstance(instance, f.related_model)
+        ][0]
+        instance._cleared_member_ids = list(
+            sender.objects.filter(**{group_field.name: instance}).values_list(user_field.attname, flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_member_ids', [])
+    perms.clear_membership_version(pk_set)
+
+for membership in [
+    Workgroup.viewers, Workgroup.submitters, Workgroup.stewards,
+    Workgroup.managers, RegistrationAuthority.registrars
+]:
+    m2m_changed.connect(membership_changed, sender=membership.through)
+
+
+@receiver(post_save)
+def update_concept_name_index(sender, instance, created, **kwargs):
+    if not issubclass(sender, _concept):
+        return
+    if created or instance.tracker.has_changed('name'):
+        name_index.update_name_index(instance, using=kwargs.get('using'))
+
+
 @receiver(post_save)
 def concept_saved(sender, instance, **kwargs):
     if not issubclass(sender, _concept):
@@ -1423,6 +2196,37 @@ def concept_saved(sender, instance, **kwargs):
     fire("concept_changes.concept_saved", obj=instance, **kwargs)
 
 
+@receiver(post_save, sender=Version)
+def record_activity(sender, instance, created, **kwargs):
+    """
+    Adds an entry to the activity feed when an item is saved in a revision.
+    Items have versions for both their own model and ``_concept``, but are only recorded once.
+    """
+    if not created or kwargs.get('raw'):
+        return
+    from django.contrib.contenttypes.models import ContentType
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model is None or not issubclass(model, _concept):
+        return
+    concept = _concept.objects.filter(pk=instance.object_id).values_list('pk', 'workgroup_id').first()
+    if concept is None:
+        return
+    if Activity.objects.filter(revision_id=instance.revision_id, concept_id=concept[0]).exists():
+        return
+    earlier = Version.objects.filter(
+        content_type_id=instance.content_type_id, object_id=instance.object_id
+    ).exclude(revision_id=instance.revision_id)
+    revision = instance.revision
+    Activity.objects.create(
+        user_id=revision.user_id,
+        concept_id=concept[0],
+        workgroup_id=concept[1],
+        revision=revision,
+        verb=ACTIVITY_VERBS.changed if earlier.exists() else ACTIVITY_VERBS.created,
+        timestamp=revision.date_created,
+    )
+
+
 @receiver(pre_save)
 def check_concept_app_label(sender, instance, **kwargs):
     if not issubclass(sender, _concept):
@@ -0,0 +1,149 @@
+"""
+Concept name index
+------------------
+
+Looking up items by name with ``name__icontains`` or ``name__iexact`` can't use
+a regular database index, so these lookups get slower as a registry grows.
+
+On PostgreSQL, when the ``pg_trgm`` extension is available, migrations add a
+trigram index and a case-insensitive index on item names and the regular
+lookups are used as is.
+
+On other databases Aristotle maintains a portable index instead, with a
+normalised name key (see ``ConceptNameKey``) and the set of trigrams in the
+name (see ``ConceptNameTrigram``) for every item. These are updated whenever an
+item is saved, and can be rebuilt with the ``build_name_index`` management command.
+
+Use :func:`name_contains_q` and :func:`name_exact_q` in place of the plain name
+lookups to make use of whichever index is available.
+"""
+from __future__ import unicode_literals
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Q
+
+NAME_KEY_LENGTH = 255
+TRIGRAM_INDEX_NAME = 'aristotle_mdr__concept_name_trgm'
+
+_trigram_index_available = {}
+
+
+def normalise_name(name):
+    """Lower case the name and collapse all whitespace to single spaces."""
+    return " ".join(name.lower().split())
+
+
+def name_key(name):
+    return normalise_name(name)[:NAME_KEY_LENGTH]
+
+
+def trigrams(text):
+    """
+    Returns the set of three character sequences in the lower cased text.
+    If a name contains some text, the trigrams of the text are always a subset
+    of the trigrams of the name.
+    """
+    text = text.lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def uses_trigram_index(using=DEFAULT_DB_ALIAS):
+    """
+    Returns True if the database has the PostgreSQL trigram index on item names,
+    in which case the portable name index isn't maintained or used.
+    """
+    if using not in _trigram_index_available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [TRIGRAM_INDEX_NAME])
+                available = cursor.fetchone() is not None
+        _trigram_index_available[using] = available
+    return _trigram_index_available[using]
+
+
+def name_contains_q(text, using=DEFAULT_DB_ALIAS):
+    """
+    Returns a ``Q`` object that matches the same items as ``Q(name__icontains=text)``,
+    but first narrows the items down to those that have every trigram in the text.
+    """
+    from aristotle_mdr.models import ConceptNameTrigram
+
+    grams = trigrams(text)
+    if not grams or uses_trigram_index(using):
+        return Q(name__icontains=text)
+
+    matching = ConceptNameTrigram.objects.filter(
+        trigram__in=grams
+    ).values('concept').annotate(
+        matches=Count('trigram', distinct=True)
+    ).filter(matches=len(grams)).values('concept')
+    return Q(pk__in=matching, name__icontains=text)
+
+
+def name_exact_q(name, using=DEFAULT_DB_ALIAS):
+    """
+    Returns a ``Q`` object that matches the same items as ``Q(name__iexact=name)``,
+    using the normalised name key to find the candidate items.
+    """
+    if uses_trigram_index(using):
+        return Q(name__iexact=name)
+    return Q(name_key__key=name_key(name), name__iexact=name)
+
+
+def update_name_index(concept, using=DEFAULT_DB_ALIAS):
+    """Updates the name key and trigrams for an item after its name changes."""
+    from aristotle_mdr.models import ConceptNameKey, ConceptNameTrigram
+
+    if uses_trigram_index(using):
+        return
+
+    ConceptNameKey.objects.using(using).update_or_create(
+        concept_id=concept.pk, defaults={'key': name_key(concept.name)}
+    )
+    grams = trigrams(concept.name)
+    existing = set(
+        ConceptNameTrigram.objects.using(using).filter(
+            concept_id=concept.pk
+        ).values_list('trigram', flat=True)
+    )
+    if existing - grams:
+        ConceptNameTrigram.objects.using(using).filter(
+            concept_id=concept.pk, trigram__in=existing - grams
+        ).delete()
+    ConceptNameTrigram.objects.using(using).bulk_create([
+        ConceptNameTrigram(concept_id=concept.pk, trigram=gram)
+        for gram in grams - existing
+    ])
+
+
+def rebuild_name_index(batch_size=500, using=DEFAULT_DB_ALIAS):
+    """
+    Rebuilds the name index for every item, returns the number of items indexed.
+    """
+    from aristotle_mdr.models import _concept, ConceptNameKey, ConceptNameTrigram
+
+    ConceptNameTrigram.objects.using(using).all().delete()
+    ConceptNameKey.objects.using(using).all().delete()
+    if uses_trigram_index(using):
+        return 0
+
+    count = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            _concept.objects.using(using).filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'name')[:batch_size]
+        )
+        if not batch:
+            break
+        ConceptNameKey.objects.using(using).bulk_create([
+            ConceptNameKey(concept_id=pk, key=name_key(name)) for pk, name in batch
+        ])
+        ConceptNameTrigram.objects.using(using).bulk_create([
+            ConceptNameTrigram(concept_id=pk, trigram=gram)
+            for pk, name in batch for gram in trigrams(name)
+        ])
+        count += len(batch)
+        last_pk = batch[-1][0]
+    return count
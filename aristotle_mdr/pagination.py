@@ -0,0 +1,302 @@
+"""
+Keyset pagination
+-----------------
+
+Django's ``Paginator`` pages through a queryset with ``OFFSET``, so the database
+has to walk past every earlier item to show a later page, and it counts the
+whole queryset to work out the number of pages. Both get slower as lists grow.
+
+A :class:`KeysetPaginator` instead pages through a queryset ordered by one of
+the sort options in ``aristotle_mdr.views.utils.paginate_sort_opts``, with the
+primary key to break ties. Each page links to the next and previous pages with
+an opaque, signed cursor that holds the sort values of the first or last item
+on the page, and the next page is found by filtering for items after those
+values. So every page costs the same, however deep it is.
+
+Counting the items in the list can be turned off, or served from a cached or
+approximate count, with the ``KEYSET_PAGINATION_COUNT`` setting.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import hashlib
+import json
+import math
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
+
+from aristotle_mdr.utils import fetch_aristotle_settings
+
+CURSOR_SALT = 'aristotle_mdr.pagination.cursor'
+COUNT_MODES = ['exact', 'cached', 'approximate', 'none']
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def keyset_pagination_enabled():
+    return fetch_aristotle_settings().get('KEYSET_PAGINATION', False)
+
+
+def _dump_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'datetime': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict) and 'datetime' in value:
+        return parse_datetime(value['datetime'])
+    return value
+
+
+def keyset_keys(ordering):
+    """
+    Returns a list of ``(expression, descending)`` pairs for each part of an ordering,
+    with the primary key added to break ties.
+    """
+    keys = []
+    for part in ordering:
+        if isinstance(part, OrderBy):
+            keys.append((part.expression, part.descending))
+        elif part.startswith('-'):
+            keys.append((F(part[1:]), True))
+        else:
+            keys.append((F(part), False))
+    keys.append((F('pk'), keys[-1][1] if keys else False))
+    return keys
+
+
+def count_queryset(queryset, mode='exact', timeout=300):
+    """
+    Returns the number of items in a queryset, or None if ``mode`` is ``'none'``.
+
+    ``'cached'`` counts are kept for ``timeout`` seconds. ``'approximate'`` counts
+    use the query planner's estimate on PostgreSQL, and a cached count otherwise.
+    """
+    if mode == 'none':
+        return None
+    if mode == 'exact':
+        return queryset.count()
+    if mode == 'approximate':
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'aristotle_mdr_pagination_count_%s' % hashlib.md5(
+        force_text((sql, params)).encode('utf-8')
+    ).hexdigest()
+    count = cache.get(key, None)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def estimate_count(queryset):
+    """
+    Returns the number of rows PostgreSQL expects a queryset to return, or None
+    on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage(object):
+    """
+    A page of items from a :class:`KeysetPaginator`.
+
+    Has the same methods as a Django ``Page``, except that there is no page range
+    and the page number is only known from following cursors.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Page %s>' % self.number
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return self.paginator.per_page * (self.number - 1) + 1
+
+    def end_index(self):
+        return self.paginator.per_page * (self.number - 1) + len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.cursor(self.object_list[-1], NEXT, self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        if self.number <= 2:
+            # The first page doesn't need a cursor
+            return ''
+        return self.paginator.cursor(self.object_list[0], PREVIOUS, self.number - 1)
+
+
+class KeysetPaginator(object):
+    """
+    Pages through ``object_list`` in the order of ``ordering``, a list of field
+    names or ordering expressions, such as a value from ``paginate_sort_opts``.
+
+    ``sort`` names the ordering in cursors, so a cursor for one sort isn't used for another.
+    """
+    def __init__(self, object_list, per_page, ordering, sort='', count_mode=None, count_timeout=None):
+        settings = fetch_aristotle_settings()
+        try:
+            self.per_page = max(int(per_page), 1)
+        except (TypeError, ValueError):
+            self.per_page = 20
+        self.sort = sort
+        self.keys = keyset_keys(ordering)
+        self.count_mode = count_mode or settings.get('KEYSET_PAGINATION_COUNT', 'cached')
+        if self.count_mode not in COUNT_MODES:
+            self.count_mode = 'cached'
+        if count_timeout is None:
+            count_timeout = settings.get('KEYSET_PAGINATION_COUNT_CACHE_SECONDS', 300)
+        self.count_timeout = count_timeout
+        self.unordered_list = object_list
+        self.object_list = object_list.annotate(
+            **dict(self.key_annotations)
+        ).order_by(*self.key_ordering(reverse=False))
+
+    @property
+    def key_annotations(self):
+        return [('keyset_%d' % i, expression) for i, (expression, descending) in enumerate(self.keys)]
+
+    def key_ordering(self, reverse):
+        ordering = []
+        for (name, expression), (_, descending) in zip(self.key_annotations, self.keys):
+            ordering.append(('-' if descending != reverse else '') + name)
+        return ordering
+
+    @cached_property
+    def count(self):
+        return count_queryset(self.unordered_list, self.count_mode, self.count_timeout)
+
+    @property
+    def has_count(self):
+        return self.count is not None
+
+    @property
+    def count_is_approximate(self):
+        return self.count_mode == 'approximate'
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, int(math.ceil(self.count / float(self.per_page))))
+
+    def cursor(self, item, direction, number):
+        values = [_dump_value(getattr(item, name)) for name, expression in self.key_annotations]
+        return signing.dumps(
+            {'s': self.sort, 'd': direction, 'n': number, 'k': values},
+            salt=CURSOR_SALT, compress=True
+        )
+
+    def load_cursor(self, cursor):
+        """
+        Returns the ``(direction, number, values)`` stored in a cursor,
+        or None if the cursor is missing, invalid or for a different sort.
+        """
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if data.get('s') != self.sort or len(data.get('k', [])) != len(self.keys):
+            return None
+        if data.get('d') not in (NEXT, PREVIOUS):
+            return None
+        return data['d'], max(int(data.get('n', 1)), 1), [_load_value(v) for v in data['k']]
+
+    def after_q(self, values, reverse):
+        """
+        Returns a ``Q`` object that matches the items after the ``values`` of
+        the keys, or before them if ``reverse`` is True.
+        """
+        query = Q()
+        names = [name for name, expression in self.key_annotations]
+        for i, (name, (expression, descending)) in enumerate(zip(names, self.keys)):
+            lookup = 'lt' if descending != reverse else 'gt'
+            part = Q(**{'%s__%s' % (name, lookup): values[i]})
+            for j in range(i):
+                part &= Q(**{names[j]: values[j]})
+            query |= part
+        return query
+
+    def page(self, cursor=None):
+        state = self.load_cursor(cursor)
+        if state is None:
+            items = list(self.object_list[:self.per_page + 1])
+            return KeysetPage(
+                items[:self.per_page], 1, self,
+                has_next=len(items) > self.per_page, has_previous=False
+            )
+
+        direction, number, values = state
+        if direction == NEXT:
+            items = list(self.object_list.filter(self.after_q(values, reverse=False))[:self.per_page + 1])
+            return KeysetPage(
+                items[:self.per_page], number, self,
+                has_next=len(items) > self.per_page, has_previous=True
+            )
+
+        items = list(
+            self.object_list.filter(
+                self.after_q(values, reverse=True)
+            ).order_by(*self.key_ordering(reverse=True))[:self.per_page + 1]
+        )
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page]
+        items.reverse()
+        return KeysetPage(
+            items, number if has_previous else 1, self,
+            has_next=True, has_previous=has_previous
+        )
@@ -1,3 +1,5 @@
+import uuid
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
@@ -5,6 +7,7 @@ from aristotle_mdr.utils import fetch_aristotle_settings
 
 VIEW_CACHE_SECONDS=60
 EDIT_CACHE_SECONDS=60
+PERMISSION_TERMS_CACHE_SECONDS = 60 * 60 * 24
 
 
 def user_can_alter_comment(user, comment):
@@ -105,7 +108,7 @@ def user_is_registrar(user, ra=None):
     if user.is_superuser:
         return True
     elif ra is None:
-        return user.registrar_in.count() > 0
+        return len(user_permission_terms(user)['registration_authorities']) > 0
     else:
         return user in ra.registrars.all()
 
@@ -125,9 +128,9 @@ def user_is_workgroup_manager(user, workgroup=None):
     if user.is_superuser:
         return True
     elif workgroup is None:
-        return user.workgroup_manager_in.count() > 0
+        return any('manager' in roles for roles in user_workgroup_roles(user).values())
     else:
-        return user in workgroup.managers.all()
+        return 'manager' in user_workgroup_roles(user).get(workgroup.pk, ())
 
 
 def user_can_change_status(user, item):
@@ -168,7 +171,7 @@ def user_can_view_review(user, review):
 def user_in_workgroup(user, wg):
     if user.is_superuser:
         return True
-    return user in wg.members
+    return wg.pk in user_workgroup_roles(user)
 
 
 def user_can_move_any_workgroup(user):
@@ -181,7 +184,9 @@ def user_can_move_any_workgroup(user):
         return True
     if 'manager' in workgroup_change_access and user.profile.is_workgroup_manager():
         return True
-    if 'submitter' in workgroup_change_access and user.submitter_in.exists():
+    if 'submitter' in workgroup_change_access and any(
+        'submitter' in roles for roles in user_workgroup_roles(user).values()
+    ):
         return True
 
     return False
@@ -194,9 +199,10 @@ def user_can_add_or_remove_workgroup(user, workgroup):
         return True
     if 'admin' in workgroup_change_access and user.has_perm("aristotle_mdr.is_registry_administrator"):
         return True
-    if 'manager' in workgroup_change_access and user in workgroup.managers.all():
+    roles = user_workgroup_roles(user).get(workgroup.pk, ())
+    if 'manager' in workgroup_change_access and 'manager' in roles:
         return True
-    if 'submitter' in workgroup_change_access and user in workgroup.submitters.all():
+    if 'submitter' in workgroup_change_access and 'submitter' in roles:
         return True
     return False
 
@@ -216,3 +222,80 @@ def user_can_move_between_workgroups(user, workgroup_a, workgroup_b):
 
 def user_can_query_user_list(user):
     return user.is_superuser or user.profile.is_workgroup_manager() or user.profile.is_registrar
+
+
+def membership_version_key(user_id):
+    return 'aristotle_membership_version_%s' % user_id
+
+
+def membership_version(user):
+    """
+    Returns an opaque token that changes whenever the workgroups or registration
+    authorities a user belongs to change. Caches keyed on it are invalidated
+    by :func:`clear_membership_version` without needing to know their keys.
+    """
+    key = membership_version_key(user.pk)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    return version
+
+
+def clear_membership_version(user_ids):
+    cache.delete_many([membership_version_key(user_id) for user_id in user_ids])
+
+
+def user_permission_terms(user):
+    """
+    Returns the ids of the workgroups the user is a member of and the ids of the
+    registration authorities they are a registrar in. These are the terms used
+    to restrict searches and querysets to the items a user can see.
+
+    The terms are cached under the user's membership version, and kept on the
+    user object so repeated checks in a request only need to check the version.
+    """
+    if user.is_anonymous() or user.is_superuser:
+        return {'workgroups': [], 'registration_authorities': []}
+
+    version = membership_version(user)
+    cached = getattr(user, '_aristotle_permission_terms', None)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    key = 'aristotle_permission_terms_%s_%s' % (user.pk, version)
+    terms = cache.get(key)
+    if terms is None:
+        terms = {
+            'workgroups': sorted(user.profile.workgroups.values_list('pk', flat=True)),
+            'registration_authorities': sorted(user.registrar_in.values_list('pk', flat=True)),
+        }
+        cache.set(key, terms, PERMISSION_TERMS_CACHE_SECONDS)
+    user._aristotle_permission_terms = (version, terms)
+    return terms
+
+
+def user_workgroup_roles(user):
+    """
+    Returns a dictionary of the set of roles a user has in each workgroup they
+    are a member of, by workgroup id.
+
+    The memberships are loaded with one query and kept on the user object, so
+    every membership check in a request shares them until the user's
+    membership version changes.
+    """
+    if user.is_anonymous():
+        return {}
+
+    version = membership_version(user)
+    cached = getattr(user, '_aristotle_workgroup_roles', None)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    from aristotle_mdr.models import WorkgroupMembership
+    roles = dict(
+        (membership.workgroup_id, membership.roles)
+        for membership in WorkgroupMembership.objects.filter(user_id=user.pk)
+    )
+    user._aristotle_workgroup_roles = (version, roles)
+    return roles
@@ -39,6 +39,8 @@ class baseObjectIndex(indexes.SearchIndex):
     modified = indexes.DateTimeField(model_attr='modified')
     created = indexes.DateTimeField(model_attr='created')
     name = indexes.CharField(model_attr='name', boost=1)
+    # Prefix n-grams of the name, used by the search-backed autocomplete
+    name_autocomplete = indexes.EdgeNgramField(model_attr='name')
     django_ct_app_label = indexes.CharField()
     # django_ct_model_name = indexes.CharField()
     # access = indexes.MultiValueField()
@@ -18,13 +18,14 @@ def pre_save_clean(sender, instance, *args, **kwargs):
 
 class AristotleSignalProcessor(signals.BaseSignalProcessor):
     def setup(self):
-        from aristotle_mdr.models import _concept, Workgroup, ReviewRequest, concept_visibility_updated
+        from aristotle_mdr.models import _concept, Workgroup, ReviewRequest, concept_visibility_updated, concepts_bulk_updated
         post_save.connect(self.handle_concept_save)
         # post_revision_commit.connect(self.handle_concept_revision)
         pre_delete.connect(self.handle_concept_delete, sender=_concept)
         post_save.connect(self.update_visibility_review_request, sender=ReviewRequest)
         m2m_changed.connect(self.update_visibility_review_request, sender=ReviewRequest.concepts.through)
         concept_visibility_updated.connect(self.handle_concept_recache)
+        concepts_bulk_updated.connect(self.handle_concepts_bulk_update)
         super(AristotleSignalProcessor, self).setup()
 
     def teardown(self):  # pragma: no cover
@@ -34,11 +35,45 @@ class AristotleSignalProcessor(signals.BaseSignalProcessor):
         pre_delete.disconnect(self.handle_concept_delete, sender=_concept)
         super(AristotleSignalProcessor, self).teardown()
 
+    def handle_save(self, sender, instance, **kwargs):
+        super(AristotleSignalProcessor, self).handle_save(sender, instance, **kwargs)
+        self.index_updated()
+
+    def handle_delete(self, sender, instance, **kwargs):
+        super(AristotleSignalProcessor, self).handle_delete(sender, instance, **kwargs)
+        self.index_updated()
+
+    def index_updated(self):
+        # Anything cached from search results, like facet counts, is now out of date
+        from aristotle_mdr.forms.search import search_index_updated
+        search_index_updated()
+
     def handle_concept_recache(self, concept, **kwargs):
         from aristotle_mdr.models import _concept
         instance = concept.item
         self.handle_save(instance.__class__, instance)
 
+    def handle_concepts_bulk_update(self, concepts, **kwargs):
+        """
+        Reindex a set of concepts changed with a queryset ``update``, sending
+        one batch to the backend for each type of concept.
+        """
+        from haystack.exceptions import NotHandled
+        by_model = {}
+        for obj in concepts.select_subclasses():
+            by_model.setdefault(obj.__class__, []).append(obj)
+
+        for using in self.connection_router.for_write():
+            unified_index = self.connections[using].get_unified_index()
+            backend = self.connections[using].get_backend()
+            for model, objs in by_model.items():
+                try:
+                    index = unified_index.get_index(model)
+                except NotHandled:
+                    continue
+                backend.update(index, objs)
+        self.index_updated()
+
     # Keeping this just in case, but its unlikely to be used again as django-reversion
     # has remove the post_revision_commit signals.
     # Safe to delete after 2017-07-01
@@ -0,0 +1,134 @@
+"""
+Sitemaps
+--------
+
+Public items are listed in sitemap pages of up to ``PAGE_SIZE`` items, where each
+page holds the items with primary keys in a fixed range. So a page can be found
+with the primary key index, however many items there are, and pages don't shift
+as items are added or removed.
+
+Each page is cached along with a signature of the public items in its range, the
+count, the sum of their primary keys and when they were last modified, and is
+only generated again when this changes.
+
+The ``build_sitemaps`` management command writes the same sitemaps as static,
+gzipped files, and only rewrites the pages that have changed since it last ran.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db.models import Count, F, Func, IntegerField, Max, Sum, Value
+from django.template.defaultfilters import slugify
+from django.template.loader import render_to_string
+
+from aristotle_mdr.utils import fetch_aristotle_settings
+
+PAGE_SIZE = 1000
+
+
+class PageNumber(Func):
+    """The sitemap page of an item, the integer division of its primary key by the page size."""
+    template = '(%(expressions)s)'
+    arg_joiner = ' / '
+
+    def __init__(self, expression, page_size=PAGE_SIZE):
+        super(PageNumber, self).__init__(expression, Value(page_size), output_field=IntegerField())
+
+    def as_mysql(self, compiler, connection):
+        clone = self.copy()
+        clone.arg_joiner = ' DIV '
+        return super(PageNumber, clone).as_sql(compiler, connection)
+
+    def as_oracle(self, compiler, connection):
+        return self.as_sql(compiler, connection, template='FLOOR(%(expressions)s)')
+
+
+def sitemap_items():
+    from aristotle_mdr.models import _concept
+    return _concept.objects.public()
+
+
+def page_items(page):
+    return sitemap_items().filter(pk__gte=page * PAGE_SIZE, pk__lt=(page + 1) * PAGE_SIZE)
+
+
+def page_signatures():
+    """
+    Returns a list of ``(page, signature)`` for every page with public items, in one query.
+    A signature is the ``(count, pk_sum, lastmod)`` of the items on the page.
+    """
+    pages = sitemap_items().annotate(
+        sitemap_page=PageNumber(F('pk'))
+    ).order_by().values('sitemap_page').annotate(
+        count=Count('pk'), pk_sum=Sum('pk'), lastmod=Max('modified')
+    ).order_by('sitemap_page')
+    signatures = [
+        (page['sitemap_page'], (page['count'], page['pk_sum'], page['lastmod']))
+        for page in pages
+    ]
+    if not signatures or signatures[0][0] != 0:
+        # The first page is always listed, as it also holds the home page
+        signatures.insert(0, (0, (0, None, None)))
+    return signatures
+
+
+def page_signature(page):
+    signature = page_items(page).aggregate(count=Count('pk'), pk_sum=Sum('pk'), lastmod=Max('modified'))
+    return (signature['count'], signature['pk_sum'], signature['lastmod'])
+
+
+def item_url(pk, name, model_name):
+    """
+    Returns the URL of an item without loading it, which ``get_absolute_url`` has to do to find its type.
+    """
+    slug = slugify(name)[:50] or "--"
+    return reverse("aristotle:item", kwargs={'iid': pk, 'model_slug': model_name, 'name_slug': slug})
+
+
+def render_index(base_url, pages, page_url=None):
+    """
+    Returns the sitemap index for a list of ``(page, signature)``.
+    ``page_url`` returns the URL of a page, by default the URL of the sitemap page view.
+    """
+    if page_url is None:
+        def page_url(page):
+            return base_url + reverse('aristotle:sitemap_range_xml', args=[page])
+    return render_to_string("meta/sitemaps/main.xml", {
+        'pages': [(page_url(page), signature[2]) for page, signature in pages],
+    })
+
+
+def render_page(base_url, page):
+    from aristotle_mdr.models import _concept
+
+    items = []
+    for pk, name, modified, model_name in page_items(page).order_by('pk').values_list(
+        'pk', 'name', 'modified', 'uuid__model_name'
+    ):
+        if model_name:
+            url = item_url(pk, name, model_name)
+        else:
+            url = _concept.objects.get(pk=pk).get_absolute_url()
+        items.append((url, modified))
+    return render_to_string("meta/sitemaps/page.xml", {'base_url': base_url, 'items': items})
+
+
+def cached_page(base_url, page, signature=None):
+    """
+    Returns a sitemap page, from the cache if none of its items have changed,
+    or None if the page has no public items (other than the first page, which also holds the home page).
+    """
+    if signature is None:
+        signature = page_signature(page)
+    if not signature[0] and page != 0:
+        return None
+    key = 'aristotle_mdr_sitemap_%s_%s' % (hashlib.md5(base_url.encode('utf-8')).hexdigest(), page)
+    cached = cache.get(key, None)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    xml = render_page(base_url, page)
+    cache.set(key, (signature, xml), fetch_aristotle_settings().get('SITEMAP_CACHE_SECONDS', 86400))
+    return xml
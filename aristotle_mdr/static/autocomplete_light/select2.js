@@ -58,7 +58,8 @@ https://github.com/yourlabs/django-autocomplete-light/blob/63abc0308e1cf30823353
             ajax = {
                 url: $(this).attr('data-autocomplete-light-url'),
                 dataType: 'json',
-                delay: 250,
+                /* changed for Aristotle, the delay can be set with CONCEPT_AUTOCOMPLETE_DEBOUNCE */
+                delay: parseInt(element.attr('data-autocomplete-light-delay'), 10) || 250,
 
                 data: function (params) {
                     var data = {
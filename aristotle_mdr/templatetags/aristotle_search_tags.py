@@ -11,8 +11,13 @@ Include the aristotle search template tags in every template that uses them, lik
     {% load aristotle_search_tags %}
 
 """
+from collections import OrderedDict
+import threading
+import time
+
 from django import template
 from django.core.urlresolvers import reverse, resolve
+from django.db.models.signals import post_delete, post_save
 from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext_lazy as _
 
@@ -72,22 +77,125 @@ def search_describe_filters(search_form):
     return out
 
 
-@register.filter
-def get_item_from_facet(_type, _id):
+# The search facets that refer to items, and the type used for them in get_item_from_facet
+FACET_ITEM_TYPES = {
+    'registrationAuthorities': 'ra',
+    'workgroup': 'wg',
+    'facet_model_ct': 'ct',
+}
+
+
+def facet_item_model(_type):
     from django.contrib.contenttypes.models import ContentType
 
-    model_type = {
+    return {
         'ra': MDR.RegistrationAuthority,
         'wg': MDR.Workgroup,
         'ct': ContentType,
     }.get(_type, None)
 
+
+class FacetItemCache(object):
+    """
+    A small, in-process, least recently used cache of the registration authorities,
+    workgroups and item types shown in search facets.
+    Entries expire after ``timeout`` seconds, so names changed in other processes are picked up.
+    """
+    def __init__(self, size=500, timeout=300):
+        self.size = size
+        self.timeout = timeout
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, _type, pk):
+        with self.lock:
+            entry = self.items.pop((_type, pk), None)
+            if entry is None or entry[0] < time.time():
+                return None
+            # Move the item to the most recently used end
+            self.items[(_type, pk)] = entry
+            return entry[1]
+
+    def set(self, _type, pk, item):
+        with self.lock:
+            self.items.pop((_type, pk), None)
+            self.items[(_type, pk)] = (time.time() + self.timeout, item)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self, _type=None):
+        with self.lock:
+            if _type is None:
+                self.items.clear()
+            else:
+                for key in [key for key in self.items.keys() if key[0] == _type]:
+                    del self.items[key]
+
+    def load(self, _type, pks):
+        """
+        Loads any items that aren't already cached in a single query.
+        """
+        model_type = facet_item_model(_type)
+        missing = [pk for pk in pks if self.get(_type, pk) is None]
+        if model_type is None or not missing:
+            return
+        for item in model_type.objects.filter(pk__in=missing):
+            self.set(_type, item.pk, item)
+
+
+facet_item_cache = FacetItemCache()
+
+
+def clear_facet_item_cache(sender, **kwargs):
+    facet_item_cache.clear({
+        MDR.RegistrationAuthority: 'ra',
+        MDR.Workgroup: 'wg',
+    }[sender])
+
+
+for facet_sender in [MDR.RegistrationAuthority, MDR.Workgroup]:
+    post_save.connect(clear_facet_item_cache, sender=facet_sender)
+    post_delete.connect(clear_facet_item_cache, sender=facet_sender)
+
+
+def facet_pks(values):
+    pks = []
+    for value, count in values:
+        try:
+            pks.append(int(value))
+        except (TypeError, ValueError):
+            pass
+    return pks
+
+
+@register.simple_tag
+def load_facet_items(facet_fields):
+    """
+    Takes the facet fields of a search and loads the registration authorities,
+    workgroups and item types they refer to, with one query for each type of item,
+    so ``get_item_from_facet`` doesn't have to look them up one at a time.
+    """
+    for field, _type in FACET_ITEM_TYPES.items():
+        values = facet_fields.get(field, None)
+        if values:
+            facet_item_cache.load(_type, facet_pks(values))
+    return ""
+
+
+@register.filter
+def get_item_from_facet(_type, _id):
+    model_type = facet_item_model(_type)
+
     item = None
 
     if model_type and _id:
+        pk = int(_id)
+        item = facet_item_cache.get(_type, pk)
+        if item is not None:
+            return item
         # Related to https://github.com/aristotle-mdr/aristotle-metadata-registry/pull/343
         # This fails sometimes on Postgres in *tests only*... so far.
-        item = model_type.objects.filter(pk=int(_id)).first()
+        item = model_type.objects.filter(pk=pk).first()
         if item is None:
             logger.warning(
                 "Warning: Failed to find item type [%s] with id [%s]" % (model_type, _id)
@@ -96,6 +204,8 @@ def get_item_from_facet(_type, _id):
                 'name': 'None',
                 'id': _id
             }
+        else:
+            facet_item_cache.set(_type, pk, item)
     return item
 
 
@@ -119,6 +229,18 @@ def first_letters(string):
     return ''.join(s[0].upper() for s in string.split(" "))
 
 
+@register.filter
+def current_statuses(item):
+    """
+    Returns the current statuses of an item, using the statuses loaded with
+    the page of search results when they are available.
+    """
+    statuses = getattr(item, 'search_current_statuses', None)
+    if statuses is None:
+        statuses = item.current_statuses()
+    return statuses
+
+
 @register.simple_tag
 def facet_display(details, val):
     if details.get('display', None):
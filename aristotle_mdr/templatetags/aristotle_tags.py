@@ -22,7 +22,7 @@ from django.utils.html import mark_safe
 
 from aristotle_mdr import perms
 import aristotle_mdr.models as MDR
-from aristotle_mdr.utils import fetch_metadata_apps, fetch_aristotle_settings, fetch_aristotle_downloaders
+from aristotle_mdr.utils import fetch_metadata_apps, fetch_aristotle_settings
 
 register = template.Library()
 
@@ -168,7 +168,23 @@ def paginator_get(request, pageNumber, pop=''):
     dict_ = request.GET.copy()
     for p in pop.split(','):
         dict_.pop(p, None)
-    dict_['page'] = pageNumber
+    dict_.pop('cursor', None)
+    if pageNumber is not None:
+        dict_['page'] = pageNumber
+    return dict_.urlencode()
+
+
+@register.simple_tag
+def cursor_get(request, cursor):
+    """
+    Returns the query string for a page of a list with keyset pagination,
+    where ``cursor`` is the ``next_cursor`` or ``previous_cursor`` of a page.
+    """
+    dict_ = request.GET.copy()
+    dict_.pop('page', None)
+    dict_.pop('cursor', None)
+    if cursor:
+        dict_['cursor'] = cursor
     return dict_.urlencode()
 
 
@@ -296,35 +312,9 @@ def downloadMenu(item):
     """
     from django.template.loader import get_template
     from django.template import Context
-    downloadOpts = fetch_aristotle_downloaders()
-    from aristotle_mdr.utils import get_download_template_path_for_item
-    from aristotle_mdr.utils.downloads import get_download_module
-
-    downloadsForItem = []
-    app_label = item._meta.app_label
-    model_name = item._meta.model_name
-    for d in downloadOpts:
-        download_type = d.download_type
-        # module_name = d[3]
-        # downloader = get_download_module(module_name)
-        item_register = d.metadata_register
-
-        if type(item_register) is not str:
-            if item_register.get(app_label, []) == '__all__':
-                downloadsForItem.append(d)
-            elif model_name in item_register.get(app_label, []):
-                downloadsForItem.append(d)
-        else:
-            if item_register == '__all__':
-                downloadsForItem.append(d)
-            elif item_register == '__template__':
-                try:
-                    get_template(get_download_template_path_for_item(item, download_type))
-                    downloadsForItem.append(d)
-                except template.TemplateDoesNotExist:
-                    pass  # This is ok.
-                except:
-                    raise  # pass  # Something very bad has happened in the template.
+    from aristotle_mdr.utils.downloads import get_downloaders_for_item
+
+    downloadsForItem = get_downloaders_for_item(item)
     return get_template(
         "aristotle_mdr/helpers/downloadMenu.html").render(
         Context({'item': item, 'download_options': downloadsForItem, })
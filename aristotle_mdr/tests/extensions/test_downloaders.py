@@ -35,3 +35,36 @@ class TextDownloader(utils.LoggedInViewPages, TestCase):
         with self.assertRaises(TemplateSyntaxError):
             # This template is broken on purpose and will throw an error
             response = self.client.get(reverse('aristotle:download', args=['txt', dec.id]))
+
+
+class DownloaderRegistryTests(TestCase):
+    def setUp(self):
+        from aristotle_mdr.utils.downloads import downloader_registry
+        self.registry = downloader_registry
+        self.registry.clear()
+
+    def test_downloaders_resolved_per_model(self):
+        from text_download_test.downloader import TestTextDownloader
+        from aristotle_mdr.downloader import CSVDownloader
+
+        vd_downloaders = self.registry.for_model(models.ValueDomain)
+        self.assertTrue(CSVDownloader in vd_downloaders)
+        self.assertTrue(TestTextDownloader in vd_downloaders)
+
+        oc_downloaders = self.registry.for_model(models.ObjectClass)
+        self.assertFalse(CSVDownloader in oc_downloaders)
+        self.assertTrue(TestTextDownloader in oc_downloaders)
+
+        # Instances share the same cached entry as their class
+        oc = models.ObjectClass(name="OC1")
+        self.assertTrue(self.registry.for_model(oc) is oc_downloaders)
+
+    def test_registry_cleared_on_settings_change(self):
+        from django.conf import settings
+        from django.test.utils import override_settings
+        from text_download_test.downloader import TestTextDownloader
+
+        self.assertTrue(TestTextDownloader in self.registry.for_model(models.ObjectClass))
+        with override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, DOWNLOADERS=[])):
+            self.assertEqual(self.registry.for_model(models.ObjectClass), [])
+        self.assertTrue(TestTextDownloader in self.registry.for_model(models.ObjectClass))
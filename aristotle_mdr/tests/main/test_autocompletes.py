@@ -68,6 +68,34 @@ class LoggedInConceptAutocompletes(utils.LoggedInViewPages, TestCase):
         self.assertEqual(len(data['results']), 1)
         self.assertEqual(str(data['results'][0]['id']), str(item1.id))
 
+    @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, CONCEPT_AUTOCOMPLETE_BACKEND='search'))
+    def test_concept_search_backed_autocompletes(self):
+        item1 = models.ObjectClass.objects.create(name="Autocompleted visible item",definition="my definition",workgroup=self.wg1,**self.defaults)
+        item2 = models.ObjectClass.objects.create(name="Autocompleted hidden item",definition="my definition",workgroup=self.wg2,**self.defaults)
+        url = reverse(
+            "aristotle-autocomplete:concept",
+            kwargs={'app_name': 'aristotle_mdr', 'model_name': 'objectclass'}
+        )
+
+        self.login_viewer()
+        for query in ["aut", "autocompleted"]:
+            response = self.client.get(url + "?q=" + query)
+            data = utils.get_json_from_response(response)
+            ids = [str(result['id']) for result in data['results']]
+            self.assertTrue(str(item1.id) in ids)
+            self.assertFalse(str(item2.id) in ids)
+
+        # Exact matches on ids still work
+        response = self.client.get(url + "?q=%s" % item1.uuid.uuid)
+        data = utils.get_json_from_response(response)
+        self.assertEqual([str(result['id']) for result in data['results']], [str(item1.id)])
+
+        # Short prefixes are cached, but memberships changes are reflected
+        self.wg2.giveRoleToUser('viewer', self.viewer)
+        response = self.client.get(url + "?q=aut")
+        data = utils.get_json_from_response(response)
+        ids = [str(result['id']) for result in data['results']]
+        self.assertTrue(str(item2.id) in ids)
 
 
 class LoggedInUserAutocompletes(utils.LoggedInViewPages, TestCase):
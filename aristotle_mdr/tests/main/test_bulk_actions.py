@@ -107,6 +107,28 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
 
         self.assertEqual(response.status_code, 403)
 
+    def test_bulk_change_workgroup_versions_items_as_their_own_type(self):
+        from reversion.models import Version
+        self.new_workgroup = models.Workgroup.objects.create(name="new workgroup")
+        self.login_superuser()
+        self.assertEqual(Version.objects.get_for_object(self.item1).count(), 0)
+
+        self.client.post(
+            reverse('aristotle:bulk_action'),
+            {
+                'bulkaction': 'aristotle_mdr.forms.bulk_actions.ChangeWorkgroupForm',
+                'items': [self.item1.id, self.item4.id],
+                'workgroup': [self.new_workgroup.id],
+                "confirmed": True
+            }
+        )
+
+        # The move shows in the history of the object class and property, not just the base concept
+        self.assertEqual(Version.objects.get_for_object(self.item1).count(), 1)
+        self.assertEqual(Version.objects.get_for_object(self.item4).count(), 1)
+        version = Version.objects.get_for_object(self.item1).first()
+        self.assertIn("moved into the workgroup 'new workgroup'", version.revision.comment)
+
     @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, WORKGROUP_CHANGES=['submitter']))
     def test_bulk_change_workgroup_for_editor__for_some_items(self):
         self.new_workgroup = models.Workgroup.objects.create(name="new workgroup")
@@ -222,6 +244,79 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
         self.assertTrue(self.item1.current_statuses().first().registrationAuthority == self.ra)
         self.assertTrue(self.item2.current_statuses().first().registrationAuthority == self.ra)
 
+    @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, BULK_ACTION_CHUNK_SIZE=1))
+    def test_bulk_status_change_is_applied_in_chunks(self):
+        import reversion
+        self.login_registrar()
+        review = models.ReviewRequest.objects.create(
+            requester=self.su,registration_authority=self.ra,
+            state=self.ra.locked_state,
+            registration_date=datetime.date(2013,4,2)
+        )
+        review.concepts.add(self.item1)
+        review.concepts.add(self.item2)
+        revisions_before = reversion.models.Revision.objects.count()
+
+        response = self.client.post(
+            reverse('aristotle:bulk_action'),
+            {
+                'bulkaction': 'aristotle_mdr.forms.bulk_actions.ChangeStateForm',
+                'state': self.ra.locked_state,
+                'items': [self.item1.id, self.item2.id],
+                'registrationDate': datetime.date(2014,10,27),
+                'cascadeRegistration': 0,
+                'registrationAuthorities': [self.ra.id],
+                'confirmed': 'confirmed',
+            }
+        )
+        self.assertTrue(self.item1.is_registered)
+        self.assertTrue(self.item2.is_registered)
+        # One revision per chunk
+        self.assertEqual(reversion.models.Revision.objects.count(), revisions_before + 2)
+
+        job = models.BulkActionJob.objects.get(user=self.registrar)
+        self.assertEqual(job.state, models.BULK_ACTION_JOB_STATES.complete)
+        self.assertEqual(job.total, 2)
+        self.assertEqual(job.processed, 2)
+
+        response = self.client.get(reverse('aristotle:bulk_action_status', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(utils.get_json_from_response(response)['progress'], 100)
+        self.assertTrue(utils.get_json_from_response(response)['finished'])
+
+        self.logout()
+        self.login_viewer()
+        response = self.client.get(reverse('aristotle:bulk_action_status', args=[job.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, BULK_ACTION_CHUNK_SIZE=1))
+    def test_cancelled_bulk_action_stops_between_chunks(self):
+        from aristotle_mdr.forms.bulk_actions import RequestReviewForm
+        self.login_viewer()
+
+        form = RequestReviewForm(
+            {
+                'registration_authority': self.ra.id,
+                'state': 1,
+                'items': [self.item1.id, self.item2.id],
+                'registration_date': datetime.date(2014,10,27),
+                'cascade_registration': 0,
+            },
+            user=self.viewer, request=None
+        )
+        self.assertTrue(form.is_valid())
+        job = form.create_job()
+
+        response = self.client.post(reverse('aristotle:bulk_action_cancel', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(utils.get_json_from_response(response)['cancel_requested'])
+
+        form.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.state, models.BULK_ACTION_JOB_STATES.cancelled)
+        self.assertEqual(job.processed, 0)
+        self.assertEqual(models.ReviewRequest.objects.get().concepts.count(), 0)
+
     def test_bulk_status_change_on_forbidden_items(self):
         self.login_registrar()
         review = models.ReviewRequest.objects.create(
@@ -277,8 +372,6 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
     @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, WORKGROUP_CHANGES=['submitter']))
     def test_bulk_workgroup_change_with_all_from_workgroup_list(self):
         #phew thats one hell of a test name
-        from aristotle_mdr.utils.cached_querysets import register_queryset
-
         self.new_workgroup = models.Workgroup.objects.create(name="new workgroup")
         self.new_workgroup.submitters.add(self.editor)
         self.login_editor()
@@ -288,6 +381,8 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
         self.assertTrue(self.item4.concept not in self.new_workgroup.items.all())
 
         qs = self.wg1.items.all()
+        response = self.client.get(reverse('aristotle:workgroupItems', args=[self.wg1.id]))
+        self.assertEqual(response.status_code, 200)
 
         response = self.client.post(
             reverse('aristotle:bulk_action'),
@@ -296,7 +391,7 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
                 'items': qs,
                 'workgroup': [self.new_workgroup.id],
                 "confirmed": True,
-                'qs': register_queryset(qs),
+                'select_all_list': response.context['select_all_list'],
                 'all_in_queryset': True
             },
             follow=True
@@ -310,7 +405,8 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
         self.logout()
         self.login_superuser()
 
-        qs = self.new_workgroup.items.all()
+        response = self.client.get(reverse('aristotle:workgroupItems', args=[self.new_workgroup.id]))
+        self.assertEqual(response.status_code, 200)
 
         response = self.client.post(
             reverse('aristotle:bulk_action'),
@@ -319,7 +415,7 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
                 'items': [],
                 'workgroup': [self.wg1.pk],
                 "confirmed": True,
-                'qs': register_queryset(qs),
+                'select_all_list': response.context['select_all_list'],
                 'all_in_queryset': True
             },
             follow=True
@@ -329,6 +425,81 @@ class BulkWorkgroupActionsPage(BulkActionsTest, TestCase):
         self.assertTrue(self.item2.concept in self.wg1.items.all())
         self.assertTrue(self.item4.concept not in self.wg1.items.all())
 
+    def test_bulk_action_select_all_list_is_private_to_its_user(self):
+        self.login_editor()
+        response = self.client.get(reverse('aristotle:workgroupItems', args=[self.wg1.id]))
+        select_all_list = response.context['select_all_list']
+        self.logout()
+
+        self.login_viewer()
+        response = self.client.post(
+            reverse('aristotle:bulk_action'),
+            {
+                'bulkaction': 'aristotle_mdr.forms.bulk_actions.AddFavouriteForm',
+                'items': [],
+                'select_all_list': select_all_list,
+                'all_in_queryset': True,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.viewer.profile.favourites.count(), 0)
+
+    def test_bulk_action_lists_are_only_stored_when_all_are_selected(self):
+        from aristotle_mdr.models import BulkActionSelection
+
+        self.login_editor()
+        for url in [
+            reverse('browse_concepts', args=['aristotle_mdr', 'objectclass']),
+            reverse('aristotle:userSandbox'),
+            reverse('aristotle:workgroupItems', args=[self.wg1.id]),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'name="select_all_list"')
+        self.logout()
+
+        response = self.client.get(reverse('browse_concepts', args=['aristotle_mdr', 'objectclass']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BulkActionSelection.objects.count(), 0)
+
+        # Selecting all applies the action to every item matching the list's filters, not just one page
+        self.login_editor()
+        response = self.client.get(
+            reverse('browse_concepts', args=['aristotle_mdr', 'objectclass']),
+            {'f': ['name:OC1', 'name:OC2'], 'pp': 1}
+        )
+        self.assertEqual(len(response.context['page_obj'].object_list), 1)
+        response = self.client.post(
+            reverse('aristotle:bulk_action'),
+            {
+                'bulkaction': 'aristotle_mdr.forms.bulk_actions.AddFavouriteForm',
+                'items': [],
+                'select_all_list': response.context['select_all_list'],
+                'all_in_queryset': True,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(self.editor.profile.favourites.values_list('pk', flat=True)),
+            sorted([self.item1.pk, self.item2.pk])
+        )
+        self.assertEqual(BulkActionSelection.objects.count(), 1)
+
+    def test_expired_bulk_action_selections_are_reaped(self):
+        from aristotle_mdr.models import BulkActionSelection, BulkActionSelectionItem
+        from django.utils import timezone
+
+        old = BulkActionSelection.objects.create_from_queryset(self.wg1.items.all(), self.editor)
+        new = BulkActionSelection.objects.create_from_queryset(self.wg1.items.all(), self.editor)
+        BulkActionSelection.objects.filter(pk=old.pk).update(
+            created=timezone.now() - datetime.timedelta(days=2)
+        )
+
+        self.assertEqual(BulkActionSelection.objects.reap(), 1)
+        self.assertFalse(BulkActionSelection.objects.filter(pk=old.pk).exists())
+        self.assertFalse(BulkActionSelectionItem.objects.filter(selection=old.pk).exists())
+        self.assertEqual(new.items.count(), 3)
+
     def test_bulk_review_request_on_permitted_items(self):
         self.login_viewer()
 
@@ -67,3 +67,29 @@ class CachingForRawPermissions(TestCase):
         )
         self.assertTrue(perms.user_can_view(self.submitter, self.item))
         self.assertTrue(perms.user_can_view(self.viewer, self.item))
+
+    def test_permission_terms_cache(self):
+        terms = perms.user_permission_terms(self.submitter)
+        self.assertEqual(terms['workgroups'], [self.wg.pk])
+        self.assertEqual(terms['registration_authorities'], [])
+
+        # A new user object (as on the next request) only needs the cache
+        submitter = get_user_model().objects.get(pk=self.submitter.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(perms.user_permission_terms(submitter), terms)
+
+        # Changing memberships from either side of the relation updates the terms
+        wg2 = models.Workgroup.objects.create(name="Test WG 2")
+        wg2.viewers.add(self.submitter)
+        self.ra.registrars.add(self.submitter)
+        terms = perms.user_permission_terms(self.submitter)
+        self.assertEqual(terms['workgroups'], sorted([self.wg.pk, wg2.pk]))
+        self.assertEqual(terms['registration_authorities'], [self.ra.pk])
+        self.assertTrue(perms.user_is_registrar(self.submitter))
+
+        self.submitter.submitter_in.remove(self.wg)
+        self.assertEqual(perms.user_permission_terms(self.submitter)['workgroups'], [wg2.pk])
+        self.assertFalse(self.item in models.ObjectClass.objects.visible(self.submitter))
+
+        wg2.viewers.clear()
+        self.assertEqual(perms.user_permission_terms(self.submitter)['workgroups'], [])
@@ -67,6 +67,30 @@ class PostingAndCommentingAtObjectLevel(TestCase):
         post3.save()
         self.assertTrue(posts[0:3],[post3,post1,post2])
 
+    def test_comment_counts_are_stored_on_post(self):
+        post = models.DiscussionPost.objects.create(author=self.viewer1,workgroup=self.wg1,title="test",body="test")
+        self.assertEqual(post.comment_count,0)
+        self.assertEqual(post.last_comment,None)
+
+        comment1 = models.DiscussionComment.objects.create(author=self.viewer2,post=post,body="test1")
+        comment2 = models.DiscussionComment.objects.create(author=self.manager,post=post,body="test2")
+        post = models.DiscussionPost.objects.get(id=post.id) # decache
+        self.assertEqual(post.comment_count,2)
+        self.assertEqual(post.last_comment,comment2)
+        self.assertEqual(post.last_activity,comment2.created)
+
+        comment2.delete()
+        post = models.DiscussionPost.objects.get(id=post.id) # decache
+        self.assertEqual(post.comment_count,1)
+        self.assertEqual(post.last_comment,comment1)
+        self.assertEqual(post.last_activity,comment1.created)
+
+        comment1.delete()
+        post = models.DiscussionPost.objects.get(id=post.id) # decache
+        self.assertEqual(post.comment_count,0)
+        self.assertEqual(post.last_comment,None)
+        self.assertEqual(post.last_activity,post.created)
+
 
 class WorkgroupMembersCanMakePostsAndComments(utils.LoggedInViewPages,TestCase):
     def setUp(self):
@@ -456,6 +480,38 @@ class ViewDiscussionPostPage(utils.LoggedInViewPages,TestCase):
         self.assertTrue(p2 in response.context['discussions'].all())
         self.assertTrue(p3 in response.context['discussions'].all())
 
+    def test_discussions_are_paginated(self):
+        self.login_viewer()
+        for i in range(25):
+            models.DiscussionPost.objects.create(author=self.su,workgroup=self.wg1,title="test %s"%i,body="test")
+
+        response = self.client.get(reverse('aristotle:discussionsWorkgroup',args=[self.wg1.id]), {'pp': 10})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(response.context['discussions']),10)
+        self.assertEqual(response.context['page'].paginator.count,25)
+
+        response = self.client.get(reverse('aristotle:discussions'), {'pp': 10, 'page': 3})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(response.context['discussions']),5)
+
+    def test_post_page_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.login_viewer()
+        post = models.DiscussionPost.objects.create(author=self.su,workgroup=self.wg1,title="test",body="test")
+        models.DiscussionComment.objects.create(author=self.viewer,post=post,body="test")
+        with CaptureQueriesContext(connection) as few_comments:
+            response = self.client.get(reverse('aristotle:discussionsPost',args=[post.id]))
+        self.assertEqual(response.status_code,200)
+
+        for i in range(5):
+            models.DiscussionComment.objects.create(author=self.su,post=post,body="test %s"%i)
+        with CaptureQueriesContext(connection) as more_comments:
+            response = self.client.get(reverse('aristotle:discussionsPost',args=[post.id]))
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(more_comments), len(few_comments))
+
     def test_nonmember_cannot_see_posts(self):
         self.login_viewer()
         self.wg3 = models.Workgroup.objects.create(name="Test WG 3")
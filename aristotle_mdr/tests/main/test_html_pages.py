@@ -34,6 +34,69 @@ class AnonymousUserViewingThePages(TestCase):
         response = self.client.get("/sitemaps/sitemap_0.xml")
         self.assertEqual(response.status_code,200)
 
+    def test_sitemap_pages_are_cached_until_items_change(self):
+        from django.core.cache import cache
+        cache.clear()
+        item = models.ObjectClass.objects.create(name="Public OC", definition="")
+        models._concept.objects.filter(pk=item.pk).update(_is_public=True)
+        hidden = models.ObjectClass.objects.create(name="Hidden OC", definition="")
+        page = "/sitemaps/sitemap_%s.xml" % (item.pk // 1000)
+
+        response = self.client.get("/sitemap.xml")
+        self.assertContains(response, page)
+
+        response = self.client.get(page)
+        self.assertContains(response, url_slugify_concept(item))
+        self.assertContains(response, item.modified.strftime("%Y-%m-%d"))
+        self.assertNotContains(response, url_slugify_concept(hidden))
+
+        # Only the signature of the page is looked up while nothing changes
+        with self.assertNumQueries(1):
+            response = self.client.get(page)
+        self.assertContains(response, url_slugify_concept(item))
+
+        models._concept.objects.filter(pk=hidden.pk).update(_is_public=True)
+        response = self.client.get(page)
+        self.assertContains(response, url_slugify_concept(hidden))
+
+        response = self.client.get("/sitemaps/sitemap_%s.xml" % (item.pk // 1000 + 5))
+        self.assertEqual(response.status_code, 404)
+
+    def test_build_sitemaps(self):
+        import gzip
+        import os
+        import shutil
+        import tempfile
+        from django.core.management import call_command
+        from django.utils.six import StringIO
+
+        item = models.ObjectClass.objects.create(name="Public OC", definition="")
+        models._concept.objects.filter(pk=item.pk).update(_is_public=True)
+        directory = tempfile.mkdtemp()
+        try:
+            out = StringIO()
+            call_command('build_sitemaps', directory, base_url='http://example.com', stdout=out)
+            self.assertIn('Wrote 1 of 1 sitemap pages', out.getvalue())
+
+            page = os.path.join(directory, 'sitemap_%s.xml.gz' % (item.pk // 1000))
+            with gzip.open(page) as f:
+                self.assertIn(
+                    ('http://example.com' + url_slugify_concept(item)).encode('utf-8'),
+                    f.read()
+                )
+            with gzip.open(os.path.join(directory, 'sitemap.xml.gz')) as f:
+                self.assertIn(
+                    ('http://example.com/sitemaps/sitemap_%s.xml.gz' % (item.pk // 1000)).encode('utf-8'),
+                    f.read()
+                )
+
+            # Unchanged pages aren't written again
+            out = StringIO()
+            call_command('build_sitemaps', directory, base_url='http://example.com', stdout=out)
+            self.assertIn('Wrote 0 of 1 sitemap pages', out.getvalue())
+        finally:
+            shutil.rmtree(directory)
+
     def test_visible_item(self):
         wg = models.Workgroup.objects.create(name="Setup WG")
         ra = models.RegistrationAuthority.objects.create(name="Test RA")
@@ -550,6 +613,47 @@ class LoggedInViewConceptPages(utils.LoggedInViewPages):
         response = self.client.get(reverse('aristotle:registrationHistory',args=[self.item2.id]))
         self.assertEqual(response.status_code,403)
 
+    def test_registration_history_is_grouped_and_cached(self):
+        ra2 = models.RegistrationAuthority.objects.create(name="Second RA", definition="")
+        models.Status.objects.create(
+            concept=self.item1, registrationAuthority=self.ra,
+            registrationDate=datetime.date(2010, 1, 1), state=self.ra.locked_state
+        )
+        models.Status.objects.create(
+            concept=self.item1, registrationAuthority=self.ra,
+            registrationDate=datetime.date(2012, 1, 1), state=self.ra.public_state
+        )
+        models.Status.objects.create(
+            concept=self.item1, registrationAuthority=ra2,
+            registrationDate=datetime.date(2011, 1, 1), state=ra2.locked_state
+        )
+
+        item = models._concept.objects.get(pk=self.item1.pk)
+        with self.assertNumQueries(1):
+            history = item.registration_history()
+        self.assertEqual(
+            [(ra['name'], [status['registrationDate'].year for status in statuses]) for ra, statuses in history],
+            [(self.ra.name, [2012, 2010]), (ra2.name, [2011])]
+        )
+        with self.assertNumQueries(0):
+            item.registration_history()
+
+        # Changes to statuses or registration authorities are shown straight away
+        models.Status.objects.create(
+            concept=self.item1, registrationAuthority=ra2,
+            registrationDate=datetime.date(2013, 1, 1), state=ra2.public_state
+        )
+        ra2.name = "Renamed RA"
+        ra2.save()
+        self.assertEqual(
+            [(ra['name'], [status['registrationDate'].year for status in statuses]) for ra, statuses in item.registration_history()],
+            [(self.ra.name, [2012, 2010]), ("Renamed RA", [2013, 2011])]
+        )
+
+        self.login_viewer()
+        response = self.client.get(reverse('aristotle:registrationHistory',args=[self.item1.id]))
+        self.assertContains(response, "Renamed RA")
+
     def test_anon_cannot_view_registration_history(self):
         self.logout()
         response = self.client.get(reverse('aristotle:registrationHistory',args=[self.item1.id]))
@@ -784,6 +888,29 @@ class LoggedInViewConceptPages(utils.LoggedInViewPages):
         response = self.client.get(reverse('aristotle:toggleFavourite', args=[self.item1.id]))
         self.assertRedirects(response,reverse('friendly_login')+"?next="+reverse('aristotle:toggleFavourite', args=[self.item1.id]))
 
+    def test_favourite_ids_are_cached(self):
+        self.viewer.profile.favourites.add(self.item1)
+
+        profile = models.PossumProfile.objects.get(user=self.viewer)
+        with self.assertNumQueries(1):
+            self.assertTrue(profile.is_favourite(self.item1))
+            self.assertFalse(profile.is_favourite(self.item2))
+            self.assertEqual(profile.favourites_count, 1)
+
+        # A fresh profile (as on the next request) reuses the cached ids
+        profile = models.PossumProfile.objects.get(user=self.viewer)
+        with self.assertNumQueries(0):
+            self.assertTrue(profile.is_favourite(self.item1))
+
+        # Changes from either side of the relation clear the cache
+        self.item1.favourited_by.remove(self.viewer.profile)
+        profile = models.PossumProfile.objects.get(user=self.viewer)
+        self.assertFalse(profile.is_favourite(self.item1))
+
+        profile.toggleFavourite(self.item1)
+        self.assertTrue(profile.is_favourite(self.item1))
+        self.assertEqual(models.PossumProfile.objects.get(user=self.viewer).favourites_count, 1)
+
     def test_registrar_can_change_status(self):
         self.login_registrar()
 
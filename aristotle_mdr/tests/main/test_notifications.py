@@ -1,7 +1,7 @@
 from django import VERSION as django_version
 from django.conf import settings
 from django.core.urlresolvers import reverse
-from django.test import TestCase, override_settings
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.test.utils import setup_test_environment
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -121,3 +121,42 @@ class TestNotifications(utils.LoggedInViewPages, TestCase):
 
         self.assertEqual(user1.notifications.all().count(), 2)
         self.assertTrue('item registered by your registration authority has changed status' in user1.notifications.first().verb )
+
+
+class TestBulkMoveNotifications(utils.LoggedInViewPages, TransactionTestCase):
+    # Bulk moves notify once their transaction commits, which never happens inside a TestCase
+    def setUp(self):
+        super(TestBulkMoveNotifications, self).setUp()
+
+        self.item1 = models.ObjectClass.objects.create(
+            name="Test Item 1 (visible to tested viewers)",
+            definition="my definition",
+            workgroup=self.wg1,
+        )
+        self.item3 = models.ObjectClass.objects.create(
+            name="Test Item 3 (visible to tested viewers)",
+            definition="my definition",
+            workgroup=self.wg1,
+        )
+
+    def test_workgroup_viewer_is_notified_once_of_bulk_move(self):
+        new_workgroup = models.Workgroup.objects.create(name="new workgroup")
+        watcher = get_user_model().objects.create_user('watcher','watcher')
+        new_workgroup.viewers.add(watcher)
+        self.assertEqual(watcher.notifications.all().count(), 0)
+
+        self.login_superuser()
+        self.client.post(
+            reverse('aristotle:bulk_action'),
+            {
+                'bulkaction': 'aristotle_mdr.forms.bulk_actions.ChangeWorkgroupForm',
+                'items': [self.item1.id, self.item3.id],
+                'workgroup': [new_workgroup.id],
+                "confirmed": True
+            }
+        )
+        self.assertEqual(new_workgroup.items.count(), 2)
+
+        watcher = get_user_model().objects.get(pk=watcher.pk)
+        self.assertEqual(watcher.notifications.all().count(), 1)
+        self.assertTrue('moved 2 items' in watcher.notifications.first().verb)
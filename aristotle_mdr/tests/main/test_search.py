@@ -12,6 +12,12 @@ from django.test.utils import setup_test_environment
 from reversion import revisions as reversion
 setup_test_environment()
 
+try:
+    from unittest.mock import patch
+except:
+    # Python2, Py2
+    from mock import patch
+
 from time import sleep
 import datetime
 from django.utils import timezone
@@ -79,6 +85,150 @@ class TestSearch(utils.LoggedInViewPages,TestCase):
         self.assertNotContains(response, "Did you mean")
         self.assertContains(response, "wolverine")
 
+    def test_search_runs_one_backend_query(self):
+        from haystack import connections
+        backend_class = connections['default'].get_backend().__class__
+        original_search = backend_class.search
+        calls = []
+
+        def counting_search(backend, *args, **kwargs):
+            calls.append(args)
+            return original_search(backend, *args, **kwargs)
+
+        self.logout()
+        with patch.object(backend_class, 'search', counting_search):
+            response = self.client.get(reverse('aristotle:search')+"?q=xman")
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen))
+        self.assertTrue('statuses' in response.context['form'].facets['fields'].keys())
+        # Hits, facets and the results page all come from one query
+        self.assertEqual(len(calls), 1)
+        self.assertTrue('execute' in response.context['form'].search_timings.keys())
+
+    def test_filter_only_search_facets_are_cached(self):
+        url = reverse('aristotle:search')+"?state=%s" % models.STATES.standard
+        self.logout()
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen))
+        self.assertFalse(response.context['form'].facets_from_cache)
+        facets = response.context['form'].facets
+
+        response = self.client.get(url)
+        self.assertTrue(response.context['form'].facets_from_cache)
+        self.assertEqual(response.context['form'].facets, facets)
+
+        # Other filters get their own facets
+        response = self.client.get(url+"&ra=%s" % self.ra.pk)
+        self.assertFalse(response.context['form'].facets_from_cache)
+
+        # Updating the index means the facets are counted again
+        item = models.ObjectClass.objects.create(name="jubilee",definition="known xman",workgroup=self.xmen_wg)
+        self.ra.register(item,models.STATES.standard,self.su)
+        response = self.client.get(url)
+        self.assertFalse(response.context['form'].facets_from_cache)
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen)+1)
+
+    def test_whoosh_bulk_update_with_multiple_processes(self):
+        from haystack import connections
+        from aristotle_mdr.contrib.search_backends.facetted_whoosh import CustomWhooshBackend
+        backend = connections['default'].get_backend()
+        if not isinstance(backend, CustomWhooshBackend):
+            self.skipTest("Only the Whoosh backend has a multi-process writer")
+
+        index = connections['default'].get_unified_index().get_index(models.ObjectClass)
+        # The backend is shared by every later test, so the writer settings are only patched for this update
+        with patch.object(backend, 'writer_procs', 2), patch.object(backend, 'bulk_update_size', 1):
+            with patch.object(CustomWhooshBackend, 'update_spelling') as update_spelling:
+                backend.update(index, self.item_xmen)
+        # Spelling words are counted for the whole update at once
+        self.assertEqual(update_spelling.call_count, 1)
+        self.assertTrue(update_spelling.call_args[0][0]['wolverine'] > 0)
+
+        self.logout()
+        response = self.client.get(reverse('aristotle:search')+"?q=xman")
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen))
+
+    def test_whoosh_index_changes_discard_cached_facets(self):
+        from haystack import connections
+        from aristotle_mdr.contrib.search_backends.facetted_whoosh import CustomWhooshBackend
+        from aristotle_mdr.forms.search import search_index_version
+        backend = connections['default'].get_backend()
+        if not isinstance(backend, CustomWhooshBackend):
+            self.skipTest("Only the Whoosh backend discards cached results itself")
+
+        # Indexing that doesn't go through the signal processor, like update_index, or a channels worker
+        index = connections['default'].get_unified_index().get_index(models.ObjectClass)
+        version = search_index_version()
+        backend.update(index, self.item_xmen[:1])
+        self.assertNotEqual(search_index_version(), version)
+
+        version = search_index_version()
+        backend.remove(self.item_xmen[0])
+        self.assertNotEqual(search_index_version(), version)
+
+        version = search_index_version()
+        backend.clear(models=[models.ObjectClass])
+        self.assertNotEqual(search_index_version(), version)
+
+    def test_whoosh_deferred_commit_discards_cached_facets(self):
+        from haystack import connections
+        from aristotle_mdr.contrib.search_backends.facetted_whoosh import CustomWhooshBackend
+        from aristotle_mdr.forms.search import search_index_version
+        backend = connections['default'].get_backend()
+        if not isinstance(backend, CustomWhooshBackend):
+            self.skipTest("Only the Whoosh backend discards cached results itself")
+        if not backend.setup_complete:
+            backend.setup()
+
+        index = connections['default'].get_unified_index().get_index(models.ObjectClass)
+        writers = []
+        get_writer = backend.get_writer
+
+        def keep_writer(ix):
+            writers.append(get_writer(ix))
+            return writers[-1]
+
+        # Another writer holds the index lock, so the update is written once it is released
+        blocking_writer = backend.index.refresh().writer()
+        with patch.object(backend, 'get_writer', side_effect=keep_writer):
+            backend.update(index, self.item_xmen[:1])
+        version = search_index_version()
+        blocking_writer.cancel()
+        writers[0].join()
+        self.assertNotEqual(search_index_version(), version)
+
+    def test_whoosh_spelling_suggestions(self):
+        from haystack import connections
+        from aristotle_mdr.contrib.search_backends.facetted_whoosh import CustomWhooshBackend
+        backend = connections['default'].get_backend()
+        if not isinstance(backend, CustomWhooshBackend):
+            self.skipTest("Only the Whoosh backend has a spelling dictionary")
+
+        self.assertTrue('wolverine' in backend.spelling)
+        self.assertEqual(backend.create_spelling_suggestion("wolvrine"), "wolverine")
+        self.assertEqual(backend.create_spelling_suggestion("Wolverine storm"), "Wolverine storm")
+
+    def test_search_result_page_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.logout()
+        with CaptureQueriesContext(connection) as small_page:
+            response = self.client.get(reverse('aristotle:search')+"?q=xman")
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen))
+
+        for name in "jubilee rogue gambit colossus kittypryde".split():
+            item = models.ObjectClass.objects.create(name=name,definition="known xman",workgroup=self.xmen_wg)
+            self.ra.register(item,models.STATES.standard,self.su)
+
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get(reverse('aristotle:search')+"?q=xman")
+        self.assertEqual(len(response.context['page'].object_list),len(self.item_xmen)+5)
+        self.assertEqual(len(small_page), len(large_page))
+        for result in response.context['page'].object_list:
+            self.assertEqual(len(result.object.search_current_statuses), 1)
+        self.assertContains(response, "Kelly Act: Standard")
+
     def test_empty_search(self):
         self.logout()
         response = self.client.get(reverse('aristotle:search')+"?q=")
@@ -617,6 +767,63 @@ class TestSearch(utils.LoggedInViewPages,TestCase):
         self.assertEqual(psqs[0].object.pk, vd.pk)
 
 
+class TestSpellingDictionary(TestCase):
+    def setUp(self):
+        import tempfile
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.path)
+
+    def test_spelling_dictionary_is_persisted(self):
+        from collections import Counter
+        from aristotle_mdr.contrib.search_backends.spelling import SpellingDictionary
+
+        spelling = SpellingDictionary(self.path)
+        spelling.merge_size = 5
+        spelling.add(Counter("thor spiderman ironman".split()))
+        self.assertEqual(len(spelling.pending), 3)
+        spelling.add(Counter("hulk ironman captainamerica".split()))
+        # Enough words have been added to merge them into the dictionary file
+        self.assertEqual(len(spelling.pending), 0)
+        spelling.add(Counter(["hulk"]))
+
+        reloaded = SpellingDictionary(self.path)
+        self.assertEqual(reloaded.frequency('ironman'), 2)
+        self.assertEqual(reloaded.frequency('hulk'), 2)
+        self.assertEqual(reloaded.suggest('spidreman'), ['spiderman'])
+        self.assertEqual(reloaded.suggest('xhulk'), ['hulk'])
+        self.assertEqual(reloaded.suggest('wolverine'), [])
+
+        # Another process replacing the file while it is mapped is picked up on refresh
+        spelling.add(Counter("wolverine storm cyclops jeangrey".split()))
+        reloaded.refresh()
+        self.assertEqual(reloaded.frequency('wolverine'), 1)
+
+        spelling.close()
+        reloaded.clear()
+        cleared = SpellingDictionary(self.path)
+        self.assertEqual(len(cleared), 0)
+        cleared.close()
+        reloaded.close()
+
+    def test_spelling_dictionary_finds_every_close_word(self):
+        from collections import Counter
+        from aristotle_mdr.contrib.search_backends.spelling import SpellingDictionary, bounded_distance
+
+        words = "cat cart care cast coat cot dog dot cats scat act tact".split()
+        spelling = SpellingDictionary()
+        spelling.add(Counter(words))
+        spelling.merge()
+        for text in ["cat", "cta", "dg", "cast", "xyz"]:
+            for maxdist in [1, 2]:
+                self.assertEqual(
+                    sorted(word for distance, word in spelling.within(text, maxdist)),
+                    sorted(word for word in words if bounded_distance(text, word, maxdist) is not None)
+                )
+
+
 class TestTokenSearch(TestCase):
     def tearDown(self):
         call_command('clear_index', interactive=False, verbosity=0)
@@ -67,3 +67,39 @@ class TestTemplateTags_aristotle_tags_py(TestCase):
 
     def test_in_workgroup(self):
         self.use_safe_filter('in_workgroup')
+
+
+class TestTemplateTags_aristotle_search_tags_py(TestCase):
+    def setUp(self):
+        from aristotle_mdr.templatetags.aristotle_search_tags import facet_item_cache
+        facet_item_cache.clear()
+        self.ra = models.RegistrationAuthority.objects.create(name="Test RA")
+        self.other_ra = models.RegistrationAuthority.objects.create(name="Other RA")
+        self.wg = models.Workgroup.objects.create(name="Test WG 1")
+
+    def test_facet_items_are_loaded_in_bulk(self):
+        facets = {
+            'registrationAuthorities': [(str(self.ra.pk), 1), (str(self.other_ra.pk), 2)],
+            'workgroup': [(str(self.wg.pk), 1)],
+        }
+        context = Context({"facets": facets, "ra_id": str(self.ra.pk), "other_ra_id": str(self.other_ra.pk), "wg_id": str(self.wg.pk)})
+
+        # One query for the registration authorities, and one for the workgroups
+        with self.assertNumQueries(2):
+            template = Template("{% load aristotle_search_tags %}{% load_facet_items facets %}").render(context)
+
+        with self.assertNumQueries(0):
+            template = Template(
+                "{% load aristotle_search_tags %}"
+                "{% with ra='ra'|get_item_from_facet:ra_id other_ra='ra'|get_item_from_facet:other_ra_id %}{{ ra.name }} {{ other_ra.name }}{% endwith %}"
+                "{% with wg='wg'|get_item_from_facet:wg_id %} {{ wg.name }}{% endwith %}"
+            ).render(context)
+        self.assertEqual(template, "Test RA Other RA Test WG 1")
+
+        # Changing a registration authority means it is looked up again
+        self.ra.name = "Renamed RA"
+        self.ra.save()
+        template = Template(
+            "{% load aristotle_search_tags %}{% with ra='ra'|get_item_from_facet:ra_id %}{{ ra.name }}{% endwith %}"
+        ).render(context)
+        self.assertEqual(template, "Renamed RA")
@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.core.urlresolvers import reverse
@@ -209,8 +210,69 @@ class UserHomePages(utils.LoggedInViewPages, TestCase):
         self.assertEqual(response.status_code, 200)
         response = self.client.get(reverse('aristotle:userAdminStats',))
         self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('aristotle:userAdminStatsJSON',))
+        self.assertEqual(response.status_code, 200)
         self.logout()
 
+    def test_registry_metrics_are_refreshed_incrementally(self):
+        from aristotle_mdr import metrics
+        from django.utils.six import StringIO
+
+        def model_total():
+            metric = models.RegistryMetric.objects.get(kind='model', key='aristotle_mdr.objectclass')
+            return metric.total, sum(metric.get_histogram().values())
+
+        models.ObjectClass.objects.create(name="Metric OC 1", definition="", workgroup=self.wg1)
+        models.ObjectClass.objects.create(name="Metric OC 2", definition="", workgroup=self.wg1)
+        call_command('refresh_registry_metrics', full=True, stdout=StringIO())
+        self.assertEqual(model_total(), (2, 2))
+        workgroup = models.RegistryMetric.objects.get(kind='workgroup', key=str(self.wg1.pk))
+        self.assertEqual(workgroup.total, 2)
+        self.assertEqual(
+            workgroup.created_since(metrics.today() - datetime.timedelta(days=7)), 2
+        )
+
+        # New items are added without rebuilding the metric
+        oc = models.ObjectClass.objects.create(name="Metric OC 3", definition="", workgroup=self.wg1)
+        self.assertEqual(metrics.refresh_metrics(), 0)
+        self.assertEqual(model_total(), (3, 3))
+
+        # Deleted items make the total differ from the histogram, so the metric is rebuilt
+        oc.delete()
+        self.assertTrue(metrics.refresh_metrics() > 0)
+        self.assertEqual(model_total(), (2, 2))
+
+        self.login_superuser()
+        response = self.client.get(reverse('aristotle:userAdminStatsJSON',))
+        self.assertEqual(response.status_code, 200)
+        data = utils.get_json_from_response(response)
+        oc_stats = [m for m in data['models'] if m['key'] == 'aristotle_mdr.objectclass'][0]
+        self.assertEqual(oc_stats['all_time'], 2)
+        self.assertEqual(oc_stats['t7'], 2)
+        self.assertEqual(sum(oc_stats['histogram'].values()), 2)
+
+        response = self.client.get(reverse('aristotle:userAdminStats',))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.wg1.name)
+
+    @override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, REGISTRY_METRICS_MAX_AGE=3600))
+    def test_stale_registry_metrics_are_refreshed_when_shown(self):
+        from aristotle_mdr import metrics
+        from django.core.cache import cache
+        from django.utils import timezone
+
+        def model_total():
+            return sum(m.total for m in metrics.get_metrics(models.REGISTRY_METRIC_KINDS.model).values())
+
+        metrics.refresh_metrics()
+        total = model_total()
+        models.ObjectClass.objects.create(name="Metric OC 1", definition="", workgroup=self.wg1)
+        self.assertEqual(model_total(), total)
+
+        # Without the management command, old metrics are refreshed when they are next read
+        cache.set(metrics.LAST_REFRESHED_KEY, timezone.now() - datetime.timedelta(hours=2), None)
+        self.assertEqual(model_total(), total + 1)
+
     def test_login_redirects(self):
         response = self.client.get("/login")
         self.assertEqual(response.status_code, 200)
@@ -282,3 +344,17 @@ class UserDashRecentItems(utils.LoggedInViewPages, TestCase):
         self.assertEqual(len(response.context['recent']), Revision.objects.filter(user=self.editor).count())
 
         self.assertContains(response, "Changed name")
+
+        activities = models.Activity.objects.filter(concept=item).order_by('timestamp', 'pk')
+        self.assertEqual([a.verb for a in activities], ['created', 'changed'])
+        self.assertTrue(all(a.user == self.editor and a.workgroup == self.wg1 for a in activities))
+
+        response = self.client.get(reverse('aristotle:userRecentItems'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, updated_name)
+
+        # Rebuilding the feed from the revisions gives the same activities
+        from django.utils.six import StringIO
+        call_command('build_activity_feed', stdout=StringIO())
+        activities = models.Activity.objects.filter(concept=item).order_by('timestamp', 'pk')
+        self.assertEqual([a.verb for a in activities], ['created', 'changed'])
@@ -23,3 +23,45 @@ class UtilsTests(TestCase):
         self.assertTrue('--' in utils.url_slugify_workgroup(wg))
         self.assertTrue('--' in utils.url_slugify_registration_authoritity(ra))
         self.assertTrue('--' in utils.url_slugify_organization(org))
+
+
+class NameIndexTests(TestCase):
+    def setUp(self):
+        self.person = models.ObjectClass.objects.create(name="Person",definition="my definition")
+        self.personnel = models.ObjectClass.objects.create(name="Personnel  Record",definition="my definition")
+        self.vehicle = models.ObjectClass.objects.create(name="Vehicle",definition="my definition")
+
+    def assertMatchesLookup(self, q, lookup):
+        self.assertEqual(
+            set(models.ObjectClass.objects.filter(q).values_list('pk', flat=True)),
+            set(models.ObjectClass.objects.filter(**lookup).values_list('pk', flat=True)),
+        )
+
+    def test_name_lookups(self):
+        from aristotle_mdr.name_index import name_contains_q, name_exact_q
+
+        for text in ["pers", "SONNEL", "nel  rec", "ve", "icl", "xyz"]:
+            self.assertMatchesLookup(name_contains_q(text), {'name__icontains': text})
+        for name in ["person", "PERSONNEL  RECORD", "Vehicles"]:
+            self.assertMatchesLookup(name_exact_q(name), {'name__iexact': name})
+
+    def test_name_index_updates_on_rename(self):
+        from aristotle_mdr.name_index import name_contains_q, uses_trigram_index
+        if uses_trigram_index():
+            self.skipTest("PostgreSQL uses trigram indexes on item names rather than the name index tables")
+
+        self.vehicle.name = "Car"
+        self.vehicle.save()
+        self.assertEqual(self.vehicle.name_key.key, "car")
+        self.assertEqual(
+            set(self.vehicle.name_trigrams.values_list('trigram', flat=True)),
+            set(["car"])
+        )
+        self.assertFalse(models.ObjectClass.objects.filter(name_contains_q("hic")).exists())
+
+        models.ConceptNameTrigram.objects.all().delete()
+        call_command('build_name_index')
+        self.assertEqual(
+            list(models.ObjectClass.objects.filter(name_contains_q("ersonn")).values_list('pk', flat=True)),
+            [self.personnel.pk]
+        )
@@ -8,6 +8,10 @@ import aristotle_mdr.tests.utils as utils
 from aristotle_mdr.utils import url_slugify_concept
 
 from django.test.utils import setup_test_environment
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 setup_test_environment()
 
 class CreateListPageTests(utils.LoggedInViewPages,TestCase):
@@ -169,6 +173,26 @@ class ConceptWizardPage(utils.LoggedInViewPages):
         item = models._concept.objects.filter(name="Test Item").first()
         self.assertRedirects(response,url_slugify_concept(item))
 
+    def test_searches_are_not_repeated_on_validation_errors(self):
+        from aristotle_mdr.forms import search
+        self.login_editor()
+        step_1_data = {
+            self.wizard_form_name+'-current_step': 'initial',
+            'initial-name':"Test Item",
+        }
+        response = self.client.post(self.wizard_url, step_1_data)
+        self.assertEqual(response.context['wizard']['steps'].current, 'results')
+
+        step_2_data = {
+            self.wizard_form_name+'-current_step': 'results',
+            'results-name':"Test Item",
+        }
+        with patch.object(search, 'get_permission_sqs', wraps=search.get_permission_sqs) as psqs:
+            response = self.client.post(self.wizard_url, step_2_data)
+            wizard = response.context['wizard']
+            self.assertTrue('definition' in wizard['form'].errors.keys())
+            self.assertEqual(psqs.call_count, 0)
+
 class ObjectClassWizardPage(ConceptWizardPage,TestCase):
     model=models.ObjectClass
 class PropertyWizardPage(ConceptWizardPage,TestCase):
@@ -186,6 +210,30 @@ class DataElementConceptWizardPage(ConceptWizardPage,TestCase):
         return reverse('aristotle:%s'%self.wizard_url_name)
     def test_editor_can_make_object(self):
         pass
+    def test_searches_are_not_repeated_on_validation_errors(self):
+        from aristotle_mdr.forms import search
+        self.login_editor()
+        from reversion.revisions import create_revision
+        with create_revision():
+            models.ObjectClass.objects.create(name="animagus",definition="my definition",workgroup=self.wg1)
+            models.Property.objects.create(name="animal type",definition="my definition",workgroup=self.wg1)
+
+        step_1_data = {
+            self.wizard_form_name+'-current_step': 'component_search',
+            'component_search-oc_name':"animagus",
+            'component_search-pr_name':"animal"
+        }
+        response = self.client.post(self.wizard_url, step_1_data)
+        self.assertEqual(response.context['wizard']['steps'].current, 'component_results')
+
+        step_2_data = {}
+        step_2_data.update(step_1_data)
+        step_2_data.update({self.wizard_form_name+'-current_step': 'component_results'})
+        with patch.object(search, 'get_permission_sqs', wraps=search.get_permission_sqs) as psqs:
+            # The component results are shown again, without searching again
+            response = self.client.post(self.wizard_url, step_2_data)
+            self.assertEqual(response.context['wizard']['steps'].current, 'component_results')
+            self.assertEqual(psqs.call_count, 0)
     def test_editor_can_make_object__has_prior_components(self):
         self.login_editor()
         from reversion.revisions import create_revision
@@ -400,6 +448,8 @@ class DataElementWizardPage(ConceptWizardPage,TestCase):
         return reverse('aristotle:%s'%self.wizard_url_name)
     def test_editor_can_make_object(self):
         pass
+    def test_searches_are_not_repeated_on_validation_errors(self):
+        pass
     def test_editor_can_make_object__has_prior_components(self):
         self.login_editor()
 
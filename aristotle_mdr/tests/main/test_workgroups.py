@@ -30,6 +30,34 @@ class WorkgroupMembership(TestCase):
         # Caching issue, refresh from DB with correct permissions
         user = get_user_model().objects.get(pk=user.pk)
         self.assertFalse(perms.user_is_workgroup_manager(user,wg))
+
+    def test_memberships_follow_workgroup_roles(self):
+        wg1 = models.Workgroup.objects.create(name="Test WG 1")
+        wg2 = models.Workgroup.objects.create(name="Test WG 2")
+        user = get_user_model().objects.create_user('editor1','','editor1')
+        wg1.viewers.add(user)
+        wg1.stewards.add(user)
+        user.submitter_in.add(wg2)
+
+        membership = models.WorkgroupMembership.objects.get(workgroup=wg1, user=user)
+        self.assertEqual(membership.roles, set(['viewer', 'steward']))
+        self.assertEqual(list(wg1.members), [user])
+        self.assertEqual(sorted(user.profile.workgroups.values_list('pk', flat=True)), [wg1.pk, wg2.pk])
+
+        # Memberships are loaded once and reused for every check in a request
+        user = get_user_model().objects.get(pk=user.pk)
+        self.assertTrue(perms.user_in_workgroup(user, wg1))
+        with self.assertNumQueries(0):
+            self.assertTrue(perms.user_in_workgroup(user, wg2))
+            self.assertFalse(perms.user_is_workgroup_manager(user, wg1))
+
+        wg1.viewers.remove(user)
+        self.assertEqual(models.WorkgroupMembership.objects.get(workgroup=wg1, user=user).roles, set(['steward']))
+        user.steward_in.clear()
+        self.assertFalse(models.WorkgroupMembership.objects.filter(workgroup=wg1).exists())
+        self.assertFalse(perms.user_in_workgroup(user, wg1))
+        self.assertTrue(perms.user_in_workgroup(user, wg2))
+
     def test_managersCanEditWorkgroups(self):
         wg = models.Workgroup.objects.create(name="Test WG 1")
         user1 = get_user_model().objects.create_user('manager','','manager')
@@ -78,6 +106,54 @@ class WorkgroupMembership(TestCase):
         self.assertTrue(wg2 in editable.all())
         self.assertTrue(wg3 not in editable.all())
 
+    def test_workgroup_counters_are_maintained(self):
+        import datetime
+        from django.core.management import call_command
+        from django.utils.six import StringIO
+
+        def counter(wg):
+            return models.WorkgroupCounter.objects.get(workgroup=wg)
+
+        wg1 = models.Workgroup.objects.create(name="Test WG 1")
+        wg2 = models.Workgroup.objects.create(name="Test WG 2")
+        editor = get_user_model().objects.create_user('editor','','editor')
+        viewer = get_user_model().objects.create_user('viewer','','viewer')
+        wg1.stewards.add(editor)
+        wg1.viewers.add(editor, viewer)
+        self.assertEqual(counter(wg1).member_count, 2)
+        viewer.viewer_in.clear()
+        self.assertEqual(counter(wg1).member_count, 1)
+
+        oc1 = models.ObjectClass.objects.create(name="Test OC 1", definition="", workgroup=wg1)
+        oc2 = models.ObjectClass.objects.create(name="Test OC 2", definition="", workgroup=wg1)
+        self.assertEqual(counter(wg1).item_count, 2)
+
+        oc2.workgroup = wg2
+        oc2.save()
+        self.assertEqual(counter(wg1).item_count, 1)
+        self.assertEqual(counter(wg2).item_count, 1)
+        oc2.delete()
+        self.assertEqual(counter(wg2).item_count, 0)
+
+        ra = models.RegistrationAuthority.objects.create(name="Test RA", definition="")
+        models.Status.objects.create(
+            concept=oc1, registrationAuthority=ra, state=ra.public_state,
+            registrationDate=datetime.date(2000, 1, 1),
+        )
+        self.assertTrue(counter(wg1).is_stale)
+        wg1 = models.Workgroup.objects.get(pk=wg1.pk)
+        self.assertEqual(
+            models.get_workgroup_counter(wg1).get_state_counts(),
+            [(models.STATES[ra.public_state], 1)]
+        )
+        self.assertFalse(counter(wg1).is_stale)
+
+        # Changes that don't send signals are corrected when the counters are reconciled
+        models._concept.objects.filter(pk=oc1.pk).update(workgroup=wg2)
+        call_command('reconcile_workgroup_counters', stdout=StringIO())
+        self.assertEqual(counter(wg1).item_count, 0)
+        self.assertEqual(counter(wg2).item_count, 1)
+
 class WorkgroupAnonTests(utils.LoggedInViewPages,TestCase):
     def setUp(self):
         super(WorkgroupAnonTests, self).setUp()
@@ -417,6 +493,90 @@ class WorkgroupMemberTests(utils.LoggedInViewPages,TestCase):
         self.assertEqual(response.status_code,200)
         response = self.client.get(reverse('aristotle:workgroupItems',args=[self.wg1.id]))
 
+    def test_workgroup_activity_only_lists_current_items(self):
+        from reversion import revisions as reversion
+
+        wg2 = models.Workgroup.objects.create(name="Test WG 2")
+        with reversion.create_revision():
+            stays = models.ObjectClass.objects.create(name="Staying OC", definition="", workgroup=self.wg1)
+            moves = models.ObjectClass.objects.create(name="Moving OC", definition="", workgroup=self.wg1)
+
+        self.login_viewer()
+        response = self.client.get(self.wg1.get_absolute_url())
+        self.assertEqual(
+            sorted(activity.concept_id for activity in response.context['recent']),
+            sorted([stays.pk, moves.pk])
+        )
+
+        # Moved without saving a revision, so the activity still records the old workgroup
+        models._concept.objects.filter(pk=moves.pk).update(workgroup=wg2)
+        response = self.client.get(self.wg1.get_absolute_url())
+        self.assertEqual([activity.concept_id for activity in response.context['recent']], [stays.pk])
+        self.assertNotContains(response, "Moving OC")
+
+    def test_workgroup_items_keyset_pagination(self):
+        from django.conf import settings
+        from django.test.utils import override_settings
+
+        for i in range(25):
+            models.ObjectClass.objects.create(name="Item %02d" % (24 - i), definition="", workgroup=self.wg1)
+        expected = list(
+            models._concept.objects.filter(workgroup=self.wg1).order_by('name', 'pk').values_list('pk', flat=True)
+        )
+
+        self.login_viewer()
+        url = reverse('aristotle:workgroupItems', args=[self.wg1.id])
+        with override_settings(ARISTOTLE_SETTINGS=dict(settings.ARISTOTLE_SETTINGS, KEYSET_PAGINATION=True)):
+            seen = []
+            pages = []
+            cursor = None
+            while True:
+                params = {'pp': 10, 'sort': 'name_asc'}
+                if cursor:
+                    params['cursor'] = cursor
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                page = response.context['page']
+                self.assertTrue(page.is_keyset)
+                pages.append([item.pk for item in page])
+                seen.extend(pages[-1])
+                if not page.has_next():
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(seen, expected)
+            self.assertEqual(len(pages), 3)
+            self.assertEqual(page.number, 3)
+            self.assertEqual(page.paginator.count, 25)
+
+            # Paging back from the last page gives the middle page
+            response = self.client.get(url, {'pp': 10, 'sort': 'name_asc', 'cursor': page.previous_cursor})
+            self.assertEqual([item.pk for item in response.context['page']], pages[1])
+            self.assertEqual(response.context['page'].number, 2)
+
+            # A cursor for a different sort, or that has been tampered with, starts from the first page
+            response = self.client.get(url, {'pp': 10, 'sort': 'mod_desc', 'cursor': cursor})
+            self.assertEqual(response.context['page'].number, 1)
+            response = self.client.get(url, {'pp': 10, 'sort': 'name_asc', 'cursor': cursor + 'x'})
+            self.assertEqual([item.pk for item in response.context['page']], pages[0])
+
+    def test_workgroup_items_page_size_is_capped(self):
+        oc = models.ObjectClass.objects.create(name="Test OC", definition="", workgroup=self.wg1)
+        de = models.DataElement.objects.create(name="Test DE", definition="", workgroup=self.wg1)
+
+        self.login_viewer()
+        response = self.client.get(reverse('aristotle:workgroupItems', args=[self.wg1.id]), {'pp': 100000})
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page']
+        self.assertEqual(page.paginator.per_page, 100)
+
+        # Items are loaded as their own type
+        items = {item.pk: item for item in page}
+        self.assertEqual(type(items[oc.pk]), models.ObjectClass)
+        self.assertEqual(type(items[de.pk]), models.DataElement)
+
+        response = self.client.get(reverse('aristotle:workgroupItems', args=[self.wg1.id]), {'pp': 'lots'})
+        self.assertEqual(response.context['page'].paginator.per_page, 20)
+
     def test_manager_can_archive(self):
         self.login_viewer()
         # Viewers cannot archive
@@ -125,6 +125,8 @@ urlpatterns=[
     url(r'^action/supersede/(?P<iid>\d+)$', views.supersede, name='supersede'),
     url(r'^action/deprecate/(?P<iid>\d+)$', views.deprecate, name='deprecate'),
     url(r'^action/bulkaction/?$', views.bulk_actions.BulkAction.as_view(), name='bulk_action'),
+    url(r'^action/bulkaction/status/(?P<job_id>[0-9a-f\-]+)/?$', views.bulk_actions.bulk_action_status, name='bulk_action_status'),
+    url(r'^action/bulkaction/cancel/(?P<job_id>[0-9a-f\-]+)/?$', views.bulk_actions.bulk_action_cancel, name='bulk_action_cancel'),
     url(r'^action/compare/?$', views.comparator.compare_concepts, name='compare_concepts'),
 
     url(r'^action/changestatus/(?P<iid>\d+)$', views.changeStatus, name='changeStatus'),
@@ -136,6 +138,7 @@ urlpatterns=[
     url(r'^account/roles/?$', views.user_pages.RolesView.as_view(), name='userRoles'),
     url(r'^account/admin/?$', views.user_pages.AdminToolsView.as_view(), name='userAdminTools'),
     url(r'^account/admin/statistics/?$', views.user_pages.AdminStatsView.as_view(), name='userAdminStats'),
+    url(r'^account/admin/statistics/json/?$', views.user_pages.AdminStatsJSONView.as_view(), name='userAdminStatsJSON'),
     url(r'^account/edit/?$', views.user_pages.EditView.as_view(), name='userEdit'),
     url(r'^account/recent/?$', views.user_pages.RecentView.as_view(), name='userRecentItems'),
     url(r'^account/favourites/?$', views.user_pages.FavouritesView.as_view(), name='userFavourites'),
@@ -181,7 +184,9 @@ urlpatterns=[
             view_class=views.PermissionSearchView,
             template='search/search.html',
             searchqueryset=None,
-            form_class=forms.search.PermissionSearchForm
+            form_class=forms.search.PermissionSearchForm,
+            # Result objects are loaded in bulk by PermissionSearchView.build_page
+            load_all=False
             ),
         name='search'
     ),
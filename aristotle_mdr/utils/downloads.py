@@ -3,6 +3,8 @@ from importlib import import_module
 from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import PermissionDenied, ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
 from aristotle_mdr import exceptions as registry_exceptions
@@ -21,3 +23,90 @@ def get_download_module(module_name):
         if debug:
             raise
         return None
+
+
+class DownloaderRegistry(object):
+    """
+    A per-process registry of the downloaders that apply to each metadata type.
+
+    Resolving the downloaders for a model imports every configured downloader
+    and, for ``__template__`` downloaders, probes the template loader. As the
+    answer only depends on the model and the ``DOWNLOADERS`` setting, it is
+    computed once per ``(app_label, model_name)`` and reused for every item.
+    The registry is cleared whenever ``ARISTOTLE_SETTINGS`` changes.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._downloaders = None
+        self._models = {}
+        self._templates = {}
+
+    @property
+    def downloaders(self):
+        if self._downloaders is None:
+            from aristotle_mdr.utils import fetch_aristotle_downloaders
+            self._downloaders = fetch_aristotle_downloaders()
+        return self._downloaders
+
+    def template_exists(self, template_name):
+        """
+        Returns True if the template can be loaded, caching the result.
+        Errors other than a missing template are raised as they indicate
+        a broken template.
+        """
+        if template_name not in self._templates:
+            from django.template import TemplateDoesNotExist
+            from django.template.loader import get_template
+            try:
+                get_template(template_name)
+                self._templates[template_name] = True
+            except TemplateDoesNotExist:
+                self._templates[template_name] = False
+        return self._templates[template_name]
+
+    def supports(self, downloader, model):
+        app_label = model._meta.app_label
+        model_name = model._meta.model_name
+        item_register = downloader.metadata_register
+
+        if type(item_register) is not str:
+            if item_register.get(app_label, []) == '__all__':
+                return True
+            return model_name in item_register.get(app_label, [])
+        if item_register == '__all__':
+            return True
+        if item_register == '__template__':
+            from aristotle_mdr.utils import get_download_template_path_for_item
+            return self.template_exists(
+                get_download_template_path_for_item(model, downloader.download_type)
+            )
+        return False
+
+    def for_model(self, model):
+        """
+        Returns the list of downloaders that support the given model class
+        or instance.
+        """
+        key = (model._meta.app_label, model._meta.model_name)
+        if key not in self._models:
+            self._models[key] = [
+                d for d in self.downloaders
+                if self.supports(d, model)
+            ]
+        return self._models[key]
+
+
+downloader_registry = DownloaderRegistry()
+
+
+def get_downloaders_for_item(item):
+    return downloader_registry.for_model(item)
+
+
+@receiver(setting_changed)
+def clear_downloader_registry(setting, **kwargs):
+    if setting in ['ARISTOTLE_SETTINGS', 'ARISTOTLE_SETTINGS_LOADER', 'TEMPLATES']:
+        downloader_registry.clear()
@@ -270,3 +270,15 @@ def fetch_aristotle_downloaders():
         import_string(dtype)
         for dtype in fetch_aristotle_settings().get('DOWNLOADERS', [])
     ]
+
+
+def on_commit(func):
+    """
+    Runs ``func`` once the current transaction commits, or straight away on
+    Django 1.8 which doesn't have ``transaction.on_commit``.
+    """
+    from django.db import transaction
+    if hasattr(transaction, 'on_commit'):
+        transaction.on_commit(func)
+    else:  # pragma: no cover
+        func()
@@ -4,13 +4,15 @@ from django.conf import settings
 from django.core.exceptions import PermissionDenied, ImproperlyConfigured
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.urlresolvers import reverse
-from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.http import HttpResponse, Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template import TemplateDoesNotExist
 from django.template.defaultfilters import slugify
 from django.template.loader import select_template
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import FormView
+from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 import datetime
 
@@ -136,3 +138,48 @@ def get_bulk_actions():
             frm[prop] = getattr(f, prop, None)
         actions[action_name] = frm
     return actions
+
+
+def get_bulk_action_job_or_404(request, job_id):
+    job = get_object_or_404(MDR.BulkActionJob, pk=job_id)
+    if job.user != request.user and not request.user.is_superuser:
+        raise PermissionDenied
+    return job
+
+
+def bulk_action_job_status(job):
+    return {
+        'id': str(job.pk),
+        'state': force_text(MDR.BULK_ACTION_JOB_STATES[job.state]),
+        'finished': job.is_finished,
+        'total': job.total,
+        'processed': job.processed,
+        'failed': job.failed,
+        'progress': job.progress,
+        'cancel_requested': job.cancel_requested,
+        'message': job.message,
+    }
+
+
+@login_required
+def bulk_action_status(request, job_id):
+    """
+    Returns the progress of a chunked bulk action as JSON, so that long
+    running actions can be polled.
+    """
+    job = get_bulk_action_job_or_404(request, job_id)
+    return JsonResponse(bulk_action_job_status(job))
+
+
+@login_required
+@require_POST
+def bulk_action_cancel(request, job_id):
+    """
+    Requests that a chunked bulk action stops before its next chunk. Chunks
+    that have already been applied are not rolled back.
+    """
+    job = get_bulk_action_job_or_404(request, job_id)
+    if not job.is_finished:
+        MDR.BulkActionJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+        job.refresh_from_db()
+    return JsonResponse(bulk_action_job_status(job))
@@ -2,6 +2,7 @@ from django.contrib import messages
 
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
+from django.db.models import Prefetch
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404
 from django.utils.translation import ugettext_lazy as _
@@ -11,24 +12,46 @@ from django.http import Http404
 from aristotle_mdr import models as MDR
 from aristotle_mdr import forms as MDRForms
 from aristotle_mdr import perms
-from aristotle_mdr.views.utils import ObjectLevelPermissionRequiredMixin
+from aristotle_mdr.views.utils import ObjectLevelPermissionRequiredMixin, get_page_size
 
 from braces.views import LoginRequiredMixin, PermissionRequiredMixin
-from django.views.generic import DeleteView, TemplateView, FormView, UpdateView
+from django.views.generic import DeleteView, TemplateView, FormView, ListView, UpdateView
 
 
-class All(LoginRequiredMixin, TemplateView):
-    # Show all discussions for all of a users workgroups
-    template_name = "aristotle_mdr/discussions/all.html"
+class DiscussionListMixin(object):
+    """
+    Pages through a list of posts. The comment counts and latest comment of
+    each post are stored on the post, so only the authors and workgroups
+    need to be loaded alongside them.
+    """
+    context_object_name = 'discussions'
 
-    def get_context_data(self, **kwargs):
-        context = super(All, self).get_context_data(**kwargs)
-        context['discussions'] = self.request.user.profile.discussions
+    def get_paginate_by(self, queryset):
+        return get_page_size(self.request)
+
+    def get_discussions(self):
+        raise NotImplementedError  # pragma: no cover
+
+    def get_queryset(self):
+        return self.get_discussions().select_related(
+            'author', 'workgroup', 'last_comment__author'
+        )
 
+    def get_context_data(self, **kwargs):
+        context = super(DiscussionListMixin, self).get_context_data(**kwargs)
+        context['page'] = context.get('page_obj')
         return context
 
 
-class Workgroup(LoginRequiredMixin, ObjectLevelPermissionRequiredMixin, TemplateView):
+class All(LoginRequiredMixin, DiscussionListMixin, ListView):
+    # Show all discussions for all of a users workgroups
+    template_name = "aristotle_mdr/discussions/all.html"
+
+    def get_discussions(self):
+        return self.request.user.profile.discussions
+
+
+class Workgroup(LoginRequiredMixin, ObjectLevelPermissionRequiredMixin, DiscussionListMixin, ListView):
     # Show all discussions for a workgroups
     template_name = "aristotle_mdr/discussions/workgroup.html"
     permission_required = "aristotle_mdr.can_view_discussions_in_workgroup"
@@ -36,16 +59,20 @@ class Workgroup(LoginRequiredMixin, ObjectLevelPermissionRequiredMixin, Template
     redirect_unauthenticated_users = True
 
     def get(self, request, *args, **kwargs):
-        context = super(Workgroup, self).get_context_data(*args, **kwargs)
-        wg = get_object_or_404(MDR.Workgroup, pk=self.kwargs['wgid'])
+        self.workgroup = get_object_or_404(MDR.Workgroup, pk=self.kwargs['wgid'])
 
-        if not perms.user_in_workgroup(request.user, wg):
+        if not perms.user_in_workgroup(request.user, self.workgroup):
             raise PermissionDenied
 
-        context['workgroup'] = wg
-        context['discussions'] = wg.discussions.all()
+        return super(Workgroup, self).get(request, *args, **kwargs)
 
-        return render(request, self.template_name, context)
+    def get_discussions(self):
+        return self.workgroup.discussions.all()
+
+    def get_context_data(self, **kwargs):
+        context = super(Workgroup, self).get_context_data(**kwargs)
+        context['workgroup'] = self.workgroup
+        return context
 
     def check_permissions(self, request):
         """
@@ -118,6 +145,18 @@ class Post(LoginRequiredMixin, ObjectLevelPermissionRequiredMixin, PostMixin, Te
     raise_exception = True
     redirect_unauthenticated_users = True
 
+    def get_object(self):
+        # Kept, so the post loaded for the permission check is used for the page
+        if getattr(self, 'object', None) is None:
+            self.object = get_object_or_404(
+                MDR.DiscussionPost.objects.select_related('author', 'workgroup').prefetch_related(
+                    Prefetch('comments', queryset=MDR.DiscussionComment.objects.select_related('author')),
+                    'relatedItems',
+                ),
+                pk=self.kwargs['pid']
+            )
+        return self.object
+
     def get(self, request, *args, **kwargs):
         context = super(Post, self).get_context_data(*args, **kwargs)
 
@@ -144,7 +183,7 @@ class TogglePost(LoginRequiredMixin, ObjectLevelPermissionRequiredMixin, PostMix
     def get(self, request, *args, **kwargs):
         post = self.get_object()
         post.closed = not post.closed
-        post.save()
+        post.save(update_fields=['closed', 'modified'])
 
         return HttpResponseRedirect(reverse("aristotle:discussionsPost", args=[post.pk]))
 
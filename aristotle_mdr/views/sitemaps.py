@@ -1,15 +1,19 @@
-from __future__ import division
-from django.shortcuts import render
-from aristotle_mdr import models as MDR
+from django.http import Http404, HttpResponse
+
+from aristotle_mdr import sitemaps
+
+
+def get_base_url(request):
+    return '%s://%s' % (request.scheme, request.get_host())
 
 
 def main(request):
-    count = MDR._concept.objects.public().count()
-    list_range = range(1 + count // 1000)
-    return render(request, "meta/sitemaps/main.xml", {'range_list': list_range}, content_type='text/xml')
+    xml = sitemaps.render_index(get_base_url(request), sitemaps.page_signatures())
+    return HttpResponse(xml, content_type='text/xml')
 
 
 def page_range(request, page):
-    i = int(page)
-    items = MDR._concept.objects.public()[i * 1000:(i + 1) * 1000]
-    return render(request, "meta/sitemaps/page.xml", {'items': items}, content_type='text/xml')
+    xml = sitemaps.cached_page(get_base_url(request), int(page))
+    if xml is None:
+        raise Http404
+    return HttpResponse(xml, content_type='text/xml')
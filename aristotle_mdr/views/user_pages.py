@@ -1,20 +1,25 @@
-import datetime
-
 from braces.views import LoginRequiredMixin, SuperuserRequiredMixin, UserPassesTestMixin
 from django.apps import apps
 from django.contrib.auth.views import login
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import redirect
-from django.views.generic import DetailView, ListView, TemplateView, UpdateView
-from reversion.models import Revision
+from django.utils.translation import ugettext_lazy as _
+from django.views.generic import DetailView, ListView, TemplateView, UpdateView, View
 
 from aristotle_mdr import forms as MDRForms
+from aristotle_mdr import metrics
+from aristotle_mdr.activity import user_activity
 from aristotle_mdr import models as MDR
 from aristotle_mdr.utils import fetch_aristotle_settings, fetch_metadata_apps
-from aristotle_mdr.views.utils import paginate_sort_opts, paginate_workgroup_sort_opts
+from aristotle_mdr.views.utils import (
+    ConceptListMixin,
+    get_page_size,
+    paginate_sort_opts,
+    paginate_workgroup_sort_opts
+)
 
 
 def friendly_redirect_login(request):
@@ -23,22 +28,16 @@ def friendly_redirect_login(request):
     return login(request)
 
 
-def _get_cached_query_count(qs, key, ttl):
-    count = cache.get(key, None)
-    if not count:
-        count = qs.count()
-        cache.set(key, count, ttl)
-    return count
-
-
-def _model_to_cache_key(model_type):
-    return 'aristotle_adminpage_object_count_%s_%s' % (model_type.app_label, model_type.model)
+def _concept_model_types(app_labels):
+    """Returns the content types of the 11179 concept models in some apps."""
+    return [
+        m for m in ContentType.objects.filter(app_label__in=app_labels)
+        if m.model_class() and issubclass(m.model_class(), MDR._concept) and not m.model.startswith("_")
+    ]
 
 
-def _get_cached_object_count(model_type):
-    CACHE_KEY = _model_to_cache_key(model_type)
-    query = model_type.model_class().objects
-    return _get_cached_query_count(query, CACHE_KEY, 60 * 60 * 12)  # Cache for 12 hours
+def _model_metric(model_metrics, model_type):
+    return model_metrics.get('%s.%s' % (model_type.app_label, model_type.model))
 
 
 # Can be extracted and used in other classes
@@ -62,7 +61,7 @@ class HomeView(LoginRequiredMixin, UserContextMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         kwargs.update({
-            'recent': Revision.objects.filter(user=self.request.user).order_by('-date_created')[:10]
+            'recent': user_activity(self.request.user)[:10]
         })
         return super(HomeView, self).get_context_data(**kwargs)
 
@@ -75,10 +74,10 @@ class RecentView(LoginRequiredMixin, ListView):
     template_name = 'aristotle_mdr/user/recent.html'
 
     def get_paginate_by(self, queryset):
-        return self.request.GET.get('pp', 20)
+        return get_page_size(self.request)
 
     def get_queryset(self):
-        return Revision.objects.filter(user=self.request.user).order_by('-date_created')
+        return user_activity(self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super(RecentView, self).get_context_data(**kwargs)
@@ -107,89 +106,105 @@ class AdminToolsView(LoginRequiredMixin, SuperuserRequiredMixin, UserContextMixi
 
     def get_object(self, queryset=None):
         aristotle_apps = fetch_aristotle_settings().get('CONTENT_EXTENSIONS', []) + ["aristotle_mdr"]
-        models = ContentType.objects.filter(app_label__in=aristotle_apps).all()
+        model_metrics = metrics.get_metrics(MDR.REGISTRY_METRIC_KINDS.model)
         model_stats = {}
-        for m in models:
-            if m.model_class() and issubclass(m.model_class(), MDR._concept) and not m.model.startswith("_"):
-                # Only output subclasses of 11179 concept
-                app_models = model_stats.get(m.app_label, {'app': None, 'models': []})
-                if app_models['app'] is None:
-                    app_models['app'] = getattr(apps.get_app_config(m.app_label), 'verbose_name')
-                app_models['models'].append(
-                    (
-                        m.model_class(),
-                        _get_cached_object_count(m),
-                        reverse("browse_concepts", args=[m.app_label, m.model])
-                    )
+        for m in _concept_model_types(aristotle_apps):
+            # Only output subclasses of 11179 concept
+            app_models = model_stats.get(m.app_label, {'app': None, 'models': []})
+            if app_models['app'] is None:
+                app_models['app'] = getattr(apps.get_app_config(m.app_label), 'verbose_name')
+            app_models['models'].append(
+                (
+                    m.model_class(),
+                    metrics.metric_counts(_model_metric(model_metrics, m))['all_time'],
+                    reverse("browse_concepts", args=[m.app_label, m.model])
                 )
-                model_stats[m.app_label] = app_models
+            )
+            model_stats[m.app_label] = app_models
         return model_stats
 
 
 class AdminStatsView(LoginRequiredMixin, SuperuserRequiredMixin, UserContextMixin, DetailView):
+    """
+    Shows the number of items of each type, in each workgroup and registered by
+    each registration authority, from the registry metrics table.
+    """
     template_name = 'aristotle_mdr/user/userAdminStats.html'
     context_object_name = 'model_stats'
     mod_counts = None
 
     def get_context_data(self, **kwargs):
         kwargs.update({
-            'model_max': max(self.mod_counts)
+            'model_max': max(self.mod_counts or [0]),
+            'stats_by_owner': [
+                (_("Items by workgroup"), self.get_owner_stats(
+                    MDR.REGISTRY_METRIC_KINDS.workgroup, MDR.Workgroup
+                )),
+                (_("Items by registration authority"), self.get_owner_stats(
+                    MDR.REGISTRY_METRIC_KINDS.registration_authority, MDR.RegistrationAuthority
+                )),
+            ],
+            'metrics_refreshed': metrics.last_refreshed(),
         })
         return super(AdminStatsView, self).get_context_data(**kwargs)
 
     def get_object(self, queryset=None):
-        aristotle_apps = fetch_metadata_apps()
-        models = ContentType.objects.filter(app_label__in=aristotle_apps).all()
+        model_metrics = metrics.get_metrics(MDR.REGISTRY_METRIC_KINDS.model)
         model_stats = {}
-
-        # Get datetime objects for '7 days ago' and '30 days ago'
-        t7 = datetime.date.today() - datetime.timedelta(days=7)
-        t30 = datetime.date.today() - datetime.timedelta(days=30)
         self.mod_counts = []  # used to get the maximum count
 
-        use_cache = True  # We still cache but its much, much shorter
-        for m in models:
-            if m.model_class() and issubclass(m.model_class(), MDR._concept) and not m.model.startswith("_"):
-                # Only output subclasses of 11179 concept
-                app_models = model_stats.get(m.app_label, {'app': None, 'models': []})
-                if app_models['app'] is None:
-                    app_models['app'] = getattr(apps.get_app_config(m.app_label), 'verbose_name')
-                if use_cache:
-                    total = _get_cached_query_count(
-                        qs=m.model_class().objects,
-                        key=_model_to_cache_key(m) + "__all_time",
-                        ttl=60
-                    )
-                    t7_val = _get_cached_query_count(
-                        qs=m.model_class().objects.filter(created__gte=t7),
-                        key=_model_to_cache_key(m) + "__t7",
-                        ttl=60
-                    )
-                    t30_val = _get_cached_query_count(
-                        qs=m.model_class().objects.filter(created__gte=t30),
-                        key=_model_to_cache_key(m) + "__t30",
-                        ttl=60
-                    )
-                else:
-                    total = m.model_class().objects.count()
-                    t7_val = m.model_class().objects.filter(created__gte=t7).count()
-                    t30_val = m.model_class().objects.filter(created__gte=t30).count()
-
-                self.mod_counts.append(total)
-                app_models['models'].append(
-                    (
-                        m.model_class(),
-                        {
-                            'all_time': total,
-                            't7': t7_val,
-                            't30': t30_val
-                        },
-                        reverse("browse_concepts", args=[m.app_label, m.model])
-                    )
+        for m in _concept_model_types(fetch_metadata_apps()):
+            # Only output subclasses of 11179 concept
+            app_models = model_stats.get(m.app_label, {'app': None, 'models': []})
+            if app_models['app'] is None:
+                app_models['app'] = getattr(apps.get_app_config(m.app_label), 'verbose_name')
+            counts = metrics.metric_counts(_model_metric(model_metrics, m))
+            self.mod_counts.append(counts['all_time'])
+            app_models['models'].append(
+                (
+                    m.model_class(),
+                    counts,
+                    reverse("browse_concepts", args=[m.app_label, m.model])
                 )
-                model_stats[m.app_label] = app_models
+            )
+            model_stats[m.app_label] = app_models
         return model_stats
 
+    def get_owner_stats(self, kind, model):
+        """
+        Returns a list of ``(owner, counts)`` for the workgroups or registration
+        authorities with items, the owners with the most items first.
+        """
+        owner_metrics = metrics.get_metrics(kind)
+        owners = model.objects.in_bulk([int(key) for key in owner_metrics.keys()])
+        stats = [
+            (owners[int(key)], metrics.metric_counts(metric))
+            for key, metric in owner_metrics.items()
+            if int(key) in owners
+        ]
+        stats.sort(key=lambda stat: (-stat[1]['all_time'], stat[0].name))
+        return stats
+
+
+class AdminStatsJSONView(LoginRequiredMixin, SuperuserRequiredMixin, View):
+    """
+    Returns the registry metrics as JSON, including the number of items created on each day.
+    """
+    def get(self, request, *args, **kwargs):
+        def serialize(kind):
+            return [
+                dict(metrics.metric_counts(metric), key=key, histogram=metric.get_histogram())
+                for key, metric in sorted(metrics.get_metrics(kind).items())
+            ]
+
+        refreshed = metrics.last_refreshed()
+        return JsonResponse({
+            'refreshed': refreshed.isoformat() if refreshed else None,
+            'models': serialize(MDR.REGISTRY_METRIC_KINDS.model),
+            'workgroups': serialize(MDR.REGISTRY_METRIC_KINDS.workgroup),
+            'registration_authorities': serialize(MDR.REGISTRY_METRIC_KINDS.registration_authority),
+        })
+
 
 class EditView(LoginRequiredMixin, UpdateView):
     template_name = 'aristotle_mdr/user/userEdit.html'
@@ -202,14 +217,11 @@ class EditView(LoginRequiredMixin, UpdateView):
         return reverse("aristotle:userHome")
 
 
-class FavouritesView(LoginRequiredMixin, ListView):
+class FavouritesView(LoginRequiredMixin, ConceptListMixin, ListView):
     template_name = 'aristotle_mdr/user/userFavourites.html'
 
-    def get_paginate_by(self, queryset):
-        return self.request.GET.get('pp', 20)
-
     def get_queryset(self):
-        return self.request.user.profile.favourites.select_subclasses()
+        return self.request.user.profile.favourites.all()
 
     def get_context_data(self, **kwargs):
         kwargs.update({
@@ -281,7 +293,7 @@ class ReviewDetailsView(LoginRequiredMixin, DetailView):
         return MDR.ReviewRequest.objects.visible(self.request.user)
 
 
-class CreatedItemsListView(LoginRequiredMixin, ListView):
+class CreatedItemsListView(LoginRequiredMixin, ConceptListMixin, ListView):
     paginate_by = 25
     template_name = "aristotle_mdr/user/sandbox.html"
     sort_by = None
@@ -313,7 +325,7 @@ class WorkgroupsView(LoginRequiredMixin, ListView):
     text_filter = None
 
     def get_paginate_by(self, queryset):
-        return self.request.GET.get('pp', 20)
+        return get_page_size(self.request)
 
     def get_workgroups(self):
         return self.request.user.profile.myWorkgroups
@@ -338,6 +350,7 @@ class WorkgroupsView(LoginRequiredMixin, ListView):
             sorter, direction = 'name', ''
 
         opts = paginate_workgroup_sort_opts.get(sorter)
+        qs = qs.select_related('counter')
 
         try:
             sort_field, extra = opts
@@ -1,15 +1,24 @@
+from collections import OrderedDict
+import copy
+
 from braces.views import PermissionRequiredMixin
+from django.apps import apps
 from django.contrib.auth.decorators import login_required
+from django.core import signing
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.urlresolvers import reverse
 from django.db.models import Count, Q
 from django.shortcuts import render
-from django.utils import timezone
-from django.utils.translation import ugettext_lazy as _
 from django.db.models.functions import Lower
+from django.http import QueryDict
+from django.utils.module_loading import import_string
+
+from aristotle_mdr.utils import fetch_aristotle_settings
 
 
+SELECT_ALL_SALT = 'aristotle_mdr.views.utils.select_all'
+
 paginate_sort_opts = {
     "mod_asc": ["modified"],
     "mod_desc": ["-modified"],
@@ -20,17 +29,206 @@ paginate_sort_opts = {
 }
 
 
+def get_page_size(request, default=20, maximum=None):
+    """
+    Returns the number of items per page asked for with ``pp``, but no more than
+    ``maximum``, or the ``MAX_PAGE_SIZE`` setting if no maximum is given.
+    """
+    if maximum is None:
+        maximum = fetch_aristotle_settings().get('MAX_PAGE_SIZE', 100)
+    try:
+        page_size = int(request.GET.get('pp', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+def list_items_queryset(queryset):
+    """
+    Adds the related items shown in lists of items of one type - their
+    workgroup, statuses and any ``list_details_related`` of the model.
+    """
+    related = ['workgroup'] + list(getattr(queryset.model, 'list_details_related', []))
+    return queryset.select_related(*related).prefetch_related('statuses')
+
+
+def lightweight_concepts(queryset):
+    """
+    Returns a queryset of items that only loads the fields needed to find out
+    the type of each item, for use with ``load_list_items``.
+
+    Querysets of one type of item are returned as is.
+    """
+    from aristotle_mdr.models import _concept
+
+    if queryset.model is not _concept:
+        return list_items_queryset(queryset)
+    return queryset.select_related('uuid').only('pk', 'uuid__app_label', 'uuid__model_name')
+
+
+def load_list_items(items, copy_attributes=()):
+    """
+    Loads a page of items from ``lightweight_concepts`` as their subclasses,
+    with one query for each type of item on the page rather than joining every
+    type of item to each row with ``select_subclasses``.
+    Returns the loaded items in the same order, with any ``copy_attributes``
+    (such as annotations) copied across.
+    """
+    from aristotle_mdr.models import _concept
+
+    items = list(items)
+    types = OrderedDict()
+    for item in items:
+        if item._meta.concrete_model is not _concept:
+            # Already loaded as the right type
+            continue
+        key = None
+        if item.uuid_id is not None:
+            key = (item.uuid.app_label, item.uuid.model_name)
+        types.setdefault(key, []).append(item.pk)
+
+    loaded = {}
+    for key, pks in types.items():
+        model = None
+        if key is not None:
+            try:
+                model = apps.get_model(*key)
+            except LookupError:
+                pass
+        if model is None:
+            queryset = _concept.objects.filter(pk__in=pks).select_subclasses()
+        else:
+            queryset = model.objects.filter(pk__in=pks)
+        loaded.update((obj.pk, obj) for obj in list_items_queryset(queryset))
+
+    results = []
+    for item in items:
+        obj = loaded.get(item.pk, item)
+        for attribute in copy_attributes:
+            if hasattr(item, attribute):
+                setattr(obj, attribute, getattr(item, attribute))
+        results.append(obj)
+    return results
+
+
+class KeysetPaginationMixin(object):
+    """
+    Pages a list view of items with a ``KeysetPaginator`` when the
+    ``KEYSET_PAGINATION`` setting is on, ordered by one of ``paginate_sort_opts``.
+    """
+    keyset_default_sort = "mod_desc"
+
+    def get_keyset_sort(self):
+        sort_by = getattr(self, 'sort_by', None)
+        if sort_by not in paginate_sort_opts.keys():
+            sort_by = self.keyset_default_sort
+        return sort_by
+
+    def paginate_queryset(self, queryset, page_size):
+        from aristotle_mdr.pagination import KeysetPaginator, keyset_pagination_enabled
+
+        if not keyset_pagination_enabled():
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+
+        sort_by = self.get_keyset_sort()
+        paginator = KeysetPaginator(queryset, page_size, paginate_sort_opts.get(sort_by), sort=sort_by)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class ConceptListMixin(KeysetPaginationMixin):
+    """
+    For list views of items, caps the page size at ``max_page_size``, and loads
+    the items on each page as their subclasses with ``load_list_items``.
+
+    Lists also have a signed ``select_all_list`` that describes them, so a bulk
+    action on every item in the list can rebuild its queryset with
+    ``select_all_queryset``.
+    """
+    max_page_size = None
+
+    def get_paginate_by(self, queryset):
+        return get_page_size(self.request, self.paginate_by or 20, self.max_page_size)
+
+    def get_select_all_list(self):
+        return signing.dumps({
+            'view': '%s.%s' % (self.__class__.__module__, self.__class__.__name__),
+            'kwargs': self.kwargs,
+            'query': self.request.GET.urlencode(),
+            'user': self.request.user.pk,
+        }, salt=SELECT_ALL_SALT, compress=True)
+
+    def get_context_data(self, **kwargs):
+        kwargs['select_all_list'] = self.get_select_all_list()
+        return super(ConceptListMixin, self).get_context_data(**kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super(ConceptListMixin, self).paginate_queryset(
+            lightweight_concepts(queryset), page_size
+        )
+        copy_attributes = [name for name, expression in getattr(paginator, 'key_annotations', [])]
+        page.object_list = load_list_items(page.object_list, copy_attributes)
+        return (paginator, page, page.object_list, is_paginated)
+
+
+def select_all_queryset(select_all_list, request):
+    """
+    Returns the queryset of the list described by ``select_all_list``, as the
+    view of the list builds it for the user making the request, or None if the
+    description is invalid or was given to a different user.
+    """
+    try:
+        data = signing.loads(select_all_list, salt=SELECT_ALL_SALT)
+    except signing.BadSignature:
+        return None
+    if data.get('user') != request.user.pk:
+        return None
+    try:
+        view_class = import_string(data['view'])
+    except ImportError:
+        return None
+    if not issubclass(view_class, ConceptListMixin):
+        return None
+
+    list_request = copy.copy(request)
+    list_request.GET = QueryDict(data['query'])
+    view = view_class()
+    view.request = list_request
+    view.args = ()
+    view.kwargs = data['kwargs']
+    return view.get_queryset()
+
+
 @login_required
 def paginated_list(request, items, template, extra_context={}):
-    if hasattr(items, 'select_subclasses'):
-        items = items.select_subclasses()
+    from aristotle_mdr.pagination import KeysetPaginator, keyset_pagination_enabled
+
     sort_by=request.GET.get('sort', "mod_desc")
     if sort_by not in paginate_sort_opts.keys():
         sort_by="mod_desc"
 
+    if keyset_pagination_enabled():
+        paginator = KeysetPaginator(
+            lightweight_concepts(items),
+            get_page_size(request),  # per page
+            paginate_sort_opts.get(sort_by),
+            sort=sort_by
+        )
+        page = paginator.page(request.GET.get('cursor'))
+        page.object_list = load_list_items(
+            page.object_list, [name for name, expression in paginator.key_annotations]
+        )
+        context = {
+            'object_list': items,
+            'sort': sort_by,
+            'page': page,
+            }
+        context.update(extra_context)
+        return render(request, template, context)
+
     paginator = Paginator(
-        items.order_by(*paginate_sort_opts.get(sort_by)),
-        request.GET.get('pp', 20)  # per page
+        lightweight_concepts(items).order_by(*paginate_sort_opts.get(sort_by)),
+        get_page_size(request)  # per page
     )
 
     page = request.GET.get('page')
@@ -42,6 +240,7 @@ def paginated_list(request, items, template, extra_context={}):
     except EmptyPage:
         # If page is out of range (e.g. 9999), deliver last page of results.
         paged_items = paginator.page(paginator.num_pages)
+    paged_items.object_list = load_list_items(paged_items.object_list)
     context = {
         'object_list': items,
         'sort': sort_by,
@@ -56,7 +255,7 @@ def paginated_reversion_list(request, items, template, extra_context={}):
 
     paginator = Paginator(
         items,
-        request.GET.get('pp', 20)  # per page
+        get_page_size(request)  # per page
     )
 
     page = request.GET.get('page')
@@ -75,9 +274,10 @@ def paginated_reversion_list(request, items, template, extra_context={}):
     return render(request, template, context)
 
 
+# Member and item counts are read from each workgroup's counter rather than counted
 paginate_workgroup_sort_opts = {
-    "users": ("user_count", lambda qs: qs.annotate(user_count=Count('viewers'))),
-    "items": ("item_count", lambda qs: qs.annotate(item_count=Count('items'))),
+    "users": "counter__member_count",
+    "items": "counter__item_count",
     "name": "name",
 }
 
@@ -95,7 +295,7 @@ def paginated_workgroup_list(request, workgroups, template, extra_context={}):
         sorter, direction = 'name', ''
 
     opts = paginate_workgroup_sort_opts.get(sorter)
-    qs = workgroups
+    qs = workgroups.select_related('counter')
 
     try:
         sort_field, extra = opts
@@ -106,7 +306,7 @@ def paginated_workgroup_list(request, workgroups, template, extra_context={}):
     qs = qs.order_by(direction + sort_field)
     paginator = Paginator(
         qs,
-        request.GET.get('pp', 20)  # per page
+        get_page_size(request)  # per page
     )
 
     page = request.GET.get('page')
@@ -157,7 +357,7 @@ def paginated_registration_authority_list(request, ras, template, extra_context=
     qs = qs.annotate(user_count=Count('registrars') + Count('managers'))
     paginator = Paginator(
         qs,
-        request.GET.get('pp', 20)  # per page
+        get_page_size(request)  # per page
     )
 
     page = request.GET.get('page')
@@ -197,21 +397,12 @@ def get_concept_redirect_or_404(get_item_perm, request, iid, objtype=None):
 
 
 def workgroup_item_statuses(workgroup):
-    from aristotle_mdr.models import STATES
-
-    raw_counts = workgroup.items.filter(
-        Q(statuses__until_date__gte=timezone.now()) |
-        Q(statuses__until_date__isnull=True)
-    ).values_list('statuses__state').annotate(num=Count('id'))
-
-    counts = []
-    for state, count in raw_counts:
-        if state is None:
-            state = _("Not registered")
-        else:
-            state = STATES[state]
-        counts.append((state, count))
-    return counts
+    """
+    Returns a list of ``(state name, count)`` of the items in a workgroup with a
+    current status in each registration state, from the workgroup's counter.
+    """
+    from aristotle_mdr.models import get_workgroup_counter
+    return get_workgroup_counter(workgroup).get_state_counts()
 
 
 def generate_visibility_matrix(user):
@@ -25,6 +25,7 @@ from aristotle_mdr.perms import (
 from aristotle_mdr import perms
 from aristotle_mdr.utils import cache_per_item_user, url_slugify_concept
 from aristotle_mdr import forms as MDRForms
+from aristotle_mdr.forms.search import hydrate_search_results
 from aristotle_mdr import models as MDR
 from aristotle_mdr.utils import get_concepts_for_apps, fetch_aristotle_settings, fetch_aristotle_downloaders
 from aristotle_mdr.views.utils import generate_visibility_matrix
@@ -146,15 +147,10 @@ def registrationHistory(request, iid):
         else:
             raise PermissionDenied
 
-    history = item.statuses.order_by("registrationAuthority", "-registrationDate")
-    out = {}
-    for status in history:
-        if status.registrationAuthority in out.keys():
-            out[status.registrationAuthority].append(status)
-        else:
-            out[status.registrationAuthority] = [status]
-
-    return render(request, "aristotle_mdr/registrationHistory.html", {'item': item, 'history': out})
+    return render(
+        request, "aristotle_mdr/registrationHistory.html",
+        {'item': item, 'history': item.registration_history()}
+    )
 
 
 def unauthorised(request, path=''):
@@ -215,7 +211,7 @@ def toggleFavourite(request, iid):
     request.user.profile.toggleFavourite(item)
     if request.GET.get('next', None):
         return redirect(request.GET.get('next'))
-    if item.concept in request.user.profile.favourites.all():
+    if request.user.profile.is_favourite(item):
         message = _("%s added to favourites.") % (item.name)
     else:
         message = _("%s removed from favourites.") % (item.name)
@@ -364,9 +360,15 @@ class PermissionSearchView(FacetedSearchView):
     def build_form(self):
         form = super(self.__class__, self).build_form()
         form.request = self.request
+        form.results_per_page = self.results_per_page
         form.request.GET = self.clean_facets(self.request)
         return form
 
+    def build_page(self):
+        paginator, page = super(PermissionSearchView, self).build_page()
+        page.object_list = hydrate_search_results(page.object_list)
+        return paginator, page
+
     def clean_facets(self, request):
         get = request.GET.copy()
         for k, val in get.items():
@@ -2,6 +2,7 @@ from aristotle_mdr import models as MDR
 from aristotle_mdr import forms as MDRForms
 from aristotle_mdr.perms import user_is_editor
 from aristotle_mdr.utils import url_slugify_concept
+from aristotle_mdr.name_index import name_exact_q
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist, PermissionDenied
@@ -22,6 +23,10 @@ from aristotle_mdr.utils import fetch_aristotle_settings, fetch_metadata_apps
 from formtools.wizard.views import SessionWizardView
 from reversion import revisions as reversion
 
+# More similar items than this tends to slow down everything, and if a user is
+# getting more results they probably haven't named things properly.
+SIMILAR_ITEMS_LIMIT = 20
+
 
 def make_it_clean(string):
     return str(strip_tags(string)).replace("&nbsp;", " ").strip()  # Clean it up
@@ -77,6 +82,32 @@ class PermissionWizard(SessionWizardView):
         kwargs.update({'user': self.request.user})
         return kwargs
 
+    def get_stored_lookup(self, name, terms, lookup):
+        """
+        Returns the ids of the items found by calling ``lookup``, for the given search terms.
+
+        The ids are kept in the wizard storage, so the (often slow) searches and
+        permission checks are only run again when the terms change - not each
+        time a step is rendered, or re-rendered after a validation error.
+        """
+        extra_data = self.storage.extra_data
+        lookups = extra_data.get('lookups', {})
+        stored = lookups.get(name, None)
+        if stored is not None and stored['terms'] == terms:
+            return stored['ids']
+
+        ids = [int(pk) for pk in lookup()]
+        lookups[name] = {'terms': terms, 'ids': ids}
+        extra_data['lookups'] = lookups
+        self.storage.extra_data = extra_data
+        return ids
+
+    def load_items(self, ids):
+        """Loads the items with the given ids in a single query, in the same order."""
+        from aristotle_mdr.forms.search import load_concepts
+        loaded = load_concepts(ids)
+        return [loaded[pk] for pk in ids if pk in loaded]
+
     def help_guide(self, model=None):
         # Refactored out as part of help changes
         # TODO: Need to permanently remove
@@ -133,7 +164,10 @@ class ConceptWizard(PermissionWizard):
             if duplicates:
                 context.update({'duplicate_items': duplicates})
             else:
-                context.update({'similar_items': self.find_similar()})
+                context.update({
+                    'similar_items': self.find_similar(),
+                    'more_similar_items': self.more_similar_items,
+                })
             context['step_title'] = _('Select or create')
         context.update({'model_name': self.model._meta.verbose_name,
                         'model_name_plural': self.model._meta.verbose_name_plural,
@@ -166,7 +200,11 @@ class ConceptWizard(PermissionWizard):
         self.search_terms = self.get_cleaned_data_for_step('initial')
         name = self.search_terms['name']
         name = name.strip()
-        self.duplicate_items = self.model.objects.filter(name__iexact=name).public().all()
+        ids = self.get_stored_lookup(
+            'duplicates', [name],
+            lambda: self.model.objects.filter(name_exact_q(name)).public().values_list('pk', flat=True)
+        )
+        self.duplicate_items = self.load_items(ids)
         return self.duplicate_items
 
     """
@@ -181,13 +219,18 @@ class ConceptWizard(PermissionWizard):
         if model is None:
             model = self.model
 
-        q = PSQS().models(model).auto_query(
-            self.search_terms['definition'] + " " + self.search_terms['name']
-        ).filter(statuses__in=[MDR.STATES[int(s)] for s in [MDR.STATES.standard, MDR.STATES.preferred]])
-
-        # .filter(states="Standard")
-        similar = q
-        self.similar_items = similar
+        def search():
+            q = PSQS().models(model).auto_query(
+                self.search_terms['definition'] + " " + self.search_terms['name']
+            ).filter(statuses__in=[MDR.STATES[int(s)] for s in [MDR.STATES.standard, MDR.STATES.preferred]])
+            # Fetch one more than is shown, to tell the user when there are more matches
+            return [result.pk for result in q[:SIMILAR_ITEMS_LIMIT + 1]]
+
+        ids = self.get_stored_lookup(
+            'similar_%s' % model._meta.model_name, [self.search_terms['name'], self.search_terms['definition']], search
+        )
+        self.more_similar_items = len(ids) > SIMILAR_ITEMS_LIMIT
+        self.similar_items = self.load_items(ids[:SIMILAR_ITEMS_LIMIT])
         return self.similar_items
 
 
@@ -254,21 +297,53 @@ class MultiStepAristotleWizard(PermissionWizard):
         Looks for items of a given item type with the given search terms
     """
     def find_similar(self, name, definition, model=None):
-        from aristotle_mdr.forms.search import get_permission_sqs as PSQS
         if model is None:
             model = self.model
+        return self.find_similar_components((model, name, definition))[model]
+
+    def find_similar_components(self, *searches):
+        """
+        Looks for similar items for each of the given ``(model, name, definition)`` searches,
+        and returns a dictionary of the similar items for each model.
+
+        All of the similar items for a step are loaded together, and the search
+        results are remembered in the wizard storage for later steps.
+        """
+        from aristotle_mdr.forms.search import get_permission_sqs as PSQS
         if not hasattr(self, "similar_items"):
             self.similar_items = {}
-        cached_items = self.similar_items.get(model, None)
-        if cached_items:
-            return cached_items
+        searches = [s for s in searches if s[0] not in self.similar_items]
+        if not searches:
+            return self.similar_items
+
+        def search(model, name, definition):
+            # limit results, so instead holding everything up, lets return some of what
+            # we find and then give them an error message on the wizard template.
+            similar = PSQS().models(model).auto_query(name + " " + definition).apply_permission_checks(
+                user=self.request.user
+            )[:SIMILAR_ITEMS_LIMIT]
+            return [result.pk for result in similar]
+
+        ids = {}
+        for model, name, definition in searches:
+            ids[model] = self.get_stored_lookup(
+                'similar_%s' % model._meta.model_name, [name, definition],
+                lambda: search(model, name, definition)
+            )
+        items = {item.pk: item for item in self.load_items([pk for pks in ids.values() for pk in pks])}
+        for model, pks in ids.items():
+            self.similar_items[model] = [items[pk] for pk in pks if pk in items]
+        return self.similar_items
 
-        # limit results to 20, as more than this tends to slow down everything.
-        # If a user is getting more than 20 results they probably haven't named things properly
-        # So instead holding everything up, lets return some of what we find and then give them an error message on the wizard template.
-        similar = PSQS().models(model).auto_query(name + " " + definition).apply_permission_checks(user=self.request.user)[:20]
-        self.similar_items[model] = similar
-        return similar
+    def get_component_ids(self, name, queryset, *components):
+        """
+        Returns the ids of the visible items in ``queryset`` that are made from
+        the given components, remembering them in the wizard storage.
+        """
+        return self.get_stored_lookup(
+            name, [c.pk for c in components],
+            lambda: queryset.visible(self.request.user).values_list('pk', flat=True)
+        )
 
     def get_field_defaults(self, field_prefix):
         ocp = self.get_cleaned_data_for_step('component_search')
@@ -369,7 +444,10 @@ class DataElementConceptWizard(MultiStepAristotleWizard):
         oc = self.get_object_class()
         pr = self.get_property()
         if oc and pr:
-            self._data_element_concept = MDR.DataElementConcept.objects.filter(objectClass=oc, property=pr).visible(self.request.user)
+            ids = self.get_component_ids(
+                'data_element_concepts', MDR.DataElementConcept.objects.filter(objectClass=oc, property=pr), oc, pr
+            )
+            self._data_element_concept = list(MDR.DataElementConcept.objects.filter(pk__in=ids))
             return self._data_element_concept
         else:
             return []
@@ -383,17 +461,13 @@ class DataElementConceptWizard(MultiStepAristotleWizard):
         if step == 'component_results':
             ocp = self.get_cleaned_data_for_step('component_search')
             if ocp:
+                similar = self.find_similar_components(
+                    (MDR.ObjectClass, ocp.get('oc_name', ""), ocp.get('oc_desc', "")),
+                    (MDR.Property, ocp.get('pr_name', ""), ocp.get('pr_desc', "")),
+                )
                 kwargs.update({
-                    'oc_similar': self.find_similar(
-                        model=MDR.ObjectClass,
-                        name=ocp.get('oc_name', ""),
-                        definition=ocp.get('oc_desc', "")
-                    ),
-                    'pr_similar': self.find_similar(
-                        model=MDR.Property,
-                        name=ocp.get('pr_name', ""),
-                        definition=ocp.get('pr_desc', "")
-                    )
+                    'oc_similar': similar[MDR.ObjectClass],
+                    'pr_similar': similar[MDR.Property],
                 })
         elif step in ['make_oc', 'make_p']:
             kwargs.update({
@@ -561,7 +635,10 @@ class DataElementWizard(MultiStepAristotleWizard):
         oc = self.get_object_class()
         pr = self.get_property()
         if oc and pr:
-            self._data_element_concepts = MDR.DataElementConcept.objects.filter(objectClass=oc, property=pr).visible(self.request.user)
+            ids = self.get_component_ids(
+                'data_element_concepts', MDR.DataElementConcept.objects.filter(objectClass=oc, property=pr), oc, pr
+            )
+            self._data_element_concepts = list(MDR.DataElementConcept.objects.filter(pk__in=ids))
             return self._data_element_concepts
         else:
             return []
@@ -586,11 +663,16 @@ class DataElementWizard(MultiStepAristotleWizard):
         pr = self.get_property()
         vd = self.get_value_domain()
         if oc and pr and vd:
-            self._data_element_from_components = MDR.DataElement.objects.filter(
-                dataElementConcept__objectClass=oc,
-                dataElementConcept__property=pr,
-                valueDomain=vd
-                ).visible(self.request.user)
+            ids = self.get_component_ids(
+                'data_elements_from_components',
+                MDR.DataElement.objects.filter(
+                    dataElementConcept__objectClass=oc,
+                    dataElementConcept__property=pr,
+                    valueDomain=vd
+                ),
+                oc, pr, vd
+            )
+            self._data_element_from_components = list(MDR.DataElement.objects.filter(pk__in=ids))
 
             return self._data_element_from_components
         else:
@@ -617,7 +699,10 @@ class DataElementWizard(MultiStepAristotleWizard):
             dec = results.get('dec_options', None)
         vd = self.get_value_domain()
         if dec and vd:
-            self._data_elements = MDR.DataElement.objects.filter(dataElementConcept=dec, valueDomain=vd).visible(self.request.user)
+            ids = self.get_component_ids(
+                'data_elements', MDR.DataElement.objects.filter(dataElementConcept=dec, valueDomain=vd), dec, vd
+            )
+            self._data_elements = list(MDR.DataElement.objects.filter(pk__in=ids))
             return self._data_elements
         else:
             return []
@@ -631,22 +716,15 @@ class DataElementWizard(MultiStepAristotleWizard):
         if step == 'component_results':
             ocp = self.get_cleaned_data_for_step('component_search')
             if ocp:
+                similar = self.find_similar_components(
+                    (MDR.ObjectClass, ocp.get('oc_name', ""), ocp.get('oc_desc', "")),
+                    (MDR.Property, ocp.get('pr_name', ""), ocp.get('pr_desc', "")),
+                    (MDR.ValueDomain, ocp.get('vd_name', ""), ocp.get('vd_desc', "")),
+                )
                 kwargs.update({
-                    'oc_similar': self.find_similar(
-                        model=MDR.ObjectClass,
-                        name=ocp.get('oc_name', ""),
-                        definition=ocp.get('oc_desc', "")
-                    ),
-                    'pr_similar': self.find_similar(
-                        model=MDR.Property,
-                        name=ocp.get('pr_name', ""),
-                        definition=ocp.get('pr_desc', "")
-                    ),
-                    'vd_similar': self.find_similar(
-                        model=MDR.ValueDomain,
-                        name=ocp.get('vd_name', ""),
-                        definition=ocp.get('vd_desc', "")
-                    )
+                    'oc_similar': similar[MDR.ObjectClass],
+                    'pr_similar': similar[MDR.Property],
+                    'vd_similar': similar[MDR.ValueDomain],
                 })
         elif step in ['make_oc', 'make_p', 'make_vd', 'make_dec']:
             kwargs.update({
@@ -13,8 +13,10 @@ from django.views.generic import (
 
 from aristotle_mdr import forms as MDRForms
 from aristotle_mdr import models as MDR
-from aristotle_mdr.perms import user_in_workgroup, user_is_workgroup_manager
+from aristotle_mdr.activity import workgroup_activity
+from aristotle_mdr.perms import user_in_workgroup, user_is_workgroup_manager, user_workgroup_roles
 from aristotle_mdr.views.utils import (
+    ConceptListMixin,
     paginated_list,
     paginate_sort_opts,
     paginated_workgroup_list,
@@ -33,6 +35,9 @@ class WorkgroupContextMixin(object):
             'item': self.workgroup,
             'workgroup': self.workgroup,
             'user_is_admin': user_is_workgroup_manager(self.request.user, self.workgroup),
+            'user_is_member': self.workgroup is not None and (
+                self.workgroup.pk in user_workgroup_roles(self.request.user)
+            ),
         })
         return context
 
@@ -61,9 +66,12 @@ class WorkgroupView(LoginRequiredMixin, WorkgroupContextMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         kwargs.update({
+            'counter': MDR.get_workgroup_counter(self.object),
             'counts': workgroup_item_statuses(self.object),
-            'recent': MDR._concept.objects.filter(
-                workgroup=self.object).select_subclasses().order_by('-modified')[:5]
+            'recent': workgroup_activity(self.object)[:5],
+            'recent_discussions': self.object.discussions.select_related(
+                'author', 'last_comment__author'
+            )[:5],
         })
         return super(WorkgroupView, self).get_context_data(**kwargs)
 
@@ -71,13 +79,10 @@ class WorkgroupView(LoginRequiredMixin, WorkgroupContextMixin, DetailView):
         return self.object and [self.object.template] or []
 
 
-class ItemsView(LoginRequiredMixin, WorkgroupContextMixin, ListView):
+class ItemsView(LoginRequiredMixin, WorkgroupContextMixin, ConceptListMixin, ListView):
     template_name = "aristotle_mdr/workgroupItems.html"
     sort_by = None
 
-    def get_paginate_by(self, queryset):
-        return self.request.GET.get('pp', 20)
-
     def get_context_data(self, **kwargs):
         kwargs.update({
             'sort': self.sort_by,
@@ -95,7 +100,7 @@ class ItemsView(LoginRequiredMixin, WorkgroupContextMixin, ListView):
 
         self.workgroup = get_object_or_404(MDR.Workgroup, pk=iid)
         self.check_user_permission()
-        return MDR._concept.objects.filter(workgroup=iid).select_subclasses().order_by(
+        return MDR._concept.objects.filter(workgroup=iid).order_by(
             *paginate_sort_opts.get(self.sort_by))
 
 
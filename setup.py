@@ -77,9 +77,6 @@ setup(
         
         # This is only needed for Migration 0024 once this is squashed, remove this dependency
         'sqlparse',
-        
-        # Required for utils.cached_querysets
-        'dill',
 
     ],
 